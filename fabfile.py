@@ -23,6 +23,16 @@ def migrate():
 	with lcd("nba_stats"):
 		local("python manage.py migrate")
 
+def profile_startup(budget=''):
+	with lcd("nba_stats"):
+		local("python manage.py profile_startup{0}".format(
+			" --budget={0}".format(budget) if budget else ""))
+
+def benchmarks(threshold=''):
+	with lcd("nba_stats"):
+		local("python -m common.benchmarks{0}".format(
+			" --threshold={0}".format(threshold) if threshold else ""))
+
 def createsuperuser():
 	User.objects.create_superuser('admin', 'admin@example.com', 'admin')
 
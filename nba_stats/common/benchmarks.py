@@ -0,0 +1,182 @@
+"""
+Microbenchmarks for the helpers in ``common.utils`` (and
+``common.columnar``), on inputs the size of what ingestion deals with:
+a full season's boxscore resultSet (~30k rows) and ~70 years of seasons.
+
+Run from the project directory (the one with ``manage.py``)::
+
+    $ python -m common.benchmarks --save       # record a baseline
+    $ python -m common.benchmarks              # compare against it
+
+The comparison exits with status 1 if any benchmark got slower than the
+baseline by more than ``--threshold`` (25% by default), or if there is no
+baseline. The baseline committed next to this module was recorded on a
+development machine; to compare on another one, baselines are scaled by
+how long a fixed piece of plain Python (``calibration``) takes on each.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import timeit
+
+from collections import OrderedDict
+
+from common import columnar, utils
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    'benchmarks.json')
+
+# Columns of a stats.nba.com BoxScoreTraditional player resultSet
+BOXSCORE_HEADERS = [
+    'GAME_ID', 'TEAM_ID', 'TEAM_ABBREVIATION', 'TEAM_CITY', 'PLAYER_ID',
+    'PLAYER_NAME', 'START_POSITION', 'COMMENT', 'MIN', 'FGM', 'FGA',
+    'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT', 'OREB',
+    'DREB', 'REB', 'AST', 'STL', 'BLK', 'TO', 'PF', 'PTS', 'PLUS_MINUS',
+]
+
+SEASON_ROWS = 30000
+
+def boxscore_result_set(rows=SEASON_ROWS, seed=0):
+    rng = random.Random(seed)
+    row_set = []
+    for i in range(rows):
+        fga = rng.randint(0, 25)
+        fgm = rng.randint(0, fga)
+        row_set.append([
+            '00214{0:05d}'.format(i // 25), 1610612737 + i % 30, 'ATL',
+            'Atlanta', 200000 + i % 450, 'Player {0}'.format(i % 450),
+            rng.choice(['F', 'C', 'G', '']), '', '{0}:{1:02d}'.format(
+                rng.randint(0, 48), rng.randint(0, 59)), fgm, fga,
+            round(float(fgm) / fga, 3) if fga else None, rng.randint(0, 5),
+            rng.randint(5, 10), 0.4, rng.randint(0, 10), rng.randint(10, 15),
+            0.75, rng.randint(0, 5), rng.randint(0, 10), rng.randint(0, 15),
+            rng.randint(0, 12), rng.randint(0, 4), rng.randint(0, 4),
+            rng.randint(0, 5), rng.randint(0, 6), rng.randint(0, 50),
+            rng.randint(-30, 30),
+        ])
+    return {'name': 'PlayerStats', 'headers': BOXSCORE_HEADERS, 'rowSet': row_set}
+
+def benchmarks():
+    """
+    Ordered mapping of benchmark name to a zero-argument callable.
+    """
+    result_set = boxscore_result_set()
+    row_dicts = utils.split_dict_to_list_of_dicts(result_set, 'rowSet', 'headers')
+    season_days = list(utils.datetime_range(datetime.datetime(2014, 10, 28),
+        datetime.datetime(2015, 6, 17), datetime.timedelta(days=1)))
+    seasons = list(utils.season_range('1947', '2017'))
+    game_dates = season_days * 1250 # ~300k games
+    a, b, c = row_dicts[:3]
+    keys = ['PLAYER_ID', 'PTS', 'AST', 'REB']
+
+    return OrderedDict([
+        ('datetime_range 70y daily', lambda: list(utils.datetime_range(
+            datetime.datetime(1946, 11, 1), datetime.datetime(2016, 11, 1),
+            datetime.timedelta(days=1)))),
+        ('season_range 70y', lambda: list(utils.season_range('1947', '2017'))),
+        ('year_of_season 70y', lambda: [utils.year_of_season(s) for s in seasons]),
+        ('date_to_season_str season', lambda: [utils.date_to_season_str(d) \
+            for d in season_days]),
+        ('season_id 70y', lambda: [utils.season_id(s) for s in seasons]),
+        ('dates_to_season_ids 300k', lambda: utils.dates_to_season_ids(game_dates)),
+        ('merge_dicts x1000', lambda: [utils.merge_dicts(a, b, c) for _ in range(1000)]),
+        ('dict_subset 30k', lambda: [utils.dict_subset(d, keys) for d in row_dicts]),
+        ('iter_of_dicts_to_nested_dict 30k', lambda: \
+            utils.iter_of_dicts_to_nested_dict(row_dicts, key='PLAYER_ID')),
+        ('split_dict_to_list_of_dicts 30k', lambda: \
+            utils.split_dict_to_list_of_dicts(result_set, 'rowSet', 'headers')),
+        ('split_dict_to_columns 30k', lambda: \
+            columnar.split_dict_to_columns(result_set, 'rowSet', 'headers')),
+        ('split_dict_to_list_of_rows 30k', lambda: \
+            columnar.split_dict_to_list_of_rows(result_set, 'rowSet', 'headers')),
+    ])
+
+# Name of the calibration time in baseline files
+CALIBRATION = '_calibration'
+
+# Slowdowns smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR = 0.0005
+
+def calibration():
+    """
+    A fixed amount of interpreter work, to tell how fast a machine is.
+    """
+    total = 0
+    for i in range(300000):
+        total += i % 7
+    return total
+
+def measure(func, repeat=5, number=1):
+    """
+    Best time per call, in seconds, over ``repeat`` runs of ``number`` calls.
+    """
+    return min(timeit.Timer(func).repeat(repeat=repeat, number=number)) / number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+        help='Baseline file (default: %(default)s)')
+    parser.add_argument('--save', action='store_true',
+        help='Record the results as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=1.25,
+        help='Fail if a benchmark takes more than this times its baseline '
+            '(default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+        help='Runs per benchmark, the best of which counts (default: %(default)s)')
+    parser.add_argument('--only', default='',
+        help='Only run benchmarks whose name contains this string')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = OrderedDict()
+    for name, func in benchmarks().items():
+        if args.only not in name:
+            continue
+        results[name] = measure(func, repeat=args.repeat)
+
+    # Calibrated once the machine is warmed up by the benchmarks
+    results[CALIBRATION] = measure(calibration, repeat=args.repeat * 4)
+    # How much slower this machine is than the one that recorded the baseline
+    scale = results[CALIBRATION] / baseline[CALIBRATION] \
+        if CALIBRATION in baseline else 1.0
+    print('{0:<36} {1:>10.2f} ms  {2:>6.2f}x baseline machine'.format('calibration',
+        results[CALIBRATION] * 1000, scale))
+
+    regressions = []
+    for name, seconds in results.items():
+        if name == CALIBRATION:
+            continue
+        line = '{0:<36} {1:>10.2f} ms'.format(name, seconds * 1000)
+        if name in baseline and not args.save:
+            expected = baseline[name] * scale
+            ratio = seconds / expected
+            line += '  {0:>6.2f}x baseline'.format(ratio)
+            if ratio > args.threshold and seconds - expected > NOISE_FLOOR:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        # Keep the baseline of benchmarks left out with --only
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print('Saved baseline to {0}'.format(args.baseline))
+    elif not baseline:
+        print('No baseline at {0}; run with --save to record one'.format(args.baseline))
+        return 1
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Column-oriented counterparts of the ``*_to_iter_of_dicts`` helpers in
+``common.utils``, for stats.nba.com style payloads that come as a header
+plus a list of rows::
+
+    {'headers': ['PLAYER_ID', 'PTS', ...], 'rowSet': [[2544, 27, ...], ...]}
+
+Rather than building a dict per row, the rows are either transposed into
+one sequence per column, or wrapped in a tuple type that is created once
+per header.
+
+>>> a = {
+...     'rowSet': [
+...         [2, 'Malcolm', 'Reynolds'],
+...         [3, 'Zoe', 'Washburne'],
+...         [4, 'Jayne'],
+...     ],
+...     'headers': ['id', 'first_name', 'last_name'],
+... }
+
+>>> columns = split_dict_to_columns(a, 'rowSet', 'headers')
+>>> list(columns)
+['id', 'first_name', 'last_name']
+>>> columns['id'], columns['last_name']
+((2, 3, 4), ('Reynolds', 'Washburne', None))
+
+>>> rows = split_dict_to_list_of_rows(a, 'rowSet', 'headers')
+>>> rows[1].first_name, rows[2].last_name
+('Zoe', None)
+>>> type(rows[0]) is row_type(['id', 'first_name', 'last_name'])
+True
+"""
+
+from collections import namedtuple, OrderedDict
+from itertools import chain, islice, repeat
+from numbers import Integral, Real
+
+try:
+    from itertools import izip_longest as zip_longest
+except ImportError: # Python 3
+    from itertools import zip_longest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def iter_of_list_to_columns(iterable, header):
+    """
+    Transposes rows into an ordered mapping of column name to a tuple of
+    that column's values. Short rows are padded with None and values
+    beyond the header are dropped, as in ``iter_of_list_to_iter_of_dicts``.
+
+    >>> list(iter_of_list_to_columns([[1, 'a'], [2, 'b', 'extra']], ['id', 'name']).items())
+    [('id', (1, 2)), ('name', ('a', 'b'))]
+
+    >>> list(iter_of_list_to_columns([], ['id', 'name']).items())
+    [('id', ()), ('name', ())]
+
+    >>> iter_of_list_to_columns([[1, 'a']], [])
+    Traceback (most recent call last):
+        ...
+    ValueError: empty header
+    """
+    rows = list(iterable)
+    if not header and rows:
+        raise ValueError('empty header')
+
+    transposed = islice(zip_longest(*rows), len(header)) if rows else ()
+    columns = OrderedDict((name, ()) for name in header)
+    for name, values in zip(header, transposed):
+        columns[name] = values
+    return columns
+
+split_dict_to_columns = lambda d, iterable_key, header_key: \
+    iter_of_list_to_columns(d[iterable_key], d[header_key])
+
+_row_types = {}
+
+def row_type(header):
+    """
+    The tuple type (a ``namedtuple``, so no per-row ``__dict__``) for rows
+    with the given header. Types are created once per distinct header and
+    reused. Names that aren't valid identifiers are replaced by positional
+    names ``_0``, ``_1``, ...
+
+    >>> Row = row_type(['PLAYER_ID', 'PTS'])
+    >>> Row(2544, 27)
+    Row(PLAYER_ID=2544, PTS=27)
+    >>> row_type(('PLAYER_ID', 'PTS')) is Row
+    True
+    >>> row_type(['id', '3PM'])._fields
+    ('id', '_1')
+    """
+    header = tuple(header)
+    try:
+        return _row_types[header]
+    except KeyError:
+        Row = _row_types[header] = namedtuple('Row', header, rename=True)
+        return Row
+
+def iter_of_list_to_iter_of_rows(iterable, header):
+    """
+    Like ``iter_of_list_to_iter_of_dicts``, but yields ``row_type(header)``
+    tuples, whose fields can be read by attribute or by position.
+
+    >>> rows = iter_of_list_to_iter_of_rows([[1, 'a'], [2], [3, 'c', 'x']], ['id', 'name'])
+    >>> list(rows)
+    [Row(id=1, name='a'), Row(id=2, name=None), Row(id=3, name='c')]
+    """
+    if not header and iterable:
+        raise ValueError('empty header')
+
+    Row = row_type(header)
+    width = len(header)
+    make = Row._make
+    for row in iterable:
+        if len(row) == width:
+            yield make(row)
+        else:
+            yield make(islice(chain(row, repeat(None)), width))
+
+iter_of_list_to_list_of_rows = lambda iterable, header: \
+    list(iter_of_list_to_iter_of_rows(iterable, header))
+
+split_dict_to_iter_of_rows = lambda d, iterable_key, header_key: \
+    iter_of_list_to_iter_of_rows(d[iterable_key], d[header_key])
+
+split_dict_to_list_of_rows = lambda d, iterable_key, header_key: \
+    list(split_dict_to_iter_of_rows(d, iterable_key, header_key))
+
+def column_dtype(values):
+    """
+    NumPy dtype for a column, inferred once from all of its values: bool,
+    int64 or float64 when every value is of that kind (None is allowed
+    for float64 and becomes NaN), otherwise object.
+    """
+    kinds = set(type(value) for value in values)
+    numeric = kinds - set([type(None)])
+    if kinds == set([bool]):
+        return np.bool_
+    if kinds and all(issubclass(kind, Integral) for kind in kinds):
+        return np.int64
+    if numeric and all(issubclass(kind, Real) for kind in numeric):
+        return np.float64
+    return object
+
+def columns_to_arrays(columns):
+    """
+    Converts the mapping returned by ``iter_of_list_to_columns`` into an
+    ordered mapping of NumPy arrays, one per column. Requires NumPy.
+    """
+    if np is None:
+        raise ImportError('columns_to_arrays requires numpy')
+    arrays = OrderedDict()
+    for name, values in columns.items():
+        dtype = column_dtype(values)
+        if dtype is np.float64:
+            values = [np.nan if value is None else value for value in values]
+        arrays[name] = np.array(values, dtype=dtype)
+    return arrays
+
+split_dict_to_arrays = lambda d, iterable_key, header_key: \
+    columns_to_arrays(split_dict_to_columns(d, iterable_key, header_key))
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,231 @@
+"""
+Concurrent fetching of stats.nba.com resultSets.
+
+``StatsFetcher`` issues many requests at once over a pool of keep-alive
+connections, with at most ``per_host`` in flight to any one host and
+their rate held to ``rate`` per second (in bursts of up to ``burst``) by
+a token bucket. Failed requests (connection errors, timeouts, 429 and
+5xx responses) are retried with exponential backoff and jitter, honoring
+Retry-After. Each payload is decoded into its resultSets, as lists of
+row tuples (see ``common.columnar``), and handed to a consumer as soon
+as it arrives, so fetching a season takes about as long as the rate
+limit allows rather than the sum of the round trips::
+
+    from twisted.internet import task
+
+    def main(reactor):
+        fetcher = StatsFetcher(reactor, rate=4)
+        requests = [('boxscoretraditionalv2', {'GameID': game_id, ...})
+            for game_id in game_ids]
+        d = fetcher.fetch_all(requests, consumer)
+        d.addBoth(lambda result: fetcher.close().addCallback(lambda _: result))
+        return d
+
+    task.react(main)
+
+``consumer(endpoint, params, result_sets)`` is called once per request.
+``base_url`` can point the fetcher at a local stand-in server. Given a
+``cache`` (see ``common.response_cache``), responses are answered from
+it when fresh, without using up the rate limit, and stored in it after.
+
+The project runs on Python 2, so this is built on Twisted (a development
+requirement, like Scrapy which uses it) rather than asyncio.
+"""
+
+from twisted.internet import defer, error, task
+from twisted.web.client import (Agent, ContentDecoderAgent, GzipDecoder,
+    HTTPConnectionPool, ResponseFailed, readBody)
+from twisted.web.http_headers import Headers
+
+from collections import defaultdict, OrderedDict
+import json
+import random
+
+try:
+    from urllib import urlencode
+    from urlparse import urlparse
+except ImportError: # Python 3
+    from urllib.parse import urlencode, urlparse
+
+from common.columnar import split_dict_to_list_of_rows
+
+STATS_URL = 'http://stats.nba.com/stats/'
+
+# stats.nba.com turns away requests that don't look like a browser's
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36',
+    'Referer': 'http://stats.nba.com/',
+    'Accept': 'application/json',
+}
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+RETRY_ERRORS = (error.ConnectError, error.ConnectionLost, error.TimeoutError,
+    defer.CancelledError, ResponseFailed)
+
+class HTTPError(Exception):
+
+    def __init__(self, code, url):
+        super(HTTPError, self).__init__('HTTP {0} for {1}'.format(code, url))
+        self.code = code
+        self.url = url
+
+class TokenBucket(object):
+    """
+    Admits ``rate`` events per second on average, and up to ``capacity``
+    at once after a lull. Tokens are reserved on request, so concurrent
+    callers queue up in order.
+    """
+
+    def __init__(self, clock, rate, capacity):
+        self.clock = clock
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = clock.seconds()
+
+    def delay(self):
+        """
+        Takes a token, returning how many seconds to wait until it is due.
+        """
+        now = self.clock.seconds()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, 0.0)
+
+    def consume(self):
+        """
+        A Deferred that fires when the caller may go ahead.
+        """
+        delay = self.delay()
+        if not delay:
+            return defer.succeed(None)
+        return task.deferLater(self.clock, delay, lambda: None)
+
+def result_sets(payload):
+    """
+    The resultSets of a stats.nba.com payload, by name, each as a list of
+    row tuples.
+    """
+    sets = payload.get('resultSets', payload.get('resultSet', []))
+    if isinstance(sets, dict):
+        sets = [sets]
+    return OrderedDict((result_set['name'], split_dict_to_list_of_rows(result_set,
+        'rowSet', 'headers')) for result_set in sets)
+
+class StatsFetcher(object):
+
+    def __init__(self, reactor, base_url=STATS_URL, rate=5, burst=5, per_host=4,
+        retries=4, backoff=1.0, max_backoff=60.0, timeout=30.0, headers=None,
+        cache=None):
+        self.reactor = reactor
+        self.cache = cache
+        self.base_url = base_url
+        self.bucket = TokenBucket(reactor, rate, burst)
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.pool = HTTPConnectionPool(reactor, persistent=True)
+        self.pool.maxPersistentPerHost = per_host
+        self.agent = ContentDecoderAgent(Agent(reactor, connectTimeout=timeout,
+            pool=self.pool), [(b'gzip', GzipDecoder)])
+        self.headers = Headers(dict((name.encode('ascii'), [value.encode('ascii')]) \
+            for name, value in (headers or DEFAULT_HEADERS).items()))
+        self.semaphores = defaultdict(lambda: defer.DeferredSemaphore(self.per_host))
+
+    def url(self, endpoint, params):
+        # Sorted, so the same request always has the same URL
+        return '{0}{1}?{2}'.format(self.base_url, endpoint, urlencode(sorted(params.items())))
+
+    def get(self, url):
+        """
+        GETs ``url``, firing with the status code, headers and body.
+        """
+        d = self.agent.request(b'GET', url.encode('ascii'), self.headers)
+        d.addCallback(lambda response: readBody(response).addCallback(
+            lambda body: (response.code, response.headers, body)))
+        timeout = self.reactor.callLater(self.timeout, d.cancel)
+        def done(result):
+            if timeout.active():
+                timeout.cancel()
+            return result
+        return d.addBoth(done)
+
+    def limited_get(self, url):
+        """
+        ``get`` once the rate limit allows. Called with a connection slot
+        held, so requests queued for a slot don't all go out at once when
+        slots free up.
+        """
+        d = self.bucket.consume()
+        d.addCallback(lambda _: self.get(url))
+        return d
+
+    def retry_delay(self, attempt, headers=None):
+        retry_after = headers and headers.getRawHeaders(b'retry-after')
+        if retry_after:
+            try:
+                return min(float(retry_after[0]), self.max_backoff)
+            except ValueError:
+                pass
+        # Full jitter, so retries of a burst of failures spread out
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.max_backoff))
+
+    @defer.inlineCallbacks
+    def fetch(self, endpoint, params):
+        """
+        A Deferred firing with the resultSets of ``endpoint`` for
+        ``params``, or failing with the last error once retries run out.
+        """
+        if self.cache is not None:
+            body = self.cache.get(endpoint, params)
+            if body is not None:
+                defer.returnValue(result_sets(json.loads(body.decode('utf-8'))))
+
+        url = self.url(endpoint, params)
+        semaphore = self.semaphores[urlparse(url).netloc]
+        for attempt in range(self.retries + 1):
+            headers = None
+            try:
+                code, headers, body = yield semaphore.run(self.limited_get, url)
+            except RETRY_ERRORS as e:
+                failure = e
+            else:
+                if code == 200:
+                    if self.cache is not None:
+                        self.cache.set(endpoint, params, body)
+                    defer.returnValue(result_sets(json.loads(body.decode('utf-8'))))
+                failure = HTTPError(code, url)
+                if code not in RETRY_STATUSES:
+                    raise failure
+            if attempt == self.retries:
+                raise failure
+            yield task.deferLater(self.reactor, self.retry_delay(attempt, headers),
+                lambda: None)
+
+    def fetch_all(self, requests, consumer):
+        """
+        Fetches every ``(endpoint, params)`` of ``requests`` concurrently,
+        passing each result to ``consumer(endpoint, params, result_sets)``
+        as it arrives. Fires with a list of ``(endpoint, params, failure)``
+        for the requests that failed.
+        """
+        requests = list(requests)
+        deferreds = []
+        for endpoint, params in requests:
+            d = self.fetch(endpoint, params)
+            d.addCallback(lambda sets, endpoint=endpoint, params=params: \
+                consumer(endpoint, params, sets))
+            deferreds.append(d)
+        d = defer.DeferredList(deferreds, consumeErrors=True)
+        d.addCallback(lambda results: [(endpoint, params, result) for (endpoint, params),
+            (success, result) in zip(requests, results) if not success])
+        return d
+
+    def close(self):
+        return self.pool.closeCachedConnections()
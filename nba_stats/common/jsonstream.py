@@ -0,0 +1,168 @@
+"""
+Incremental JSON readers that yield values as the underlying stream is
+read, so that memory use depends on the size of the largest element and
+not on the size of the document.
+
+>>> import io
+>>> stream = io.BytesIO(b'[{"pk": 1}, {"pk": 2},\\n {"pk": 3}]')
+>>> list(iter_json_array(stream, chunk_size=4)) == [{'pk': 1}, {'pk': 2}, {'pk': 3}]
+True
+
+>>> stream = io.BytesIO(b'{"pk": 1}\\n\\n{"pk": 2}\\n')
+>>> list(iter_json_lines(stream)) == [{'pk': 1}, {'pk': 2}]
+True
+"""
+
+import codecs
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+def _iter_text(stream, chunk_size, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        yield chunk
+
+def iter_json_array(stream, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+    """
+    Yields the elements of the top-level JSON array in ``stream`` one at a
+    time. ``stream`` may be any file-like object with a ``read`` method,
+    binary (decoded with ``encoding``) or text, e.g. a ``GzipFile``.
+
+    >>> import io
+    >>> list(iter_json_array(io.StringIO(u'[]')))
+    []
+
+    >>> list(iter_json_array(io.StringIO(u' [1, 22, 333 ,[4]] '), chunk_size=1))
+    [1, 22, 333, [4]]
+
+    >>> list(iter_json_array(io.BytesIO(u'["\\u00e9t\\u00e9"]'.encode('utf-8')),
+    ...     chunk_size=1)) == [u'\\u00e9t\\u00e9']
+    True
+
+    >>> list(iter_json_array(io.StringIO(u'{"pk": 1}')))
+    Traceback (most recent call last):
+        ...
+    ValueError: expected '[' at position 0
+
+    >>> list(iter_json_array(io.StringIO(u'[1, 2')))
+    Traceback (most recent call last):
+        ...
+    ValueError: unexpected end of JSON array
+
+    >>> list(iter_json_array(io.StringIO(u'[1 2]')))
+    Traceback (most recent call last):
+        ...
+    ValueError: expected ',' or ']' at position 3
+    """
+    chunks = _iter_text(stream, chunk_size, encoding)
+    buf = u''
+    pos = 0      # Absolute offset of buf[0], for error messages
+    idx = 0
+    eof = False
+
+    def fill():
+        # Returns None once the stream is exhausted.
+        try:
+            return next(chunks)
+        except StopIteration:
+            return None
+
+    # Each state expects the next significant character to be one of:
+    #   'start' -> '['      'value' -> a value or ']' (first element only)
+    #   'sep'   -> ',' or ']'
+    state = 'start'
+    first = True
+
+    while True:
+        # Skip whitespace, reading more as needed
+        while True:
+            while idx < len(buf) and buf[idx] in u' \t\n\r':
+                idx += 1
+            if idx < len(buf) or eof:
+                break
+            chunk = fill()
+            if chunk is None:
+                eof = True
+            else:
+                pos += idx
+                buf, idx = buf[idx:] + chunk, 0
+
+        if idx >= len(buf):
+            raise ValueError('unexpected end of JSON array')
+
+        char = buf[idx]
+
+        if state == 'start':
+            if char != u'[':
+                raise ValueError("expected '[' at position {0}".format(pos+idx))
+            idx += 1
+            state = 'value'
+        elif state == 'sep' or (first and char == u']'):
+            if char == u']':
+                return
+            if char != u',':
+                raise ValueError("expected ',' or ']' at position {0}".format(pos+idx))
+            idx += 1
+            state = 'value'
+            first = False
+        else:
+            try:
+                value, end = _decoder.raw_decode(buf, idx)
+            except ValueError:
+                if eof:
+                    raise
+                end = None
+            # A value that runs up to the end of the buffer may be cut
+            # short (e.g. a number split across two reads), so only trust
+            # it once there is more input after it or the stream is done.
+            if end is None or (end == len(buf) and not eof):
+                chunk = fill()
+                if chunk is None:
+                    eof = True
+                else:
+                    pos += idx
+                    buf, idx = buf[idx:] + chunk, 0
+                continue
+            yield value
+            idx = end
+            state = 'sep'
+            first = False
+
+def iter_json_lines(stream, encoding='utf-8'):
+    """
+    Yields one value per non-blank line of a JSON-lines ``stream``.
+
+    >>> import io
+    >>> list(iter_json_lines(io.StringIO(u'1\\n[2]\\n  \\n"3"'))) == [1, [2], '3']
+    True
+
+    >>> list(iter_json_lines(io.StringIO(u'{"pk": 1}\\n{"pk"'))) #doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    ValueError: invalid JSON on line 2: ...
+    """
+    for lineno, line in enumerate(stream, 1):
+        if isinstance(line, bytes):
+            line = line.decode(encoding)
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError('invalid JSON on line {0}: {1}'.format(lineno, e))
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,225 @@
+"""
+Persistent on-disk cache of upstream (stats.nba.com) responses.
+
+Responses are stored zlib-compressed under the SHA-1 of their content,
+so identical payloads (empty resultSets, say) are stored once, and each
+request, an endpoint plus its normalized parameters, refers to one of
+them::
+
+    <root>/objects/ab/ab12...    compressed response bodies
+    <root>/refs/cd/cd34...       "<content sha1> <stored at> <expires at>"
+                                 per request ('-' for never)
+
+How long an entry is good for depends on the season it belongs to (from
+the Season or GameID parameter): responses for completed seasons never
+change and never expire, those of the current season expire after
+``current_ttl`` seconds, and anything else after ``default_ttl``. The
+total size of the stored bodies is kept under ``max_bytes``: once it is
+over, expired entries and bodies no request refers to any more (the old
+response to a request stored again) are deleted, and then the least
+recently used entries until it is back under.
+
+>>> cache_key('boxscoretraditionalv2', {'GameID': '0021400001', 'EndPeriod': 10}) == \\
+...     cache_key('boxscoretraditionalv2', {'EndPeriod': '10', 'GameID': '0021400001'})
+True
+
+>>> request_season({'Season': '2013-14'}), request_season({'GameID': '0021400001'})
+(2014, 2015)
+"""
+
+from collections import Counter
+import datetime
+import hashlib
+import os
+import time
+import zlib
+
+try:
+    from urllib import urlencode
+except ImportError: # Python 3
+    from urllib.parse import urlencode
+
+from common.utils import season_id, date_to_season_id
+
+def normalize_params(params):
+    """
+    Parameters as sorted (name, value) pairs of strings, so that the same
+    request always has the same key.
+    """
+    return sorted((str(name), str(value).strip()) for name, value in params.items())
+
+def cache_key(endpoint, params):
+    request = '{0}?{1}'.format(endpoint.strip('/'), urlencode(normalize_params(params)))
+    return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+def request_season(params):
+    """
+    The id of the season a request is about (see ``common.utils.season_id``),
+    or None if it can't tell.
+    """
+    try:
+        if params.get('Season'):
+            return season_id(params['Season'])
+        game_id = str(params.get('GameID', ''))
+        if len(game_id) == 10:
+            # '0021400001' is a game of the season starting in 2014, and
+            # the league started in 1946
+            year = int(game_id[3:5])
+            return (1900 if year >= 46 else 2000) + year + 1
+    except ValueError:
+        pass
+    return None
+
+class ResponseCache(object):
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3, current_ttl=5 * 60,
+        default_ttl=60 * 60, level=6):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.current_ttl = current_ttl
+        self.default_ttl = default_ttl
+        self.level = level
+        self.counters = Counter()
+        self.size = None
+
+    def path(self, kind, digest):
+        return os.path.join(self.root, kind, digest[:2], digest)
+
+    def ttl(self, params):
+        """
+        Seconds a response to ``params`` stays fresh, or None for ever.
+        """
+        season = request_season(params)
+        if season is None:
+            return self.default_ttl
+        if season < date_to_season_id(datetime.date.today()):
+            return None
+        return self.current_ttl
+
+    def get(self, endpoint, params):
+        """
+        The cached body of the request, or None if there is no fresh one.
+        """
+        ref = self.path('refs', cache_key(endpoint, params))
+        try:
+            with open(ref) as f:
+                digest, stored = f.read().split()[:2]
+            with open(self.path('objects', digest), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (IOError, OSError, ValueError, zlib.error):
+            self.counters['misses'] += 1
+            return None
+
+        ttl = self.ttl(params)
+        if ttl is not None and time.time() - float(stored) > ttl:
+            self.counters['expired'] += 1
+            return None
+        # The ref's mtime is its last use, for eviction
+        os.utime(ref, None)
+        self.counters['hits'] += 1
+        return body
+
+    def set(self, endpoint, params, body):
+        digest = hashlib.sha1(body).hexdigest()
+        obj = self.path('objects', digest)
+        if not os.path.exists(obj):
+            data = zlib.compress(body, self.level)
+            self.write(obj, data, 'wb')
+            if self.size is not None:
+                self.size += len(data)
+        now, ttl = time.time(), self.ttl(params)
+        self.write(self.path('refs', cache_key(endpoint, params)), '{0} {1} {2}'.format(
+            digest, now, '-' if ttl is None else now + ttl), 'w')
+        self.counters['stores'] += 1
+        if self.total_size() > self.max_bytes:
+            self.evict()
+
+    def write(self, path, data, mode):
+        # Write and rename, so readers never see half a file
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp, mode) as f:
+            f.write(data)
+        os.rename(tmp, path)
+
+    def files(self, kind):
+        for directory, dirnames, filenames in os.walk(os.path.join(self.root, kind)):
+            for filename in filenames:
+                if not filename.endswith('.tmp'):
+                    yield os.path.join(directory, filename)
+
+    def total_size(self):
+        if self.size is None:
+            self.size = sum(os.path.getsize(path) for path in self.files('objects'))
+        return self.size
+
+    def read_refs(self):
+        """
+        ``(last used, path, digest, expires at)`` of every ref, expiry None
+        for never.
+        """
+        for path in self.files('refs'):
+            try:
+                with open(path) as f:
+                    fields = f.read().split()
+                mtime = os.path.getmtime(path)
+            except (IOError, OSError):
+                # Evicted by another process meanwhile
+                continue
+            if len(fields) < 2:
+                continue
+            expires = float(fields[2]) if len(fields) > 2 and fields[2] != '-' else None
+            yield mtime, path, fields[0], expires
+
+    def remove(self, path):
+        """
+        Deletes ``path``, returning its size, or 0 if another process got
+        there first.
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        return size
+
+    def evict(self, target=0.9):
+        """
+        Deletes the expired entries and the bodies no entry refers to, then
+        the least recently used entries until the stored bodies take up
+        less than ``target`` of ``max_bytes``.
+        """
+        self.total_size()
+        now = time.time()
+        refs = []
+        for mtime, path, digest, expires in self.read_refs():
+            if expires is not None and expires < now:
+                self.remove(path)
+                self.counters['pruned'] += 1
+            else:
+                refs.append((mtime, path, digest))
+        used = Counter(digest for mtime, path, digest in refs)
+
+        # A body stored by another process whose ref isn't written yet goes
+        # too; that request just misses next time.
+        for path in self.files('objects'):
+            if os.path.basename(path) not in used:
+                self.size -= self.remove(path)
+                self.counters['orphans'] += 1
+
+        refs.sort()
+        for mtime, path, digest in refs:
+            if self.total_size() <= self.max_bytes * target:
+                break
+            self.remove(path)
+            self.counters['evictions'] += 1
+            used[digest] -= 1
+            if not used[digest]:
+                self.size -= self.remove(self.path('objects', digest))
+
+    def stats(self):
+        lookups = self.counters['hits'] + self.counters['misses'] + self.counters['expired']
+        return dict(self.counters, size=self.total_size(),
+            hit_rate=float(self.counters['hits']) / lookups if lookups else 0.0)
@@ -0,0 +1,190 @@
+"""
+Tests of ``common.response_cache``, and of ``common.fetcher`` against a
+stand-in for stats.nba.com served by twisted.web on localhost.
+"""
+
+from unittest import TestCase, skipIf
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from common.response_cache import ResponseCache, cache_key
+from common.utils import date_to_season_id, season_str
+
+try:
+    from twisted.internet import defer, reactor
+    from twisted.trial import unittest as trial
+    from twisted.web.resource import Resource
+    from twisted.web.server import Site, NOT_DONE_YET
+
+    from common.fetcher import HTTPError, StatsFetcher
+    inline_callbacks = defer.inlineCallbacks
+except ImportError:
+    trial = None
+    Resource = object
+    inline_callbacks = lambda function: function
+
+CURRENT_SEASON = season_str(date_to_season_id(datetime.date.today()))
+
+class ResponseCacheTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def objects(self, cache):
+        return sorted(os.path.basename(path) for path in cache.files('objects'))
+
+    def test_ttl_by_season(self):
+        cache = ResponseCache(self.root, current_ttl=300, default_ttl=3600)
+        self.assertEqual(cache.ttl({'Season': '2013-14'}), None)
+        self.assertEqual(cache.ttl({'GameID': '0021300001'}), None)
+        self.assertEqual(cache.ttl({'Season': CURRENT_SEASON}), 300)
+        self.assertEqual(cache.ttl({'PlayerID': '977'}), 3600)
+
+        cache = ResponseCache(self.root, current_ttl=-1)
+        cache.set('scoreboard', {'Season': '2013-14'}, b'old')
+        cache.set('scoreboard', {'Season': CURRENT_SEASON}, b'new')
+        self.assertEqual(cache.get('scoreboard', {'Season': '2013-14'}), b'old')
+        self.assertEqual(cache.get('scoreboard', {'Season': CURRENT_SEASON}), None)
+        self.assertEqual(cache.get('scoreboard', {'Season': '2012-13'}), None)
+        self.assertEqual(cache.stats()['hit_rate'], 1 / 3.0)
+        self.assertEqual((cache.counters['hits'], cache.counters['expired'],
+            cache.counters['misses'], cache.counters['stores']), (1, 1, 1, 2))
+
+        # Expired entries go first when making room
+        cache.evict()
+        self.assertEqual(cache.counters['pruned'], 1)
+        self.assertEqual(self.objects(cache), [hashlib.sha1(b'old').hexdigest()])
+        self.assertEqual(cache.counters['evictions'], 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        bodies = [os.urandom(1000) for i in range(4)]
+        cache = ResponseCache(self.root, max_bytes=3300)
+        for i, body in enumerate(bodies[:3]):
+            cache.set('boxscore', {'GameID': i}, body)
+        self.assertTrue(cache.total_size() > 3000)
+        # Used in the order 1, 0, 2
+        for age, i in ((30, 1), (20, 0), (10, 2)):
+            path = cache.path('refs', cache_key('boxscore', {'GameID': i}))
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        cache.set('boxscore', {'GameID': 3}, bodies[3])
+        self.assertEqual(cache.counters['evictions'], 2)
+        self.assertEqual([cache.get('boxscore', {'GameID': i}) is not None \
+            for i in range(4)], [False, False, True, True])
+        self.assertEqual(cache.total_size(), sum(os.path.getsize(path) \
+            for path in cache.files('objects')))
+
+    def test_bodies_no_entry_refers_to_are_removed(self):
+        cache = ResponseCache(self.root, max_bytes=10 ** 6)
+        cache.set('scoreboard', {'GameDate': '10/28/2014'}, b'first')
+        cache.set('scoreboard', {'GameDate': '10/29/2014'}, b'shared')
+        cache.set('boxscore', {'GameID': '0021400001'}, b'shared')
+        cache.set('scoreboard', {'GameDate': '10/28/2014'}, b'second')
+        self.assertEqual(len(self.objects(cache)), 3)
+
+        cache.evict()
+        self.assertEqual(cache.counters['orphans'], 1)
+        self.assertEqual(self.objects(cache), sorted(hashlib.sha1(body).hexdigest() \
+            for body in (b'second', b'shared')))
+        self.assertEqual(cache.get('scoreboard', {'GameDate': '10/28/2014'}), b'second')
+        self.assertEqual(cache.get('boxscore', {'GameID': '0021400001'}), b'shared')
+        self.assertEqual(cache.counters['evictions'], 0)
+        self.assertEqual(cache.stats()['size'], sum(os.path.getsize(path) \
+            for path in cache.files('objects')))
+
+PAYLOAD = json.dumps({'resultSets': [{'name': 'GameHeader',
+    'headers': ['GAME_ID'], 'rowSet': [['0021400001']]}]}).encode('utf-8')
+
+class StubStats(Resource):
+    """
+    Answers every endpoint with PAYLOAD, recording when requests arrive
+    and how many are in flight. Responses to requests arriving before
+    ``hold_until`` are held until then; ``failures`` maps endpoints to the
+    status codes of their first responses.
+    """
+    isLeaf = True
+
+    def __init__(self):
+        Resource.__init__(self)
+        self.arrivals = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.hold_until = 0
+        self.failures = {}
+
+    def render_GET(self, request):
+        now = time.time()
+        endpoint = request.path.decode('ascii').strip('/')
+        self.arrivals.append((now, endpoint))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        def respond():
+            self.in_flight -= 1
+            codes = self.failures.get(endpoint)
+            if codes:
+                request.setResponseCode(codes.pop(0))
+                request.write(b'{}')
+            else:
+                request.write(PAYLOAD)
+            request.finish()
+        reactor.callLater(max(self.hold_until - now, 0), respond)
+        return NOT_DONE_YET
+
+@skipIf(trial is None, 'requires Twisted')
+class StatsFetcherTest(trial.TestCase if trial else TestCase):
+
+    def setUp(self):
+        self.stats = StubStats()
+        self.port = reactor.listenTCP(0, Site(self.stats), interface='127.0.0.1')
+        self.addCleanup(self.port.stopListening)
+
+    def fetcher(self, **options):
+        fetcher = StatsFetcher(reactor, base_url='http://127.0.0.1:{0}/'.format(
+            self.port.getHost().port), **options)
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    @inline_callbacks
+    def test_concurrency_and_rate(self):
+        rate, per_host = 10.0, 4
+        fetcher = self.fetcher(rate=rate, burst=1, per_host=per_host)
+        # The first requests all finish at once, freeing every slot together
+        self.stats.hold_until = time.time() + 0.8
+        results = []
+        failures = yield fetcher.fetch_all([('boxscore', {'GameID': i}) for i in range(8)],
+            lambda endpoint, params, sets: results.append(sets))
+
+        self.assertEqual(failures, [])
+        self.assertEqual(len(results), 8)
+        self.assertEqual(list(results[0]['GameHeader']), [('0021400001',)])
+        self.assertEqual(self.stats.max_in_flight, per_host)
+        # Connecting can delay any one arrival, so check spans rather than
+        # gaps: of all requests, and of those waiting for the slots to free
+        arrivals = [when for when, endpoint in self.stats.arrivals]
+        for sent in (arrivals, arrivals[per_host:]):
+            self.assertTrue(sent[-1] - sent[0] > (len(sent) - 2) / rate, arrivals)
+
+    @inline_callbacks
+    def test_retries(self):
+        fetcher = self.fetcher(rate=100, burst=10, retries=3, backoff=0.01)
+        self.stats.failures = {'flaky': [503, 500], 'missing': [404]}
+
+        sets = yield fetcher.fetch('flaky', {})
+        self.assertEqual(list(sets), ['GameHeader'])
+        try:
+            yield fetcher.fetch('missing', {})
+        except HTTPError as e:
+            self.assertEqual(e.code, 404)
+        else:
+            self.fail('404 was not raised')
+
+        endpoints = [endpoint for when, endpoint in self.stats.arrivals]
+        self.assertEqual(endpoints.count('flaky'), 3)
+        self.assertEqual(endpoints.count('missing'), 1)
@@ -216,7 +216,99 @@ def date_to_season_str(date):
     >>> date_to_season_str(datetime.datetime(2013, 12, 6))
     '2013-14'
     """
-    return '{0}-{1}'.format((date-YEAR_DELTA).strftime('%Y'), date.strftime('%y')) 
+    return season_str(date_to_season_id(date))
+
+# Seasons can also be represented by an integer id, the year the season
+# ends in (as returned by `year_of_season`): 2015 is '2014-15'.
+
+# Dates from this month on belong to the season ending the next year
+SEASON_START_MONTH = 10
+
+_season_ids = {}
+
+def season_id(season):
+    """
+    Memoized, so parsing each distinct season string only happens once.
+
+    >>> season_id('2014-15')
+    2015
+
+    >>> season_id('1999-00')
+    2000
+
+    >>> season_id('2014')
+    2014
+
+    >>> season_id(2014)
+    2014
+
+    >>> season_id('rubbish')
+    Traceback (most recent call last):
+        ...
+    ValueError: time data 'rubbish' does not match format '%Y'
+    """
+    try:
+        return _season_ids[season]
+    except KeyError:
+        _season_ids[season] = year_of_season(season).year
+        return _season_ids[season]
+
+def season_str(season_id):
+    """
+    >>> season_str(2015)
+    '2014-15'
+
+    >>> season_str(2000)
+    '1999-00'
+
+    >>> season_str(season_id('2014-15'))
+    '2014-15'
+    """
+    return '{0}-{1:02d}'.format(season_id - 1, season_id % 100)
+
+def date_to_season_id(date):
+    """
+    Same season as `date_to_season_str`, as an id.
+
+    >>> date_to_season_id(datetime.date(2013, 2, 4))
+    2013
+
+    >>> date_to_season_id(datetime.date(2013, 9, 30))
+    2013
+
+    >>> date_to_season_id(datetime.date(2013, 10, 1))
+    2014
+
+    >>> season_str(date_to_season_id(datetime.date(2013, 12, 6)))
+    '2013-14'
+    """
+    return date.year + 1 if date.month >= SEASON_START_MONTH else date.year
+
+def dates_to_season_ids(dates):
+    """
+    Vectorized `date_to_season_id`: maps a sequence of dates (or a NumPy
+    datetime64 array) to season ids in one call. Returns a NumPy int
+    array when NumPy is installed, a list otherwise.
+
+    >>> dates = [datetime.date(2013, 2, 4), datetime.datetime(2006, 1, 1),
+    ...     datetime.date(2013, 9, 30), datetime.date(2013, 10, 1),
+    ...     datetime.date(2013, 12, 6)]
+    >>> [int(i) for i in dates_to_season_ids(dates)]
+    [2013, 2006, 2013, 2014, 2014]
+
+    >>> len(dates_to_season_ids([]))
+    0
+    """
+    # Imported here rather than with the module, which the web workers
+    # load on their first request
+    try:
+        import numpy as np
+    except ImportError:
+        return [date_to_season_id(date) for date in dates]
+    # datetime64[M] counts months since January 1970
+    months = np.asarray(dates, dtype='datetime64[D]').astype('datetime64[M]') \
+        .astype(np.int64)
+    return months // 12 + 1970 + (months % 12 + 1 >= SEASON_START_MONTH)
 
 def current_season(offset=0):
     """
@@ -245,6 +337,12 @@ def season_range(start, stop, step=1):
     '2005-06', '2006-07', '2007-08', '2008-09', 
     '2009-10', '2010-11', '2011-12', '2012-13']
 
+    Dates map to seasons as in `date_to_season_id`, so a date from October
+    on is in the season starting that year
+
+    >>> list(season_range(datetime.date(2002, 11, 5), datetime.date(2004, 12, 25)))
+    ['2002-03', '2003-04']
+
     >>> list(season_range('2014', '2002'))
     []
 
@@ -272,21 +370,21 @@ def season_range(start, stop, step=1):
     '1954-55']
     """
 
-    step_delta = step * YEAR_DELTA
-    # step_delta = step * datetime.timedelta(days=365)
-
-    if isinstance(start, datetime.datetime) or isinstance(start, datetime.date):
-        start_date = year_of_season(start.year)
+    if isinstance(start, datetime.date): # Includes datetime.datetime
+        start_id = date_to_season_id(start)
     else: 
-        start_date = year_of_season(start)
+        start_id = season_id(start)
 
-    if isinstance(stop, datetime.datetime) or isinstance(start, datetime.date):
-        stop_date = year_of_season(stop.year)
+    if isinstance(stop, datetime.date):
+        stop_id = date_to_season_id(stop)
     else: 
-        stop_date = year_of_season(stop)
+        stop_id = season_id(stop)
+
+    # Like datetime_range, counting down includes stop
+    if step < 0:
+        stop_id -= 1
 
-    return (date_to_season_str(current) for current in \
-        datetime_range(start_date, stop_date, step_delta))
+    return (season_str(current) for current in range(start_id, stop_id, step))
 
 def merge_dicts(*args):
     """
@@ -578,6 +676,7 @@ list_of_lists_to_iter_of_dicts = lambda lst, cols: (dict(zip(cols, row)) for row
 # deprecated
 list_of_lists_to_list_of_dicts = lambda lst, cols: list(list_of_lists_to_iter_of_dicts(lst, cols))
 
+# See common.columnar for variants that avoid building a dict per row
 split_dict_to_iter_of_dicts = lambda d, iterable_key, header_key: \
     iter_of_list_to_iter_of_dicts(d[iterable_key], d[header_key])
 
@@ -0,0 +1,123 @@
+"""
+Maintenance of the PlayerSeasonStats and TeamSeasonStats summary tables.
+
+Whenever boxscores are written, the summaries of the (player, season) and
+(team, season) pairs they belong to are recomputed from scratch, so that
+reloading or correcting a boxscore can't leave a total off by the old
+value. ``rebuild_season_stats`` recomputes all of them.
+"""
+
+from django.db import transaction, DEFAULT_DB_ALIAS
+from django.db.models import Count, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from nba import leaderboards
+from nba.boxscores import boxscore_model, sent_boxscores, traditional_boxscores
+from nba.models import (Boxscore, BoxscoreTraditional, BoxscoreTraditionalFlat,
+    Game, PlayerSeasonStats, TeamSeasonStats)
+from nba.signals import objects_loaded, is_loading
+
+# Keep IN (...) lists under SQLite's limit on query parameters
+CHUNK_SIZE = 500
+
+def chunks(lst, size=CHUNK_SIZE):
+    for i in range(0, len(lst), size):
+        yield lst[i:i+size]
+
+def season_totals(owner, using=DEFAULT_DB_ALIAS, **filters):
+    """
+    Per (``owner``, season) totals of the boxscores matching ``filters``,
+    where ``owner`` is 'player' or 'team'.
+    """
+    return traditional_boxscores(using) \
+        .filter(game__season__isnull=False, **filters) \
+        .values(owner, 'game__season') \
+        .annotate(games=Count('game', distinct=True), pts=Sum('pts'),
+            ast=Sum('ast'), reb=Sum('reb')) \
+        .order_by()
+
+def summary_rows(model, owner, totals):
+    rows = []
+    for row in totals:
+        summary = model(season_id=row['game__season'], games=row['games'],
+            pts=row['pts'], ast=row['ast'], reb=row['reb'],
+            **{owner + '_id': row[owner]})
+        summary.set_per_game()
+        rows.append(summary)
+    return rows
+
+def refresh_season_stats(players, teams, seasons, using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes the summaries of the given players and teams in the given
+    seasons.
+    """
+    seasons = list(seasons)
+    if not seasons:
+        return
+    with transaction.atomic(using=using):
+        for model, owner, owner_pks in ((PlayerSeasonStats, 'player', players),
+            (TeamSeasonStats, 'team', teams)):
+            # Every (owner, season) combination in the filter is replaced,
+            # pairs that no longer have any boxscores included.
+            for chunk in chunks(sorted(owner_pks)):
+                filters = {owner + '__in': chunk}
+                model.objects.using(using) \
+                    .filter(season__in=seasons, **filters).delete()
+                totals = season_totals(owner, using=using,
+                    game__season__in=seasons, **filters)
+                model.objects.using(using).bulk_create(summary_rows(model, owner, totals))
+    leaderboards.invalidate(seasons)
+
+def update_season_stats(boxscore_pks, using=DEFAULT_DB_ALIAS, model=None):
+    """
+    Recomputes the summaries the given boxscores count towards. The pks
+    are of ``model``, by default that of the configured layout.
+    """
+    boxscores = sent_boxscores(model or boxscore_model(), using)
+    players, teams, seasons = set(), set(), set()
+    for chunk in chunks(list(boxscore_pks)):
+        pairs = boxscores.filter(pk__in=chunk) \
+            .values_list('player', 'team', 'game__season').distinct()
+        for player, team, season in pairs:
+            if season is not None:
+                players.add(player)
+                teams.add(team)
+                seasons.add(season)
+    refresh_season_stats(players, teams, seasons, using=using)
+
+def rebuild_season_stats(using=DEFAULT_DB_ALIAS, batch_size=1000):
+    """
+    Recomputes every summary from all boxscores.
+    """
+    with transaction.atomic(using=using):
+        for model, owner in ((PlayerSeasonStats, 'player'), (TeamSeasonStats, 'team')):
+            model.objects.using(using).all().delete()
+            rows = summary_rows(model, owner, season_totals(owner, using=using))
+            model.objects.using(using).bulk_create(rows, batch_size=batch_size)
+    leaderboards.invalidate()
+
+@receiver(objects_loaded, sender=Boxscore)
+@receiver(objects_loaded, sender=BoxscoreTraditional)
+@receiver(objects_loaded, sender=BoxscoreTraditionalFlat)
+def boxscores_loaded(sender, pks, using, **kwargs):
+    update_season_stats(pks, using=using, model=sender)
+
+@receiver(post_save, sender=BoxscoreTraditional)
+@receiver(post_save, sender=BoxscoreTraditionalFlat)
+def boxscore_saved(sender, instance, raw, using, **kwargs):
+    # Fixture loading sends objects_loaded instead
+    if not raw and not is_loading():
+        update_season_stats([instance.pk], using=using, model=sender)
+
+@receiver(post_delete, sender=BoxscoreTraditional)
+@receiver(post_delete, sender=BoxscoreTraditionalFlat)
+def boxscore_deleted(sender, instance, using, **kwargs):
+    # The row is gone, but we still know where it counted
+    try:
+        season = instance.game.season_id
+    except Game.DoesNotExist:
+        # Deleted along with its game
+        return
+    refresh_season_stats([instance.player_id], [instance.team_id],
+        [season] if season else [], using=using)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+class NBAConfig(AppConfig):
+
+    name = 'nba'
+    verbose_name = 'NBA'
+
+    def ready(self):
+        # Connect signal receivers
+        import nba.aggregates
+        import nba.cache
+        import nba.head_to_head
+        import nba.hierarchy
+        import nba.thumbnails
@@ -0,0 +1,81 @@
+"""
+Traditional boxscores are stored in one of two layouts, chosen by the
+NBA_BOXSCORE_LAYOUT setting:
+
+* 'inherited' (the default): BoxscoreTraditional, a multi-table child of
+  Boxscore, so every row is two rows and every query a join.
+* 'flat': BoxscoreTraditionalFlat, one wide table.
+
+Both have the same fields, so code that reads boxscores through
+``boxscore_model`` or ``traditional_boxscores`` works on either. Existing
+rows are copied to the flat table by ``copy_to_flat`` (the
+``flatten_boxscores`` command), which keeps their primary keys.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.color import no_style
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from nba.models import Boxscore, BoxscoreTraditional, BoxscoreTraditionalFlat
+
+LAYOUTS = {
+    'inherited': BoxscoreTraditional,
+    'flat': BoxscoreTraditionalFlat,
+}
+
+STAT_FIELDS = ['pts', 'ast', 'reb']
+
+def boxscore_model():
+    layout = getattr(settings, 'NBA_BOXSCORE_LAYOUT', 'inherited')
+    try:
+        return LAYOUTS[layout]
+    except KeyError:
+        raise ImproperlyConfigured('NBA_BOXSCORE_LAYOUT must be one of %s, not %r' % (
+            ', '.join(sorted(LAYOUTS)), layout))
+
+def traditional_boxscores(using=DEFAULT_DB_ALIAS):
+    """
+    All traditional boxscores, from whichever table is in use.
+    """
+    return boxscore_model()._default_manager.using(using).all()
+
+def sent_boxscores(sender, using=DEFAULT_DB_ALIAS):
+    """
+    The traditional boxscores of the table ``sender`` (a model sending
+    ``objects_loaded`` or a model signal) is stored in, whichever layout
+    is configured. A Boxscore counts as its BoxscoreTraditional child.
+    """
+    model = BoxscoreTraditional if sender is Boxscore else sender
+    return model._default_manager.using(using).all()
+
+def copy_to_flat(using=DEFAULT_DB_ALIAS):
+    """
+    Replaces the contents of the flat table with the rows of the inherited
+    one, in a single ``INSERT ... SELECT``. Returns the number of rows.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    flat, child, parent = (model._meta for model in
+        (BoxscoreTraditionalFlat, BoxscoreTraditional, Boxscore))
+    ptr = child.get_ancestor_link(Boxscore).column
+
+    keys = ['game', 'team', 'player']
+    columns = [flat.pk.column] + [flat.get_field(name).column for name in keys + STAT_FIELDS]
+    selected = ['p.' + qn(parent.pk.column)] + \
+        ['p.' + qn(parent.get_field(name).column) for name in keys] + \
+        ['c.' + qn(child.get_field(name).column) for name in STAT_FIELDS]
+    sql = 'INSERT INTO {flat} ({columns}) SELECT {selected} FROM {child} c ' \
+        'INNER JOIN {parent} p ON p.{pk} = c.{ptr}'.format(
+            flat=qn(flat.db_table), columns=', '.join(qn(c) for c in columns),
+            selected=', '.join(selected), child=qn(child.db_table),
+            parent=qn(parent.db_table), pk=qn(parent.pk.column), ptr=qn(ptr))
+
+    with transaction.atomic(using=using):
+        BoxscoreTraditionalFlat.objects.using(using).all().delete()
+        cursor = connection.cursor()
+        cursor.execute(sql)
+        # The ids were copied, so move the sequence past them
+        for statement in connection.ops.sequence_reset_sql(no_style(), [BoxscoreTraditionalFlat]):
+            cursor.execute(statement)
+    return BoxscoreTraditionalFlat.objects.using(using).count()
@@ -0,0 +1,124 @@
+from django.db import (connections, transaction, DEFAULT_DB_ALIAS,
+    IntegrityError, DatabaseError)
+from django.utils.encoding import force_text
+
+from collections import OrderedDict
+import time
+
+# Backends that understand ``INSERT ... ON CONFLICT (...) DO UPDATE``
+# (PostgreSQL >= 9.5, SQLite >= 3.24). Everything else falls back to
+# saving one object at a time.
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+
+def upsert(model, objs, using=DEFAULT_DB_ALIAS):
+    """
+    Insert-or-update ``objs`` into the table of ``model`` with as few
+    statements as the backend allows, keyed on the primary key.
+
+    Only the model's local concrete fields are written, which is exactly
+    what a fixture entry holds for a multi-table inheritance child (the
+    parent row is an entry of its own). Like ``loaddata``, this is a raw
+    write: ``save()`` is not called and no model signals are sent.
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+
+    connection = connections[using]
+    opts = model._meta
+    fields = opts.local_concrete_fields
+
+    if connection.vendor not in UPSERT_VENDORS:
+        for obj in objs:
+            obj.save(using=using)
+        return len(objs)
+
+    # Objects whose primary key could not be resolved (e.g. natural keys
+    # for rows that don't exist yet) have nothing to conflict on.
+    keyed = [obj for obj in objs if obj.pk is not None]
+    for obj in objs:
+        if obj.pk is None:
+            obj.save(using=using)
+
+    qn = connection.ops.quote_name
+    columns = [qn(f.column) for f in fields]
+    updates = ['{0} = EXCLUDED.{0}'.format(column) for column, f in \
+        zip(columns, fields) if not f.primary_key]
+
+    if updates:
+        on_conflict = 'DO UPDATE SET {0}'.format(', '.join(updates))
+    else:
+        on_conflict = 'DO NOTHING'
+
+    row = '({0})'.format(', '.join(['%s'] * len(fields)))
+    batch_size = max(connection.ops.bulk_batch_size(fields, keyed), 1)
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(keyed), batch_size):
+            batch = keyed[i:i+batch_size]
+            sql = 'INSERT INTO {table} ({columns}) VALUES {rows} ' \
+                'ON CONFLICT ({pk}) {on_conflict}'.format(
+                    table=qn(opts.db_table),
+                    columns=', '.join(columns),
+                    rows=', '.join([row] * len(batch)),
+                    pk=qn(opts.pk.column),
+                    on_conflict=on_conflict
+                )
+            params = [f.get_db_prep_save(f.pre_save(obj, False), connection) \
+                for obj in batch for f in fields]
+            cursor.execute(sql, params)
+
+    return len(objs)
+
+class BulkLoader(object):
+    """
+    Buffers deserialized objects and writes them ``batch_size`` at a time.
+
+    Each batch is grouped by model (in the order the models were first
+    seen, which for dumped fixtures is dependency order) and committed in
+    a transaction of its own. Rows written and time spent are tallied per
+    model so the caller can report throughput. If given, ``on_flush`` is
+    called with each model and the objects written once a batch commits.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=1000, on_flush=None):
+        self.using = using
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.pending = OrderedDict()
+        self.pending_count = 0
+        self.stats = OrderedDict()
+
+    def add(self, obj):
+        self.pending.setdefault(obj.__class__, []).append(obj)
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_count:
+            return
+        with transaction.atomic(using=self.using):
+            for model, objs in self.pending.items():
+                start = time.time()
+                try:
+                    written = upsert(model, objs, using=self.using)
+                except (DatabaseError, IntegrityError) as e:
+                    e.args = ("Could not load batch of %d %s.%s object(s): %s" % (
+                        len(objs), model._meta.app_label,
+                        model._meta.object_name, force_text(e)),)
+                    raise
+                rows, seconds = self.stats.get(model, (0, 0.0))
+                self.stats[model] = (rows + written, seconds + time.time() - start)
+        if self.on_flush is not None:
+            for model, objs in self.pending.items():
+                self.on_flush(model, objs)
+        self.pending.clear()
+        self.pending_count = 0
+
+    def rates(self):
+        """
+        Yields ``(model, rows, rows_per_second)`` for every model written.
+        """
+        for model, (rows, seconds) in self.stats.items():
+            yield model, rows, rows / seconds if seconds else float('inf')
@@ -0,0 +1,138 @@
+"""
+Caching of rendered pages and template fragments of the nba app.
+
+Cached entries are never deleted; instead their keys include version
+numbers of what they were rendered from ('players', 'player:<pk>',
+'school:<pk>'), which the signal receivers below bump whenever that
+changes. Stale entries are then simply never read again and age out.
+
+Entries live in the cache named by the NBA_CACHE_ALIAS setting ('nba' by
+default). For invalidation to reach every process, e.g. the loaddata
+command and the gunicorn workers, it must be a backend shared between
+them (file-based, memcached, ...) rather than local-memory.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from nba.models import Person, Player, School, PlayerMembership
+from nba.signals import objects_loaded, is_loading
+
+import hashlib
+import time
+
+def get_cache():
+    return caches[getattr(settings, 'NBA_CACHE_ALIAS', 'nba')]
+
+def new_version():
+    # Never a version that was handed out before, even if the version key
+    # itself was evicted in the meantime.
+    return int(time.time() * 1000)
+
+def get_versions(names):
+    """
+    Current versions of ``names``, in one round trip to the cache.
+    """
+    cache = get_cache()
+    keys = ['version:' + name for name in names]
+    found = cache.get_many(keys)
+    missing = dict((key, new_version()) for key in keys if key not in found)
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+def bump(*names):
+    """
+    Invalidates everything cached under the given names.
+    """
+    cache = get_cache()
+    for name in names:
+        key = 'version:' + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
+
+def card_versions(players):
+    """
+    Version of the ``player_card`` fragment of each of ``players``, by pk.
+    """
+    names = []
+    for player in players:
+        names.append('player:{0}'.format(player.pk))
+        names.append('school:{0}'.format(player.school_id))
+    versions = get_versions(names)
+    return dict((player.pk, '{0}.{1}'.format(*versions[2*i:2*i+2])) \
+        for i, player in enumerate(players))
+
+class CacheResponseMixin(object):
+    """
+    Serves GET requests of a view from the cache, rendering and storing
+    the response on a miss. The key covers the full path (so every page
+    and filter is cached separately) and the versions of
+    ``cache_versions``.
+    """
+
+    cache_versions = ()
+    cache_timeout = 60 * 60 * 24
+
+    def get_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        versions = '.'.join(str(v) for v in get_versions(self.cache_versions))
+        return 'view:{0}:{1}:{2}'.format(self.__class__.__name__, path, versions)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super(CacheResponseMixin, self).dispatch(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super(CacheResponseMixin, self).dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if response.status_code == 200 and not response.cookies:
+            cache.set(key, (response.content, response['Content-Type']), self.cache_timeout)
+        return response
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def player_changed(sender, instance, **kwargs):
+    # Fixture loading sends objects_loaded instead
+    if not is_loading():
+        bump('players', 'player:{0}'.format(instance.pk))
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def school_changed(sender, instance, **kwargs):
+    if not is_loading():
+        bump('players', 'school:{0}'.format(instance.pk))
+
+@receiver(post_save, sender=PlayerMembership)
+@receiver(post_delete, sender=PlayerMembership)
+def membership_changed(sender, instance, **kwargs):
+    if not is_loading():
+        bump('players', 'player:{0}'.format(instance.player_id))
+
+@receiver(objects_loaded, sender=Person)
+@receiver(objects_loaded, sender=Player)
+def players_loaded(sender, pks, **kwargs):
+    bump('players', *['player:{0}'.format(pk) for pk in pks])
+
+@receiver(objects_loaded, sender=School)
+def schools_loaded(sender, pks, **kwargs):
+    bump('players', *['school:{0}'.format(pk) for pk in pks])
+
+@receiver(objects_loaded, sender=PlayerMembership)
+def memberships_loaded(sender, pks, using, **kwargs):
+    players = PlayerMembership.objects.using(using).filter(pk__in=pks) \
+        .values_list('player', flat=True).distinct()
+    bump('players', *['player:{0}'.format(pk) for pk in players])
@@ -0,0 +1,108 @@
+"""
+Content hashes for incremental loading: a fixture record is only
+deserialized and written if its hash differs from the one recorded (as a
+ContentDigest) the last time it was loaded.
+
+Hashes are taken of the raw records, before deserialization, so that
+looking up a chunk of them at once doesn't resolve the natural keys of
+records whose targets are further down the same fixture and not written
+yet.
+
+>>> record = {'model': 'nba.Game', 'fields': {'nba_id': '0021400001', 'home': ['1610612747']}}
+>>> record_key(record)
+u'nba.game:0021400001'
+>>> record_digest(record) == record_digest({'fields': {'home': ['1610612747'],
+...     'nba_id': '0021400001'}, 'model': 'nba.game'})
+True
+"""
+
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.encoding import force_text
+
+from nba.models import ContentDigest
+
+from collections import deque
+from itertools import islice
+import hashlib
+import json
+
+def record_key(record):
+    """
+    Key of the ContentDigest for a fixture record, e.g.
+    ``'nba.game:0021400001'``, or None if it has neither an nba_id nor a pk.
+    """
+    key = record.get('fields', {}).get('nba_id') or record.get('pk')
+    if key is None:
+        return None
+    return u'{0}:{1}'.format(force_text(record['model']).lower(), force_text(key))
+
+def record_digest(record):
+    """
+    SHA-1 of the field values (and many-to-many data) of a fixture record.
+    """
+    content = json.dumps([record['model'].lower(), record.get('fields', {})],
+        sort_keys=True)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+class DigestTracker(object):
+    """
+    Filters a stream of fixture records down to the ones that are new or
+    changed, counting what it lets through and what it skips.
+    """
+
+    # Keep IN (...) lists under SQLite's limit on query parameters
+    lookup_size = 500
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+
+    def changed(self, records):
+        """
+        Yields ``(record, content_digest)`` for every record in ``records``
+        that isn't known with the same digest. The caller should save
+        ``content_digest`` along with the object, unless it is None (the
+        object can't be tracked and is always written).
+        """
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.lookup_size))
+            if not chunk:
+                return
+
+            keyed = [(record, record_key(record), record_digest(record)) \
+                for record in chunk]
+            known = dict(ContentDigest.objects.using(self.using) \
+                .filter(key__in=[key for _, key, _ in keyed if key is not None]) \
+                .values_list('key', 'digest'))
+
+            for record, key, digest in keyed:
+                if key is None:
+                    self.inserted += 1
+                    yield record, None
+                elif key not in known:
+                    self.inserted += 1
+                    yield record, ContentDigest(key=key, digest=digest)
+                elif known[key] != digest:
+                    self.updated += 1
+                    yield record, ContentDigest(key=key, digest=digest)
+                else:
+                    self.skipped += 1
+
+    def deserialize(self, records, **options):
+        """
+        Yields ``(deserialized, content_digest)`` for the new or changed
+        ``records`` (see ``changed``). Each record is only deserialized once
+        the object before it has been consumed, so it may refer to that
+        object by natural key.
+        """
+        digests = deque()
+        def changed():
+            for record, digest in self.changed(records):
+                digests.append(digest)
+                yield record
+        for obj in PythonDeserializer(changed(), using=self.using, **options):
+            yield obj, digests.popleft()
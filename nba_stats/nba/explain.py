@@ -0,0 +1,149 @@
+"""
+Query plans of the canonical game and boxscore queries.
+
+``canonical_queries`` builds the querysets the site and the analysis jobs
+run most ("player game log", "team schedule by season", "games on date");
+``explain`` asks the database how it would run one, and ``full_scans``
+picks the tables it would read in full out of the plan. The
+``explain_queries`` command runs them against a generated dataset and
+fails if any query scans, so that a dropped or unusable index shows up
+before the tables are large enough for it to hurt.
+"""
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from collections import OrderedDict
+import datetime
+import re
+
+from nba.boxscores import boxscore_model, traditional_boxscores
+from nba.bulk import upsert
+from nba.models import Boxscore, Game, Player, Season, Team
+
+EXPLAIN = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+
+FULL_SCAN = {
+    # 'SCAN TABLE t' ('SCAN t' since SQLite 3.36), also when it walks a
+    # whole index ('... USING INDEX i') rather than searching it
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+def explain(queryset):
+    """
+    The lines of the plan ``queryset`` would be run with.
+    """
+    using = queryset.db
+    connection = connections[using]
+    try:
+        prefix = EXPLAIN[connection.vendor]
+    except KeyError:
+        raise NotImplementedError('No EXPLAIN support for %s' % connection.vendor)
+    sql, params = queryset.query.get_compiler(using).as_sql()
+    cursor = connection.cursor()
+    cursor.execute(prefix + sql, params)
+    # SQLite's plan rows end in the detail column, PostgreSQL's are one column
+    return [row[-1] for row in cursor.fetchall()]
+
+def full_scans(plan, vendor):
+    """
+    Names of the tables ``plan`` reads in full.
+    """
+    pattern = FULL_SCAN[vendor]
+    return [match.group(1) for line in plan for match in [pattern.search(line)] if match]
+
+def canonical_queries(using=DEFAULT_DB_ALIAS, player=None, team=None, season=None,
+    game=None, date=None):
+    """
+    The canonical queries, by name, for the given player, team, season,
+    game and date (by default the first of each in the database).
+    """
+    games = Game.objects.using(using)
+    game = game or games.order_by('pk').first()
+    player = player or Player.objects.using(using).order_by('pk').first()
+    team = team or Team.objects.using(using).order_by('pk').first()
+    season = season or Season.objects.using(using).order_by('pk').first()
+    date = date or games.exclude(date=None).values_list('date', flat=True).first()
+
+    return OrderedDict([
+        ('player game log', traditional_boxscores(using).filter(player=player) \
+            .select_related('game').order_by('game')),
+        ('player in game', traditional_boxscores(using).filter(game=game,
+            player=player)),
+        ('team schedule by season', games.filter(Q(home=team) | Q(away=team),
+            season=season).order_by('date')),
+        ('games on date', games.filter(date=date)),
+    ])
+
+def generate_dataset(using=DEFAULT_DB_ALIAS, teams=30, players=450, seasons=3,
+    games_per_season=1230, players_per_game=20):
+    """
+    Fills the database with a few seasons of made-up games and boxscores,
+    enough rows that using an index beats scanning, and returns the
+    arguments of ``canonical_queries`` to run on them. Meant to be run in
+    a transaction that is rolled back.
+    """
+    first_year = (Season.objects.using(using).order_by('-start_year') \
+        .values_list('start_year', flat=True).first() or 2000) + 1
+    season_objs = []
+    for year in range(first_year, first_year + seasons):
+        season = Season(start_year=year)
+        season.save(using=using)
+        season_objs.append(season)
+
+    team_objs = []
+    for i in range(teams):
+        team = Team(nba_id='explain-team-%d' % i, abbr='x%02d' % i,
+            city='Explain', nickname='Team %d' % i)
+        team.save(using=using)
+        team_objs.append(team)
+
+    player_objs = []
+    for i in range(players):
+        player = Player(nba_id='explain-player-%d' % i, first_name='Player',
+            last_name=str(i))
+        player.save(using=using)
+        player_objs.append(player)
+
+    games = []
+    for season in season_objs:
+        opening = datetime.date(season.start_year, 10, 28)
+        for i in range(games_per_season):
+            games.append(Game(nba_id='explain-game-%d-%d' % (season.start_year, i),
+                home=team_objs[i % teams], away=team_objs[(i + 1 + i // teams) % teams],
+                date=opening + datetime.timedelta(days=i * 170 // games_per_season),
+                season=season))
+    Game.objects.using(using).bulk_create(games)
+    games = list(Game.objects.using(using).filter(season__in=season_objs) \
+        .values_list('pk', 'home', 'away'))
+
+    model = boxscore_model()
+    table = Boxscore if model._meta.parents else model
+    next_pk = (table.objects.using(using).order_by('-pk') \
+        .values_list('pk', flat=True).first() or 0) + 1
+    boxscores = []
+    for i, (game, home, away) in enumerate(games):
+        for j in range(players_per_game):
+            boxscores.append(dict(pk=next_pk, game_id=game,
+                team_id=home if j % 2 else away,
+                player_id=player_objs[(i * players_per_game + j) % players].pk,
+                pts=j, ast=j % 7, reb=j % 11))
+            next_pk += 1
+
+    if model._meta.parents:
+        # bulk_create can't write multi-table children; write both tables
+        Boxscore.objects.using(using).bulk_create([Boxscore(**dict((key, row[key]) \
+            for key in ('pk', 'game_id', 'team_id', 'player_id'))) for row in boxscores])
+        upsert(model, [model(**row) for row in boxscores], using=using)
+    else:
+        model.objects.using(using).bulk_create([model(**row) for row in boxscores])
+
+    # Give the planner statistics about the new rows
+    connections[using].cursor().execute('ANALYZE')
+    first_game = Game.objects.using(using).get(pk=games[0][0])
+    return dict(player=player_objs[0], team=team_objs[0], season=season_objs[0],
+        game=first_game, date=first_game.date)
@@ -0,0 +1,152 @@
+"""
+Streaming export of Game and BoxscoreTraditional rows as NDJSON or CSV.
+
+Rows are read in primary key order, ``chunk_size`` at a time, each chunk
+seeking past the last key of the previous one, and written out as soon as
+they are read, so an export of any size holds a single chunk in memory and
+the first bytes go out after the first query.
+"""
+
+from django import forms
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import six
+from django.utils.encoding import force_bytes
+
+from collections import OrderedDict
+import csv
+
+from common.utils import season_id
+from nba.boxscores import traditional_boxscores
+from nba.models import Game, Team
+
+# Exported columns, by the lookup they are read from
+GAME_COLUMNS = OrderedDict([
+    ('id', 'pk'),
+    ('nba_id', 'nba_id'),
+    ('date', 'date'),
+    ('season', 'season__start_year'),
+    ('home', 'home__abbr'),
+    ('away', 'away__abbr'),
+    ('attendance', 'attendance'),
+    ('duration', 'duration'),
+])
+
+BOXSCORE_COLUMNS = OrderedDict([
+    ('id', 'pk'),
+    ('game', 'game__nba_id'),
+    ('date', 'game__date'),
+    ('season', 'game__season__start_year'),
+    ('team', 'team__abbr'),
+    ('player', 'player__nba_id'),
+    ('first_name', 'player__first_name'),
+    ('last_name', 'player__last_name'),
+    ('pts', 'pts'),
+    ('ast', 'ast'),
+    ('reb', 'reb'),
+])
+
+class ExportFilterForm(forms.Form):
+    """
+    Filters of an export, from its query string. ``season`` is given as
+    '2014-15' (or its id, 2015), ``team`` by abbreviation.
+    """
+
+    season = forms.CharField(required=False)
+    team = forms.CharField(required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+
+    def clean_season(self):
+        season = self.cleaned_data['season']
+        if not season:
+            return None
+        try:
+            # Seasons are stored by the year they start
+            return (int(season) if season.isdigit() else season_id(season)) - 1
+        except ValueError:
+            raise forms.ValidationError('Not a season: %(season)s',
+                params={'season': season})
+
+    def clean_team(self):
+        abbr = self.cleaned_data['team']
+        if not abbr:
+            return None
+        try:
+            return Team.objects.get(abbr=abbr.upper())
+        except Team.DoesNotExist:
+            raise forms.ValidationError('No such team: %(team)s',
+                params={'team': abbr})
+
+    def filter(self, queryset, game='', teams=('team',)):
+        """
+        Applies the filters to ``queryset``, reaching the game through the
+        ``game`` lookup prefix and matching the team on any of ``teams``.
+        """
+        data = self.cleaned_data
+        if data['season'] is not None:
+            queryset = queryset.filter(**{game + 'season__start_year': data['season']})
+        if data['start'] is not None:
+            queryset = queryset.filter(**{game + 'date__gte': data['start']})
+        if data['end'] is not None:
+            queryset = queryset.filter(**{game + 'date__lte': data['end']})
+        if data['team'] is not None:
+            q = Q()
+            for lookup in teams:
+                q |= Q(**{lookup: data['team']})
+            queryset = queryset.filter(q)
+        return queryset
+
+def games(form):
+    return form.filter(Game.objects.all(), teams=('home', 'away'))
+
+def boxscores(form):
+    return form.filter(traditional_boxscores(), game='game__')
+
+def iter_rows(queryset, columns, chunk_size=2000):
+    """
+    Yields the ``columns`` of every row of ``queryset`` as a dict, one
+    keyset-paged query of ``chunk_size`` rows at a time.
+    """
+    lookups = list(columns.values())
+    queryset = queryset.order_by('pk').values_list(*lookups)
+    pk = lookups.index('pk')
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield OrderedDict(zip(columns, row))
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][pk]
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+class Echo(object):
+    """
+    File-like object for csv.writer that hands back what it's given.
+    """
+
+    def write(self, value):
+        return value
+
+def csv_value(value):
+    # The Python 2 csv module only writes bytes
+    if six.PY2 and isinstance(value, six.text_type):
+        return force_bytes(value)
+    return value
+
+def csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(list(columns))
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row.values()])
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', lambda rows, columns: ndjson_lines(rows)),
+    'csv': ('text/csv', csv_lines),
+}
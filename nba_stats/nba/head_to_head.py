@@ -0,0 +1,170 @@
+"""
+Maintenance of the HeadToHead table.
+
+Games don't store their score, so a game's result comes from the sum of
+its boxscore points per team. When games or boxscores are written, the
+matchups of those games (the two teams in that season) are recomputed,
+along with the all-time rows (season None) of the same pairs of teams.
+Reading a record is then a single row, and a whole matrix one query (see
+``head_to_head_matrix``).
+"""
+
+from django.db import transaction, DEFAULT_DB_ALIAS
+from django.db.models import Q, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from collections import defaultdict
+
+from nba.aggregates import chunks
+from nba.boxscores import sent_boxscores, traditional_boxscores
+from nba.models import (Boxscore, BoxscoreTraditional, BoxscoreTraditionalFlat,
+    Game, HeadToHead)
+from nba.signals import objects_loaded, is_loading
+
+FIELDS = ['games', 'wins', 'losses', 'points_for', 'points_against']
+
+def tally(games, scores):
+    """
+    Per (team, opponent) totals of ``games``, (pk, home, away) tuples,
+    given the points of each team in each game as ``scores[game][team]``.
+    Games without points for both sides are left out.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    for game, home, away in games:
+        points = scores.get(game, {})
+        if home not in points or away not in points:
+            continue
+        for team, opponent in ((home, away), (away, home)):
+            row = totals[team, opponent]
+            row['games'] += 1
+            row['points_for'] += points[team]
+            row['points_against'] += points[opponent]
+            if points[team] > points[opponent]:
+                row['wins'] += 1
+            elif points[team] < points[opponent]:
+                row['losses'] += 1
+    return totals
+
+# Each pair is four query parameters, keep under SQLite's limit
+PAIRS_PER_QUERY = 100
+
+def matchup_filter(pairs, team='home', opponent='away'):
+    """
+    A Q matching rows where ``team`` and ``opponent`` are the two teams of
+    any of ``pairs``, in either order.
+    """
+    q = Q()
+    for a, b in pairs:
+        q |= Q(**{team: a, opponent: b}) | Q(**{team: b, opponent: a})
+    return q
+
+def refresh_head_to_head(matchups, using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes the records of ``matchups``, (season, team, opponent)
+    tuples, and the all-time records of their pairs of teams.
+    """
+    by_season = defaultdict(set)
+    for season, team, opponent in matchups:
+        by_season[season].add((min(team, opponent), max(team, opponent)))
+    if not by_season:
+        return
+    rows = HeadToHead.objects.using(using)
+    with transaction.atomic(using=using):
+        for season, pairs in sorted(by_season.items()):
+            for chunk in chunks(sorted(pairs), PAIRS_PER_QUERY):
+                games = list(Game.objects.using(using).filter(matchup_filter(chunk),
+                    season=season).values_list('pk', 'home', 'away'))
+                scores = defaultdict(dict)
+                for game_chunk in chunks([game for game, home, away in games]):
+                    points = traditional_boxscores(using).filter(game__in=game_chunk) \
+                        .values_list('game', 'team').annotate(pts=Sum('pts')).order_by()
+                    for game, team, pts in points:
+                        scores[game][team] = pts
+                rows.filter(matchup_filter(chunk, 'team', 'opponent'), season=season).delete()
+                rows.bulk_create([HeadToHead(team_id=team, opponent_id=opponent,
+                    season_id=season, **totals) \
+                    for (team, opponent), totals in tally(games, scores).items()])
+
+        pairs = sorted(set().union(*by_season.values()))
+        for chunk in chunks(pairs, PAIRS_PER_QUERY):
+            pair_rows = rows.filter(matchup_filter(chunk, 'team', 'opponent'))
+            pair_rows.filter(season=None).delete()
+            all_time = pair_rows.exclude(season=None).values('team', 'opponent') \
+                .annotate(**dict((field, Sum(field)) for field in FIELDS)).order_by()
+            rows.bulk_create([HeadToHead(team_id=row['team'],
+                opponent_id=row['opponent'], season=None,
+                **dict((field, row[field]) for field in FIELDS)) for row in all_time])
+
+def game_matchups(games):
+    """
+    The (season, home, away) of ``games``, a queryset, that count towards
+    a record.
+    """
+    return games.exclude(season=None).exclude(home=None).exclude(away=None) \
+        .values_list('season', 'home', 'away')
+
+def update_head_to_head(game_pks, using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes the matchups the given games count towards.
+    """
+    matchups = set()
+    for chunk in chunks(list(game_pks)):
+        matchups.update(game_matchups(Game.objects.using(using).filter(pk__in=chunk)))
+    refresh_head_to_head(matchups, using=using)
+
+def rebuild_head_to_head(using=DEFAULT_DB_ALIAS):
+    with transaction.atomic(using=using):
+        HeadToHead.objects.using(using).all().delete()
+        refresh_head_to_head(game_matchups(Game.objects.using(using)).distinct(),
+            using=using)
+
+def head_to_head(team, opponent, season=None, using=DEFAULT_DB_ALIAS):
+    """
+    The record of ``team`` against ``opponent`` in ``season`` (all-time by
+    default), or an empty one if they haven't played.
+    """
+    try:
+        return HeadToHead.objects.using(using).get(team=team, opponent=opponent,
+            season=season)
+    except HeadToHead.DoesNotExist:
+        return HeadToHead(team=team, opponent=opponent, season=season)
+
+def head_to_head_matrix(teams, season=None, using=DEFAULT_DB_ALIAS):
+    """
+    Records between every two of ``teams`` in ``season`` (all-time by
+    default) by (team pk, opponent pk), in one query. Pairs that haven't
+    played are missing.
+    """
+    pks = [getattr(team, 'pk', team) for team in teams]
+    rows = HeadToHead.objects.using(using).filter(team__in=pks, opponent__in=pks,
+        season=season)
+    return dict(((row.team_id, row.opponent_id), row) for row in rows)
+
+@receiver(objects_loaded, sender=Game)
+def games_loaded(sender, pks, using, **kwargs):
+    update_head_to_head(pks, using=using)
+
+@receiver(objects_loaded, sender=Boxscore)
+@receiver(objects_loaded, sender=BoxscoreTraditional)
+@receiver(objects_loaded, sender=BoxscoreTraditionalFlat)
+def boxscores_loaded(sender, pks, using, **kwargs):
+    boxscores = sent_boxscores(sender, using)
+    games = set()
+    for chunk in chunks(list(pks)):
+        games.update(boxscores.filter(pk__in=chunk).values_list('game', flat=True))
+    update_head_to_head(games, using=using)
+
+@receiver(post_save, sender=Game)
+@receiver(post_save, sender=BoxscoreTraditional)
+@receiver(post_save, sender=BoxscoreTraditionalFlat)
+def result_saved(sender, instance, raw, using, **kwargs):
+    # Fixture loading sends objects_loaded instead
+    if not raw and not is_loading():
+        update_head_to_head([instance.pk if sender is Game else instance.game_id],
+            using=using)
+
+@receiver(post_delete, sender=BoxscoreTraditional)
+@receiver(post_delete, sender=BoxscoreTraditionalFlat)
+def boxscore_deleted(sender, instance, using, **kwargs):
+    update_head_to_head([instance.game_id], using=using)
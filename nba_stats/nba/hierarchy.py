@@ -0,0 +1,130 @@
+"""
+In-memory copy of the League > Conference > Division tree.
+
+The whole ``Group`` table is read in one query, in MPTT tree order, and
+every node is built as an instance of its subclass, so following a team
+up the tree (``Team.conference``, ``Team.league``) or grouping
+a list of teams by conference costs no queries. The tree hardly ever
+changes; any save or delete of a Group bumps the 'groups' version in the
+nba cache (see nba.cache), which makes every process reload it.
+"""
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from collections import OrderedDict
+
+from nba.cache import bump, get_versions
+from nba.models import Group, League, Conference, Division
+from nba.signals import objects_loaded
+
+SUBCLASSES = (League, Conference, Division)
+
+class GroupTree(object):
+    """
+    The groups of one database by pk, with their parent links.
+    """
+
+    def __init__(self, groups):
+        # In tree order, so parents come before their children
+        self.groups = OrderedDict((group.pk, group) for group in groups)
+
+    @classmethod
+    def load(cls, using=DEFAULT_DB_ALIAS):
+        fields = ['pk', 'name', 'parent', 'tree_id', 'lft', 'rght', 'level']
+        # The reverse one-to-one links tell which subclass a row belongs to
+        subclasses = [model._meta.model_name for model in SUBCLASSES]
+        rows = Group.objects.using(using).order_by('tree_id', 'lft') \
+            .values_list(*(fields + subclasses))
+
+        groups = []
+        for row in rows:
+            pk, name, parent, tree_id, lft, rght, level = row[:len(fields)]
+            model = Group
+            for subclass, child in zip(SUBCLASSES, row[len(fields):]):
+                if child is not None:
+                    model = subclass
+            group = model(id=pk, name=name, parent_id=parent, tree_id=tree_id,
+                lft=lft, rght=rght, level=level)
+            if model is not Group:
+                group.group_ptr_id = pk
+            group._state.adding = False
+            group._state.db = using
+            groups.append(group)
+        return cls(groups)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups.values())
+
+    def get(self, pk):
+        return self.groups.get(pk)
+
+    def parent(self, group):
+        return self.groups.get(group.parent_id)
+
+    def children(self, group):
+        return [child for child in self if child.parent_id == group.pk]
+
+    def ancestor(self, group, model):
+        """
+        The nearest of ``group`` and its ancestors that is a ``model``.
+        """
+        while group is not None and not isinstance(group, model):
+            group = self.parent(group)
+        return group
+
+    def division(self, team):
+        return self.get(team.division_id)
+
+    def conference(self, team):
+        return self.ancestor(self.division(team), Conference)
+
+    def league(self, team):
+        return self.ancestor(self.division(team), League)
+
+    def group_teams(self, teams, model=Conference):
+        """
+        ``teams`` grouped by their ``model`` ancestor, in tree order, with
+        teams without one under None at the end.
+        """
+        grouped = OrderedDict((group, []) for group in self if isinstance(group, model))
+        for team in teams:
+            grouped.setdefault(self.ancestor(self.division(team), model), []).append(team)
+        return OrderedDict((group, members) for group, members in grouped.items() if members)
+
+# Database alias -> (version, GroupTree)
+_trees = {}
+
+def group_tree(using=DEFAULT_DB_ALIAS):
+    """
+    The current GroupTree of database ``using``, loaded at most once per
+    version of the tree.
+    """
+    version = get_versions(['groups:' + using])[0]
+    try:
+        cached_version, tree = _trees[using]
+        if cached_version == version:
+            return tree
+    except KeyError:
+        pass
+    tree = GroupTree.load(using)
+    _trees[using] = (version, tree)
+    return tree
+
+def invalidate(using=DEFAULT_DB_ALIAS):
+    bump('groups:' + using)
+
+@receiver(post_save)
+@receiver(post_delete)
+def group_changed(sender, using, **kwargs):
+    if issubclass(sender, Group):
+        invalidate(using)
+
+@receiver(objects_loaded)
+def groups_loaded(sender, using, **kwargs):
+    if issubclass(sender, Group):
+        invalidate(using)
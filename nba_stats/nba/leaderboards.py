@@ -0,0 +1,86 @@
+"""
+Season leaderboards of players, read from PlayerSeasonStats.
+
+The summaries are kept current by nba.aggregates as boxscores load, and
+each (season, stat) pair has an index, so the top N of a stat is the
+first N entries of an index and a player's rank is a count over a range
+of it; neither sorts the season. Results are cached in the nba cache
+(see nba.cache) until the season's summaries are next refreshed.
+"""
+
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.cache import bump, get_cache, get_versions
+from nba.models import PlayerSeasonStats
+from nba.signals import after_loading
+
+TOTALS = ('pts', 'ast', 'reb')
+PER_GAME = ('pts_per_game', 'ast_per_game', 'reb_per_game')
+STATS = TOTALS + PER_GAME
+
+# Games needed to qualify for a per-game leaderboard by default
+MIN_GAMES = 20
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+def season_pk(season):
+    return getattr(season, 'pk', season)
+
+def qualifying(season, stat, min_games=None, using=DEFAULT_DB_ALIAS):
+    if stat not in STATS:
+        raise ValueError('Unknown leaderboard stat: %s' % stat)
+    if min_games is None:
+        min_games = MIN_GAMES if stat in PER_GAME else 0
+    queryset = PlayerSeasonStats.objects.using(using).filter(season=season_pk(season))
+    if min_games:
+        queryset = queryset.filter(games__gte=min_games)
+    return queryset
+
+def cache_key(using, season, *args):
+    versions = get_versions(['leaderboards', 'leaderboard:{0}'.format(season_pk(season))])
+    return 'leaderboard:{0}:{1}:{2}:{3}'.format(using, season_pk(season),
+        ':'.join(str(arg) for arg in args), '.'.join(str(v) for v in versions))
+
+def top(season, stat, n=10, min_games=None, using=DEFAULT_DB_ALIAS):
+    """
+    The ``n`` players with the highest ``stat`` in ``season``, as a list
+    of PlayerSeasonStats with their player, ties broken by player.
+    """
+    key = cache_key(using, season, 'top', stat, n, min_games)
+    leaders = get_cache().get(key)
+    if leaders is None:
+        leaders = list(qualifying(season, stat, min_games, using) \
+            .select_related('player').order_by('-' + stat, 'player')[:n])
+        get_cache().set(key, leaders, CACHE_TIMEOUT)
+    return leaders
+
+def rank(player, season, stat, min_games=None, using=DEFAULT_DB_ALIAS):
+    """
+    The rank of ``player`` in ``season`` by ``stat`` (1 for the leader,
+    players tied sharing a rank), or None if they don't qualify.
+    """
+    key = cache_key(using, season, 'rank', getattr(player, 'pk', player), stat, min_games)
+    cache = get_cache()
+    result = cache.get(key)
+    if result is None:
+        queryset = qualifying(season, stat, min_games, using)
+        value = queryset.filter(player=player).values_list(stat, flat=True).first()
+        if value is None:
+            result = (None,)
+        else:
+            result = (queryset.filter(**{stat + '__gt': value}).count() + 1,)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result[0]
+
+def invalidate(seasons=None):
+    """
+    Drops the cached leaderboards of ``seasons`` (pks), or of all seasons,
+    once any fixture loading in progress is over (see
+    ``nba.signals.after_loading``): until its transaction commits, a
+    request would cache the old standings again under the new version.
+    """
+    if seasons is None:
+        after_loading(bump, 'leaderboards')
+    else:
+        for season in seasons:
+            after_loading(bump, 'leaderboard:{0}'.format(season))
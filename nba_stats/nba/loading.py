@@ -0,0 +1,80 @@
+from django.apps import apps
+
+from common.jsonstream import iter_json_array, iter_json_lines
+from nba.serializers import open_stream
+
+# Formats whose model names we can read without deserializing (and hence
+# without resolving natural keys against rows that may not exist yet).
+SCANNABLE_FORMATS = {
+    'json': iter_json_array,
+    'jsonl': iter_json_lines,
+}
+
+def model_dependencies(model):
+    """
+    The concrete models ``model`` holds a foreign key (or parent link) to,
+    not counting itself.
+    """
+    return set(f.rel.to._meta.concrete_model for f in model._meta.concrete_fields \
+        if f.rel is not None and f.rel.to._meta.concrete_model is not model)
+
+def model_closure(model, _memo={}):
+    """
+    Every concrete model ``model`` depends on, directly or through a chain
+    of foreign keys (so Boxscore depends on Game, Team and, via Game,
+    Season).
+    """
+    model = model._meta.concrete_model
+    if model not in _memo:
+        _memo[model] = closure = set()
+        for dep in model_dependencies(model):
+            closure.add(dep)
+            closure.update(model_closure(dep))
+    return _memo[model]
+
+def fixture_models(fixture, ser_fmt):
+    """
+    The set of models with objects in ``fixture``, or None if the format
+    can't be scanned.
+    """
+    try:
+        iterate = SCANNABLE_FORMATS[ser_fmt]
+    except KeyError:
+        return None
+    return set(apps.get_model(d['model']) for d in iterate(open_stream(fixture)))
+
+def layer_fixtures(fixture_models):
+    """
+    Groups fixtures into layers that can be loaded in order, such that no
+    fixture in a layer holds objects that another fixture of the same or a
+    later layer refers to.
+
+    ``fixture_models`` is a sequence of ``(fixture, models)`` pairs.
+    Fixtures whose models are unknown (None), or that depend on each other
+    in a cycle, are loaded last, one per layer and in the given order.
+    """
+    known = [(f, models) for f, models in fixture_models if models is not None]
+    unknown = [f for f, models in fixture_models if models is None]
+
+    needs = {}
+    for fixture, models in known:
+        needs[fixture] = set()
+        for model in models:
+            needs[fixture].update(model_closure(model))
+
+    pending = dict((f, set(g for g, provides in known \
+        if g != f and needs[f] & provides)) for f, _ in known)
+
+    layers = []
+    while pending:
+        layer = [f for f, _ in known if f in pending and not pending[f]]
+        if not layer:
+            break
+        for fixture in layer:
+            del pending[fixture]
+        for deps in pending.values():
+            deps.difference_update(layer)
+        layers.append(layer)
+
+    cyclic = [f for f, _ in known if f in pending]
+    return layers + [[f] for f in cyclic + unknown]
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, DEFAULT_DB_ALIAS
+from django.db.models import Sum
+
+from nba.boxscores import LAYOUTS
+from nba.models import Game, Team, Player
+from nba.signals import loading
+
+from optparse import make_option
+import time
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+
+    help = ('Compares insert throughput and query latency of the inherited '
+        'and flat boxscore layouts. Inserted rows are rolled back. Query '
+        'timings are only comparable once flatten_boxscores has copied the '
+        'existing rows.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'benchmark. Defaults to the "default" database.'),
+        make_option('--rows', action='store', dest='rows', type='int',
+            default=2000, help='Number of rows to insert into each layout.'),
+        make_option('--repeat', action='store', dest='repeat', type='int',
+            default=5, help='Runs of each query, the best of which counts.'),
+    )
+
+    def handle(self, *args, **options):
+        using = options.get('database')
+        rows = options.get('rows')
+        repeat = options.get('repeat')
+
+        game = Game.objects.using(using).exclude(season=None).first()
+        team = Team.objects.using(using).first()
+        player = Player.objects.using(using).first()
+        if game is None or team is None or player is None:
+            raise CommandError('Benchmarking needs at least one game (with a '
+                'season), team and player in the database')
+
+        queries = [
+            ('player boxscores', lambda model: list(model.objects.using(using) \
+                .filter(player=player).values_list('game', 'pts', 'ast', 'reb'))),
+            ('season totals', lambda model: list(model.objects.using(using) \
+                .filter(game__season=game.season_id).values('player') \
+                .annotate(pts=Sum('pts')).order_by())),
+        ]
+
+        try:
+            # Summaries of rows that are rolled back aren't worth maintaining
+            with transaction.atomic(using=using), loading():
+                for layout, model in sorted(LAYOUTS.items()):
+                    objs = [model(game=game, team=team, player=player,
+                        pts=i % 50, ast=i % 15, reb=i % 20) for i in range(rows)]
+                    elapsed = self.time(lambda: [obj.save(using=using) for obj in objs])
+                    self.report(layout, 'save()', '%.0f rows/s' % (rows / elapsed))
+
+                    if not model._meta.parents:
+                        # bulk_create can't insert multi-table children
+                        objs = [model(game=game, team=team, player=player,
+                            pts=0, ast=0, reb=0) for i in range(rows)]
+                        elapsed = self.time(lambda: model.objects.using(using).bulk_create(objs))
+                        self.report(layout, 'bulk_create()', '%.0f rows/s' % (rows / elapsed))
+
+                    self.report(layout, 'rows', '%d' % model.objects.using(using).count())
+                    for name, query in queries:
+                        elapsed = min(self.time(lambda: query(model)) for i in range(repeat))
+                        self.report(layout, name, '%.2f ms' % (elapsed * 1000))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def time(self, func):
+        start = time.time()
+        func()
+        return max(time.time() - start, 1e-9)
+
+    def report(self, layout, name, value):
+        self.stdout.write('%-10s %-16s %14s' % (layout, name, value))
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.models import Season
+from nba.rolling import GameLogs, write_rolling_stats
+from nba.snapshots import list_snapshots, open_snapshot, season_name
+
+from optparse import make_option
+import time
+
+class Command(BaseCommand):
+
+    help = ('Computes the rolling averages and streaks of every player in the '
+        'given seasons (e.g. 2014-15), or in every season.')
+    args = '[season season ...]'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'compute the statistics in. Defaults to the "default" database.'),
+        make_option('--snapshots', action='store', dest='snapshots', default=None,
+            help='Read the game logs from the boxscore snapshots in this '
+                'directory (see snapshot_boxscores) where there is one.'),
+    )
+
+    def handle(self, *seasons, **options):
+        using = options.get('database')
+        directory = options.get('snapshots')
+        verbosity = int(options.get('verbosity'))
+        snapshots = set(list_snapshots(directory)) if directory else set()
+
+        queryset = Season.objects.using(using).order_by('start_year')
+        if seasons:
+            try:
+                names = set(season_name(season) for season in seasons)
+            except ValueError as e:
+                raise CommandError(e)
+            queryset = [season for season in queryset if season_name(season) in names]
+
+        for season in queryset:
+            start = time.time()
+            try:
+                if season_name(season) in snapshots:
+                    logs = GameLogs.from_snapshot(open_snapshot(directory, season))
+                else:
+                    logs = GameLogs.from_database(season, using=using)
+            except ImportError as e:
+                raise CommandError(e)
+            rows = write_rolling_stats(season, logs, using=using)
+            if verbosity >= 1:
+                self.stdout.write('Computed %d rolling rows of %s in %.1fs' % (
+                    rows, season_name(season), time.time() - start))
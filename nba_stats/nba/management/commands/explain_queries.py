@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from nba.explain import canonical_queries, explain, full_scans, generate_dataset
+from nba.signals import loading
+
+from optparse import make_option
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+
+    help = ('Prints the query plans of the canonical game and boxscore '
+        'queries on a generated dataset (rolled back afterwards), and fails '
+        'if any of them scans a whole table. The indexes they rely on are '
+        'declared on the models, which syncdb only creates with new tables: '
+        'on an existing database, create them with the SQL printed by '
+        '"manage.py sqlindexes nba" first.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'explain the queries on. Defaults to the "default" database.'),
+        make_option('--no-generate', action='store_false', dest='generate',
+            default=True, help='Explain the queries on the existing data '
+                'instead of a generated dataset.'),
+        make_option('--seasons', action='store', dest='seasons', type='int',
+            default=3, help='Number of seasons of games to generate.'),
+    )
+
+    def handle(self, *args, **options):
+        using = options.get('database')
+        verbosity = int(options.get('verbosity'))
+        vendor = connections[using].vendor
+        scans = []
+
+        try:
+            with transaction.atomic(using=using), loading():
+                if options.get('generate'):
+                    objects = generate_dataset(using=using, seasons=options.get('seasons'))
+                else:
+                    objects = {}
+
+                for name, queryset in canonical_queries(using=using, **objects).items():
+                    try:
+                        plan = explain(queryset)
+                    except NotImplementedError as e:
+                        raise CommandError(e)
+                    tables = full_scans(plan, vendor)
+                    if tables:
+                        scans.append(name)
+                    if verbosity >= 1:
+                        self.stdout.write('%s: %s' % (name,
+                            'full scan of %s' % ', '.join(tables) if tables else 'ok'))
+                    if verbosity >= 2 or tables:
+                        for line in plan:
+                            self.stdout.write('    %s' % line)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if scans:
+            raise CommandError('Full table scans in: %s (are the indexes from '
+                '"manage.py sqlindexes nba" created?)' % ', '.join(scans))
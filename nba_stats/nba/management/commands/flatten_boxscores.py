@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.boxscores import copy_to_flat
+
+from optparse import make_option
+
+class Command(BaseCommand):
+
+    help = ('Copies the BoxscoreTraditional rows to the flat '
+        'BoxscoreTraditionalFlat table, replacing its contents. Run it before '
+        'setting NBA_BOXSCORE_LAYOUT to "flat".')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'copy the boxscores in. Defaults to the "default" database.'),
+    )
+
+    def handle(self, *args, **options):
+        rows = copy_to_flat(using=options.get('database'))
+        if int(options.get('verbosity')) >= 1:
+            self.stdout.write("Copied %d boxscores to the flat table" % rows)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.models import Player, Team
+from nba.thumbnails import schedule
+
+from optparse import make_option
+
+class Command(BaseCommand):
+
+    help = ('Generates the resized variants of every player photo and team '
+        'logo that lacks them (or of all, with --force).')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'read the players and teams from. Defaults to the "default" database.'),
+        make_option('--force', action='store_true', dest='force', default=False,
+            help='Regenerate variants that are up to date.'),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            import PIL
+        except ImportError:
+            raise CommandError('Generating thumbnails requires Pillow')
+        using = options.get('database')
+        results = []
+        for model, field in ((Player, 'photo'), (Team, 'logo')):
+            queryset = model.objects.using(using).exclude(**{field: ''}) \
+                .exclude(**{field: None}).only('pk', field)
+            for instance in queryset.iterator():
+                results.append(schedule(getattr(instance, field), force=options.get('force')))
+        for result in results:
+            result.wait()
+        if int(options.get('verbosity')) >= 1:
+            self.stdout.write('Processed %d images' % len(results))
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from optparse import make_option
+import json
+import os
+import subprocess
+import sys
+
+class Command(BaseCommand):
+
+    help = ('Starts fresh interpreters that load the WSGI application and '
+        'serve one request, as a new web worker does, and reports the '
+        'slowest imports and the time to the first response. Fails if that '
+        'time is over --budget, for CI.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--path', action='store', dest='path', default='/nba/players/',
+            help='Path of the first request. Defaults to "/nba/players/".'),
+        make_option('--budget', action='store', dest='budget', type='float',
+            default=getattr(settings, 'STARTUP_BUDGET', None),
+            help='Most milliseconds the first response may take. Defaults '
+                'to the STARTUP_BUDGET setting, if any.'),
+        make_option('--repeat', action='store', dest='repeat', type='int',
+            default=3, help='Number of cold starts to measure; the fastest '
+                'is reported. Defaults to 3.'),
+        make_option('--limit', action='store', dest='limit', type='int',
+            default=20, help='Number of imports to list, slowest first.'),
+    )
+
+    def run(self, path):
+        process = subprocess.Popen([sys.executable, '-m', 'nba_stats.startup', path],
+            cwd=settings.BASE_DIR, env=dict(os.environ), stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        out, err = process.communicate()
+        if process.returncode:
+            raise CommandError('Starting the application failed:\n%s' %
+                err.decode('utf-8', 'replace'))
+        return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        budget = options.get('budget')
+        verbosity = int(options.get('verbosity'))
+
+        runs = [self.run(options.get('path')) for i in range(max(options.get('repeat'), 1))]
+        result = min(runs, key=lambda run: run['first_request'])
+        imports = result['imports']
+
+        if verbosity >= 1:
+            self.stdout.write('%10s %10s  module' % ('self ms', 'total ms'))
+            for name in sorted(imports, key=lambda name: -imports[name]['self']) \
+                [:options.get('limit')]:
+                self.stdout.write('%10.1f %10.1f  %s' % (imports[name]['self'] * 1000,
+                    imports[name]['cumulative'] * 1000, name))
+            self.stdout.write('%d modules imported' % len(imports))
+            self.stdout.write('Application loaded in %.1f ms' % (result['load'] * 1000))
+            self.stdout.write('First response (%s) in %.1f ms' % (result['status'],
+                result['first_request'] * 1000))
+
+        status = result['status']
+        # A 4xx is as unrepresentative of a real first request as a 5xx
+        if not status or status[0] not in '23':
+            raise CommandError('The first request to %s failed with %s' % (
+                options.get('path'), status or 'no response'))
+        if budget is not None and result['first_request'] * 1000 > budget:
+            raise CommandError('Startup took %.1f ms, over the budget of %.1f ms' % (
+                result['first_request'] * 1000, budget))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.head_to_head import rebuild_head_to_head
+from nba.models import HeadToHead
+
+from optparse import make_option
+
+class Command(BaseCommand):
+
+    help = 'Recomputes the head-to-head records of all teams from all games.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'rebuild the records in. Defaults to the "default" database.'),
+    )
+
+    def handle(self, *args, **options):
+        using = options.get('database')
+        rebuild_head_to_head(using=using)
+        if int(options.get('verbosity')) >= 1:
+            self.stdout.write("Rebuilt %d head-to-head records" % (
+                HeadToHead.objects.using(using).count()))
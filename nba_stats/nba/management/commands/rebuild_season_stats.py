@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.aggregates import rebuild_season_stats
+from nba.models import PlayerSeasonStats, TeamSeasonStats
+
+from optparse import make_option
+
+class Command(BaseCommand):
+
+    help = 'Recomputes the player and team season summaries from all boxscores.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'rebuild the summaries in. Defaults to the "default" database.'),
+    )
+
+    def handle(self, *args, **options):
+        using = options.get('database')
+        rebuild_season_stats(using=using)
+        if int(options.get('verbosity')) >= 1:
+            self.stdout.write("Rebuilt %d player and %d team season summaries" % (
+                PlayerSeasonStats.objects.using(using).count(),
+                TeamSeasonStats.objects.using(using).count()))
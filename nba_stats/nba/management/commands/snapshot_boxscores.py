@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from nba.models import Season
+from nba.snapshots import season_name, write_snapshot
+
+from optparse import make_option
+
+class Command(BaseCommand):
+
+    help = ('Writes columnar snapshots of the boxscores of the given seasons '
+        '(e.g. 2014-15), or of every season, for nba.snapshots.open_snapshot.')
+    args = '[season season ...]'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'read the boxscores from. Defaults to the "default" database.'),
+        make_option('--directory', action='store', dest='directory',
+            default=getattr(settings, 'NBA_SNAPSHOT_DIR', 'snapshots'),
+            help='Directory to write the snapshots to. Defaults to the '
+                'NBA_SNAPSHOT_DIR setting or "snapshots".'),
+    )
+
+    def handle(self, *seasons, **options):
+        using = options.get('database')
+        directory = options.get('directory')
+        verbosity = int(options.get('verbosity'))
+
+        queryset = Season.objects.using(using).order_by('start_year')
+        if seasons:
+            try:
+                names = set(season_name(season) for season in seasons)
+            except ValueError as e:
+                raise CommandError(e)
+            queryset = [season for season in queryset if season_name(season) in names]
+            missing = names - set(season_name(season) for season in queryset)
+            if missing:
+                raise CommandError('Unknown seasons: %s' % ', '.join(sorted(missing)))
+
+        for season in queryset:
+            try:
+                manifest = write_snapshot(directory, season, using=using)
+            except ImportError as e:
+                raise CommandError(e)
+            if verbosity >= 1:
+                self.stdout.write('Wrote %d boxscores of %s' % (
+                    manifest['rows'], manifest['season']))
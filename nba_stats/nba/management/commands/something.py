@@ -1,62 +1,333 @@
 from django.core.management.commands import loaddata
-from django.core.management.base import CommandError
+from django.core.management.commands.loaddata import (humanize,
+    SingleZipReader, has_bz2)
+from django.core.management.base import CommandError, OutputWrapper
 from django.core import serializers
+from django.apps import apps
 from django.db import (connections, router, transaction, DEFAULT_DB_ALIAS,
 	  IntegrityError, DatabaseError)
+from django.utils.encoding import force_text
+from django.utils.six import StringIO
 
+from nba import thumbnails
+from nba.bulk import BulkLoader
+from nba.digests import DigestTracker
+from nba.loading import fixture_models, layer_fixtures
+from nba.models import NBAModel
+from nba.natural_keys import NaturalKeyResolver
+from nba.serializers import record_reader
+from nba.signals import objects_loaded, loading
+
+from collections import defaultdict
+from optparse import make_option
+
+import gzip
+import multiprocessing
 import os
+import warnings
+
+if has_bz2:
+    import bz2
+
+def close_connections():
+    for connection in connections.all():
+        connection.close()
+
+def scan_fixture(args):
+    """
+    Pool worker: the models a fixture holds objects of (see
+    ``nba.loading.fixture_models``).
+    """
+    fixture_file, ser_fmt, open_method, mode = args
+    fixture = open_method(fixture_file, mode)
+    try:
+        return fixture_models(fixture, ser_fmt)
+    finally:
+        fixture.close()
+
+def load_fixture(args):
+    """
+    Pool worker: loads a single fixture file with a command of its own, on
+    this process's own database connection, and returns what it did.
+    """
+    fixture_file, options = args
+    out = StringIO()
+    command = Command()
+    command.stdout = OutputWrapper(out)
+    command.stderr = OutputWrapper(StringIO())
+    command.handle(fixture_file, **options)
+    return (command.fixture_count, command.loaded_object_count,
+        command.fixture_object_count, command.models,
+        (command.inserted, command.updated, command.skipped), out.getvalue())
 
 class Command(loaddata.Command):
 
+    option_list = loaddata.Command.option_list + (
+        make_option('--bulk', action='store_true', dest='bulk', default=False,
+            help='Write objects with batched upserts, one transaction per '
+                'batch, instead of saving them one at a time.'),
+        make_option('--batch-size', action='store', type='int',
+            dest='batch_size', default=1000,
+            help='Number of objects per batch in --bulk mode. Defaults to 1000.'),
+        make_option('--jobs', '-j', action='store', type='int', dest='jobs',
+            default=1,
+            help='Number of worker processes. Fixtures are ordered by the '
+                'foreign keys between their models and those that don\'t '
+                'depend on each other are loaded concurrently, each in its own '
+                'transaction. Needs a database that allows concurrent writers '
+                '(i.e. not SQLite). Defaults to 1.'),
+        make_option('--key-cache-size', action='store', type='int',
+            dest='key_cache_size', default=200000,
+            help='Maximum number of nba_id -> pk mappings kept in memory per '
+                'model to resolve natural keys. Defaults to 200000.'),
+        make_option('--incremental', action='store_true', dest='incremental',
+            default=False,
+            help='Only write objects whose content changed since they were '
+                'last loaded, keeping a content hash per object. Needs json '
+                'or jsonl fixtures.'),
+    )
+
+    def handle(self, *fixture_labels, **options):
+        self.bulk = options.get('bulk')
+        self.batch_size = options.get('batch_size')
+        self.jobs = options.get('jobs')
+        self.key_cache_size = options.get('key_cache_size')
+        self.incremental = options.get('incremental')
+
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        if self.jobs < 1:
+            raise CommandError('--jobs must be a positive integer')
+
+        # Wraps the whole load, so work deferred until it is over (see
+        # nba.signals.after_loading) happens after the stock command commits.
+        with loading():
+            self.handle_loading(*fixture_labels, **options)
+
+    def handle_loading(self, *fixture_labels, **options):
+        if not self.bulk and self.jobs == 1:
+            return super(Command, self).handle(*fixture_labels, **options)
+
+        self.ignore = options.get('ignore')
+        self.using = options.get('database')
+        self.app_label = options.get('app_label')
+        self.hide_empty = options.get('hide_empty', False)
+        self.verbosity = int(options.get('verbosity'))
+
+        # Unlike the stock command, the load isn't wrapped in one big
+        # transaction; every batch (or fixture, with --jobs) commits on its own.
+        self.worker_options = {
+            'database': self.using,
+            'ignore': self.ignore,
+            'hide_empty': True,
+            'verbosity': self.verbosity,
+            'bulk': self.bulk,
+            'batch_size': self.batch_size,
+            'jobs': 1,
+            'key_cache_size': self.key_cache_size,
+            'incremental': self.incremental,
+        }
+        self.loaddata(fixture_labels)
+
+        if transaction.get_autocommit(self.using):
+            connections[self.using].close()
+
+    def loaddata(self, fixture_labels):
+        # Tallies of --incremental
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+
+        if self.jobs == 1:
+            # Resolve natural keys of NBA objects from memory rather than
+            # with a query per reference.
+            self.resolver = NaturalKeyResolver(using=self.using,
+                maxsize=self.key_cache_size)
+            for model in apps.get_models():
+                if issubclass(model, NBAModel):
+                    self.resolver.prefetch(model)
+            with self.resolver.activate():
+                super(Command, self).loaddata(fixture_labels)
+            # Photos and logos loaded are resized by threads that die with
+            # the process (or the --jobs worker).
+            thumbnails.wait()
+        else:
+            self.loaddata_parallel(fixture_labels)
+
+        if self.incremental and self.verbosity >= 1:
+            self.stdout.write("Inserted %d, updated %d and skipped %d unchanged object(s)" %
+                (self.inserted, self.updated, self.skipped))
+
+    def loaddata_parallel(self, fixture_labels):
+        self.fixture_count = 0
+        self.loaded_object_count = 0
+        self.fixture_object_count = 0
+        self.models = set()
+
+        self.serialization_formats = serializers.get_public_serializer_formats()
+        self.compression_formats = {
+            None: (open, 'rb'),
+            'gz': (gzip.GzipFile, 'rb'),
+            'zip': (SingleZipReader, 'r'),
+        }
+        if has_bz2:
+            self.compression_formats['bz2'] = (bz2.BZ2File, 'r')
+
+        fixtures = []
+        for fixture_label in fixture_labels:
+            for fixture_file, _, _ in self.find_fixtures(fixture_label):
+                _, ser_fmt, cmp_fmt = self.parse_name(os.path.basename(fixture_file))
+                open_method, mode = self.compression_formats[cmp_fmt]
+                fixtures.append((fixture_file, ser_fmt, open_method, mode))
+
+        # Workers must not share the connection of the parent process
+        close_connections()
+        pool = multiprocessing.Pool(self.jobs, initializer=close_connections)
+        try:
+            models = pool.map(scan_fixture, fixtures)
+            layers = layer_fixtures(zip([f[0] for f in fixtures], models))
+            for i, layer in enumerate(layers):
+                if self.verbosity >= 2:
+                    self.stdout.write("Loading %d fixture(s) in layer %d of %d." %
+                        (len(layer), i+1, len(layers)))
+                tasks = [(fixture_file, self.worker_options) for fixture_file in layer]
+                for fixture_count, loaded, found, models, digests, output in \
+                    pool.map(load_fixture, tasks):
+                    self.fixture_count += fixture_count
+                    self.loaded_object_count += loaded
+                    self.fixture_object_count += found
+                    self.models.update(models)
+                    inserted, updated, skipped = digests
+                    self.inserted += inserted
+                    self.updated += updated
+                    self.skipped += skipped
+                    if self.verbosity >= 2:
+                        self.stdout.write(output, ending='')
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if self.verbosity >= 1:
+            if self.fixture_count == 0 and self.hide_empty:
+                pass
+            elif self.fixture_object_count == self.loaded_object_count:
+                self.stdout.write("Installed %d object(s) from %d fixture(s)" %
+                    (self.loaded_object_count, self.fixture_count))
+            else:
+                self.stdout.write("Installed %d object(s) (of %d) from %d fixture(s)" %
+                    (self.loaded_object_count, self.fixture_object_count, self.fixture_count))
+
     def load_label(self, fixture_label):
-	    """
-	    Loads fixtures files for a given label.
-	    """
-	    for fixture_file, fixture_dir, fixture_name in self.find_fixtures(fixture_label):
-	        _, ser_fmt, cmp_fmt = self.parse_name(os.path.basename(fixture_file))
-	        open_method, mode = self.compression_formats[cmp_fmt]
-	        fixture = open_method(fixture_file, mode)
-	        try:
-	            self.fixture_count += 1
-	            objects_in_fixture = 0
-	            loaded_objects_in_fixture = 0
-	            if self.verbosity >= 2:
-	                self.stdout.write("Installing %s fixture '%s' from %s." %
-	                    (ser_fmt, fixture_name, humanize(fixture_dir)))
-
-	            objects = serializers.deserialize(ser_fmt, fixture,
-	                using=self.using, ignorenonexistent=self.ignore)
-
-	            for obj in objects:
-	                objects_in_fixture += 1
-	                if router.allow_migrate(self.using, obj.object.__class__):
-	                    loaded_objects_in_fixture += 1
-	                    self.models.add(obj.object.__class__)
-	                    try:
-	                        # obj.save(using=self.using)
-	                        obj.object.save(using=self.using, force_update=True)
-	                    except (DatabaseError, IntegrityError) as e:
-	                        e.args = ("Could not load %(app_label)s.%(object_name)s(pk=%(pk)s): %(error_msg)s" % {
-	                            'app_label': obj.object._meta.app_label,
-	                            'object_name': obj.object._meta.object_name,
-	                            'pk': obj.object.pk,
-	                            'error_msg': force_text(e)
-	                        },)
-	                        raise
-
-	            self.loaded_object_count += loaded_objects_in_fixture
-	            self.fixture_object_count += objects_in_fixture
-	        except Exception as e:
-	            if not isinstance(e, CommandError):
-	                e.args = ("Problem installing fixture '%s': %s" % (fixture_file, e),)
-	            raise
-	        finally:
-	            fixture.close()
-
-	        # Warn if the fixture we loaded contains 0 objects.
-	        if objects_in_fixture == 0:
-	            warnings.warn(
-	                "No fixture data found for '%s'. (File format may be "
-	                "invalid.)" % fixture_name,
-	                RuntimeWarning
-	            )
\ No newline at end of file
+        """
+        Loads fixtures files for a given label.
+        """
+        for fixture_file, fixture_dir, fixture_name in self.find_fixtures(fixture_label):
+            _, ser_fmt, cmp_fmt = self.parse_name(os.path.basename(fixture_file))
+            open_method, mode = self.compression_formats[cmp_fmt]
+            fixture = open_method(fixture_file, mode)
+            try:
+                self.fixture_count += 1
+                objects_in_fixture = 0
+                loaded_objects_in_fixture = 0
+                if self.verbosity >= 2:
+                    self.stdout.write("Installing %s fixture '%s' from %s." %
+                        (ser_fmt, fixture_name, humanize(fixture_dir)))
+
+                if self.incremental:
+                    read_records = record_reader(ser_fmt)
+                    if read_records is None:
+                        raise CommandError("--incremental can't load %s fixtures" % ser_fmt)
+                    tracker = DigestTracker(using=self.using)
+                    objects = tracker.deserialize(read_records(fixture),
+                        ignorenonexistent=self.ignore)
+                else:
+                    objects = ((obj, None) for obj in serializers.deserialize(ser_fmt,
+                        fixture, using=self.using, ignorenonexistent=self.ignore))
+
+                if self.bulk:
+                    loader = BulkLoader(using=self.using, batch_size=self.batch_size,
+                        on_flush=self.send_loaded)
+                unsent = defaultdict(list)
+
+                for obj, digest in objects:
+                    objects_in_fixture += 1
+                    if router.allow_migrate(self.using, obj.object.__class__):
+                        loaded_objects_in_fixture += 1
+                        self.models.add(obj.object.__class__)
+                        if self.bulk:
+                            if obj.m2m_data:
+                                loader.flush()
+                                obj.save(using=self.using)
+                                unsent[obj.object.__class__].append(obj.object.pk)
+                            else:
+                                loader.add(obj.object)
+                        else:
+                            try:
+                                # obj.save(using=self.using)
+                                obj.object.save(using=self.using, force_update=True)
+                            except (DatabaseError, IntegrityError) as e:
+                                e.args = ("Could not load %(app_label)s.%(object_name)s(pk=%(pk)s): %(error_msg)s" % {
+                                    'app_label': obj.object._meta.app_label,
+                                    'object_name': obj.object._meta.object_name,
+                                    'pk': obj.object.pk,
+                                    'error_msg': force_text(e)
+                                },)
+                                raise
+                            unsent[obj.object.__class__].append(obj.object.pk)
+                            if loaded_objects_in_fixture % self.batch_size == 0:
+                                self.send_loaded_pks(unsent)
+                        if digest is not None:
+                            if self.bulk:
+                                loader.add(digest)
+                            else:
+                                digest.save(using=self.using)
+                        # Later objects may refer to this one by natural key
+                        # before it has been flushed in --bulk mode.
+                        if isinstance(obj.object, NBAModel) and obj.object.pk is not None:
+                            self.resolver.add(obj.object.__class__,
+                                obj.object.nba_id, obj.object.pk)
+
+                if self.bulk:
+                    loader.flush()
+                    if self.verbosity >= 2:
+                        for model, rows, rate in loader.rates():
+                            self.stdout.write("  %s.%s: %d row(s), %.1f rows/s" %
+                                (model._meta.app_label, model._meta.object_name, rows, rate))
+                self.send_loaded_pks(unsent)
+
+                if self.incremental:
+                    # Unchanged objects were found, but not loaded
+                    objects_in_fixture += tracker.skipped
+                    self.inserted += tracker.inserted
+                    self.updated += tracker.updated
+                    self.skipped += tracker.skipped
+
+                self.loaded_object_count += loaded_objects_in_fixture
+                self.fixture_object_count += objects_in_fixture
+            except Exception as e:
+                if not isinstance(e, CommandError):
+                    e.args = ("Problem installing fixture '%s': %s" % (fixture_file, e),)
+                raise
+            finally:
+                fixture.close()
+
+            # Warn if the fixture we loaded contains 0 objects.
+            if objects_in_fixture == 0:
+                warnings.warn(
+                    "No fixture data found for '%s'. (File format may be "
+                    "invalid.)" % fixture_name,
+                    RuntimeWarning
+                )
+
+    def send_loaded(self, model, objs):
+        objects_loaded.send(sender=model, pks=[obj.pk for obj in objs],
+            using=self.using)
+
+    def send_loaded_pks(self, unsent):
+        """
+        Sends objects_loaded for objects saved one at a time, which are
+        collected in ``unsent`` (model -> pks) to be sent in batches.
+        """
+        for model, pks in unsent.items():
+            objects_loaded.send(sender=model, pks=pks, using=self.using)
+        unsent.clear()
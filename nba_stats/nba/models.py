@@ -1,14 +1,24 @@
-from django.db import models
-from datetime import date, datetime
+from django.db import models, DEFAULT_DB_ALIAS
+from datetime import date
 from mptt.models import MPTTModel, TreeForeignKey
 
-from common.utils import datetime_count, YEAR_DELTA
-from itertools import islice
+from nba.natural_keys import active_resolver
 
 class NBAModelManager(models.Manager):
    
     def get_by_natural_key(self, nba_id):
-        return self.get(nba_id=nba_id)
+        resolver = active_resolver()
+        if resolver is None:
+            return self.get(nba_id=nba_id)
+        # Deserialization only needs the primary key, so don't fetch the row
+        pk = resolver.resolve(self.model, nba_id)
+        obj = self.model(pk=pk, nba_id=nba_id)
+        link = self.model._meta.pk
+        if link.rel:
+            # The primary key of a multi-table child (Player, Coach) is read
+            # through its parent, so cache one rather than have it fetched
+            setattr(obj, link.get_cache_name(), link.rel.to(pk=pk))
+        return obj
 
 # NBA Mixin
 class NBAModel(models.Model):
@@ -46,6 +56,8 @@ class Person(models.Model):
 
     class Meta:
         ordering = ['first_name', 'last_name']
+        # Keyset pagination seeks on the ordering
+        index_together = [['first_name', 'last_name']]
 
 class School(models.Model):
 
@@ -62,6 +74,9 @@ def player_photo_uploads_to(instance, filename):
 
 class Player(Person, NBAModel):
 
+    # Person's manager comes first otherwise, which has no natural keys
+    objects = NBAModelManager()
+
     photo = models.ImageField(
         upload_to = 'players', 
         null = True
@@ -118,9 +133,22 @@ class Team(NBAModel):
     def name(self):
         return '%s %s' % (self.city, self.nickname)
 
+    def group_tree(self):
+        from nba.hierarchy import group_tree
+        return group_tree(self._state.db or DEFAULT_DB_ALIAS)
+
+    @property
+    def cached_division(self):
+        "The team's division, from the cached group tree."
+        return self.group_tree().division(self)
+
     @property
     def conference(self):
-        return self.division.conference
+        return self.group_tree().conference(self)
+
+    @property
+    def league(self):
+        return self.group_tree().league(self)
 
     def __unicode__(self):
         return self.name
@@ -132,8 +160,9 @@ pair = lambda x: (x, x)
 
 class Season(models.Model):
 
-    YEARS = [pair(d.year) for d in \
-        islice(datetime_count(datetime.today(), -YEAR_DELTA), 10)]
+    # The last ten years, from this one; plain arithmetic, as this runs
+    # whenever a worker imports the models
+    YEARS = [pair(year) for year in range(date.today().year, date.today().year - 10, -1)]
 
     salary_cap = models.PositiveIntegerField(null=True)
     start_year = models.PositiveSmallIntegerField(choices=YEARS, unique=True)
@@ -151,31 +180,158 @@ class Game(NBAModel):
     away = models.ForeignKey(Team, related_name='away_games', null=True)
     attendance = models.PositiveIntegerField(null=True)
     duration = models.PositiveIntegerField(null=True)
-    date = models.DateField(null=True)
+    date = models.DateField(null=True, db_index=True)
     season = models.ForeignKey(Season, null=True)
 
     def __unicode__(self):
         return '{0} vs. {1} - {2}'.format(self.home.abbr, self.away.abbr, self.date)
 
+    class Meta:
+        # A team's schedule of a season, see nba.explain
+        index_together = [['home', 'season', 'date'], ['away', 'season', 'date']]
+
 class Boxscore(models.Model):
 
     game = models.ForeignKey(Game)
     team = models.ForeignKey(Team)
     player = models.ForeignKey(Player)
 
+    class Meta:
+        # A game's boxscores and a player's game log, see nba.explain
+        index_together = [['game', 'player'], ['player', 'game']]
+
 class BoxscoreTraditional(Boxscore):
    
     pts = models.PositiveIntegerField()
     ast = models.PositiveIntegerField()
     reb = models.PositiveIntegerField()
 
+class BoxscoreTraditionalFlat(models.Model):
+    """
+    BoxscoreTraditional in a single table, without the Boxscore parent row
+    to join and insert. Which of the two layouts is in use is set by the
+    NBA_BOXSCORE_LAYOUT setting, see nba.boxscores.
+    """
+
+    game = models.ForeignKey(Game)
+    team = models.ForeignKey(Team)
+    player = models.ForeignKey(Player)
+    pts = models.PositiveIntegerField()
+    ast = models.PositiveIntegerField()
+    reb = models.PositiveIntegerField()
+
+    class Meta:
+        index_together = [['game', 'player'], ['player', 'game']]
+
+class SeasonStats(models.Model):
+    """
+    Season totals of BoxscoreTraditional rows, maintained by
+    nba.aggregates as boxscores are loaded. The per-game averages are
+    stored too, so leaderboards can sort on them by index.
+    """
+
+    season = models.ForeignKey(Season)
+    games = models.PositiveIntegerField(default=0)
+    pts = models.PositiveIntegerField(default=0)
+    ast = models.PositiveIntegerField(default=0)
+    reb = models.PositiveIntegerField(default=0)
+    pts_per_game = models.FloatField(default=0.0)
+    ast_per_game = models.FloatField(default=0.0)
+    reb_per_game = models.FloatField(default=0.0)
+
+    def per_game(self, stat):
+        return float(getattr(self, stat)) / self.games if self.games else 0.0
+
+    def set_per_game(self):
+        for stat in ('pts', 'ast', 'reb'):
+            setattr(self, stat + '_per_game', self.per_game(stat))
+
+    class Meta:
+        abstract = True
+
+class PlayerSeasonStats(SeasonStats):
+
+    player = models.ForeignKey(Player, related_name='season_stats')
+
+    class Meta:
+        unique_together = ('player', 'season')
+        # Leaderboards, see nba.leaderboards
+        index_together = [
+            ['season', 'pts'],
+            ['season', 'ast'],
+            ['season', 'reb'],
+            ['season', 'pts_per_game'],
+            ['season', 'ast_per_game'],
+            ['season', 'reb_per_game'],
+        ]
+
+class TeamSeasonStats(SeasonStats):
+
+    team = models.ForeignKey(Team, related_name='season_stats')
+
+    class Meta:
+        unique_together = ('team', 'season')
+
+class PlayerGameRolling(models.Model):
+    """
+    A player's rolling averages over the last 5, 10 and 20 games up to and
+    including ``game``, and the streaks running at that game. Computed a
+    season at a time by nba.rolling.
+    """
+
+    player = models.ForeignKey(Player, related_name='rolling_stats')
+    game = models.ForeignKey(Game, related_name='+')
+    pts_avg_5 = models.FloatField()
+    pts_avg_10 = models.FloatField()
+    pts_avg_20 = models.FloatField()
+    ast_avg_5 = models.FloatField()
+    ast_avg_10 = models.FloatField()
+    ast_avg_20 = models.FloatField()
+    reb_avg_5 = models.FloatField()
+    reb_avg_10 = models.FloatField()
+    reb_avg_20 = models.FloatField()
+    # Consecutive games with 20+ points, and with a double-double
+    pts_20_streak = models.PositiveSmallIntegerField()
+    double_double_streak = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('player', 'game')
+
+class HeadToHead(models.Model):
+    """
+    Record of ``team`` against ``opponent`` in a season, or all-time when
+    ``season`` is None. Maintained by nba.head_to_head as games and
+    boxscores are loaded; there is a row for each side of a matchup.
+    """
+
+    team = models.ForeignKey(Team, related_name='head_to_head')
+    opponent = models.ForeignKey(Team, related_name='+')
+    season = models.ForeignKey(Season, null=True)
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    points_for = models.PositiveIntegerField(default=0)
+    points_against = models.PositiveIntegerField(default=0)
+
+    @property
+    def point_diff(self):
+        return self.points_for - self.points_against
+
+    def __unicode__(self):
+        return '{0} vs. {1}: {2}-{3}'.format(self.team.abbr, self.opponent.abbr,
+            self.wins, self.losses)
+
+    class Meta:
+        unique_together = ('team', 'opponent', 'season')
+
 class PlayerMembership(models.Model):
 
     player = models.ForeignKey(Player)
     team = models.ForeignKey(Team)
 
 class Coach(Person, NBAModel):
-    pass
+
+    objects = NBAModelManager()
 
 class CoachType(models.Model):
 
@@ -191,4 +347,16 @@ class CoachMembership(models.Model):
 class Salary(models.Model):
 
     amount = models.PositiveIntegerField()
-    contract = models.ForeignKey(PlayerMembership)
\ No newline at end of file
+    contract = models.ForeignKey(PlayerMembership)
+
+class ContentDigest(models.Model):
+    """
+    Hash of the content an object had when it was last loaded, keyed by
+    model and nba_id (or pk), so reloads can skip unchanged objects.
+    """
+
+    key = models.CharField(max_length=100, primary_key=True)
+    digest = models.CharField(max_length=40)
+
+    def __unicode__(self):
+        return self.key
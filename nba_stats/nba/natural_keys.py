@@ -0,0 +1,127 @@
+"""
+Bulk ``nba_id -> pk`` resolution for NBAModel subclasses.
+
+Deserializing a fixture that refers to games, teams and players by
+natural key normally costs one ``SELECT`` per reference. While a
+``NaturalKeyResolver`` is active (see ``activate``),
+``NBAModelManager.get_by_natural_key`` answers from its in-memory maps
+instead, which are filled in bulk by ``prefetch`` and fall back to a
+single query on a miss.
+"""
+
+from django.db import DEFAULT_DB_ALIAS
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+
+_active = threading.local()
+
+def active_resolver():
+    """
+    The resolver activated in this thread, or None.
+    """
+    return getattr(_active, 'resolver', None)
+
+class LRUCache(object):
+    """
+    A dict-like mapping holding at most ``maxsize`` items, discarding the
+    least recently used one when full.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __getitem__(self, key):
+        value = self.data.pop(key)
+        self.data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+class NaturalKeyResolver(object):
+    """
+    Maps ``nba_id`` to primary key for NBAModel subclasses, with one LRU
+    cache of at most ``maxsize`` entries per model.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, maxsize=200000, chunk_size=500):
+        self.using = using
+        self.maxsize = maxsize
+        self.chunk_size = chunk_size
+        self.caches = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cache(self, model):
+        model = model._meta.concrete_model
+        try:
+            return self.caches[model]
+        except KeyError:
+            cache = self.caches[model] = LRUCache(self.maxsize)
+            return cache
+
+    def prefetch(self, model, nba_ids=None):
+        """
+        Loads the keys of ``model`` in bulk: all of them (up to the size
+        of the cache), or just those in ``nba_ids``.
+        """
+        cache = self.cache(model)
+        queryset = model._default_manager.db_manager(self.using).all()
+
+        if nba_ids is None:
+            querysets = [queryset[:self.maxsize]]
+        else:
+            nba_ids = list(nba_ids)
+            querysets = [queryset.filter(nba_id__in=nba_ids[i:i+self.chunk_size]) \
+                for i in range(0, len(nba_ids), self.chunk_size)]
+
+        for queryset in querysets:
+            for nba_id, pk in queryset.values_list('nba_id', 'pk').iterator():
+                cache[nba_id] = pk
+
+    def add(self, model, nba_id, pk):
+        """
+        Records the key of an object that was (or is about to be) written.
+        """
+        self.cache(model)[nba_id] = pk
+
+    def resolve(self, model, nba_id):
+        """
+        The primary key of the ``model`` object with the given ``nba_id``.
+        Raises ``model.DoesNotExist`` if there is none.
+        """
+        cache = self.cache(model)
+        if nba_id in cache:
+            self.hits += 1
+            return cache[nba_id]
+
+        self.misses += 1
+        manager = model._default_manager.db_manager(self.using)
+        pk = manager.values_list('pk', flat=True).get(nba_id=nba_id)
+        cache[nba_id] = pk
+        return pk
+
+    @contextmanager
+    def activate(self):
+        """
+        Makes this the resolver used by ``get_by_natural_key`` in the
+        current thread for the duration of the ``with`` block.
+        """
+        previous = active_resolver()
+        _active.resolver = self
+        try:
+            yield self
+        finally:
+            _active.resolver = previous
@@ -0,0 +1,191 @@
+"""
+Keyset ("seek") pagination for list views.
+
+Instead of ``OFFSET n`` and a ``COUNT(*)`` per page, a page is fetched
+as the first ``paginate_by`` rows that sort after (or before) the last
+(or first) row of the page the visitor came from, given by an opaque
+cursor in the query string. With an index on the ordering columns this
+costs the same on page 1000 as on page 1.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+import base64
+import json
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, fields):
+    """
+    The values of a cursor, one for each of the model ``fields`` it seeks
+    on, converted by those fields. Anything that can't be (the cursors
+    are in URLs, so anything at all) is a 404.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise Http404('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise Http404('Invalid cursor')
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except ValidationError:
+        raise Http404('Invalid cursor')
+    # The keys aren't nullable, and a None can't be compared with
+    if None in values:
+        raise Http404('Invalid cursor')
+    return values
+
+def seek_filter(keys, values, forward=True):
+    """
+    Q object selecting the rows that sort strictly after (or before, if
+    not ``forward``) ``values`` when ordered by the ascending ``keys``::
+
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+
+    Keys must not be nullable.
+    """
+    lookup = 'gt' if forward else 'lt'
+    q = Q()
+    for i, key in enumerate(keys):
+        conditions = dict(zip(keys[:i], values[:i]))
+        conditions['{0}__{1}'.format(key, lookup)] = values[i]
+        q |= Q(**conditions)
+    return q
+
+def page_window(page, on_each_side=2, on_ends=1):
+    """
+    Page numbers to link to around the current page of a Paginator page,
+    with None where a range of pages is left out, e.g. for page 10 of 40:
+    ``[1, None, 8, 9, 10, 11, 12, None, 40]``.
+    """
+    last = page.paginator.num_pages
+    shown = set(range(1, min(on_ends, last) + 1))
+    shown.update(range(max(last - on_ends + 1, 1), last + 1))
+    shown.update(range(max(page.number - on_each_side, 1),
+        min(page.number + on_each_side, last) + 1))
+
+    window = []
+    for number in sorted(shown):
+        if window and number != window[-1] + 1:
+            window.append(None)
+        window.append(number)
+    return window
+
+class KeysetPage(object):
+    """
+    The keyset counterpart of ``django.core.paginator.Page``. There are no
+    page numbers; links to the neighbouring pages use ``next_cursor`` and
+    ``previous_cursor``.
+    """
+
+    def __init__(self, object_list, keys, has_next, has_previous):
+        self.object_list = object_list
+        self.keys = keys
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def cursor(self, obj):
+        return encode_cursor([getattr(obj, key) for key in self.keys])
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.cursor(self.object_list[0])
+
+class KeysetPaginationMixin(object):
+    """
+    Pages a MultipleObjectMixin view by keyset on the model's default
+    ordering (plus the primary key, to break ties), following the
+    ``after`` and ``before`` cursors in the query string.
+
+    Requests with a ``page`` parameter fall back to the usual numbered
+    pages, with a window of page numbers (see ``page_window``) in the
+    context as ``page_window``.
+    """
+
+    after_kwarg = 'after'
+    before_kwarg = 'before'
+
+    def get_keyset_keys(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        assert all(not key.startswith('-') for key in ordering), \
+            'Keyset pagination only supports ascending ordering'
+        return ordering + ['pk']
+
+    def get_keyset_fields(self, queryset, keys):
+        """
+        The fields that convert the cursor values of ``keys``: those of the
+        keys or, for relations (such as the parent link that is a Player's
+        pk), of the keys they point to.
+        """
+        opts = queryset.model._meta
+        fields = []
+        for key in keys:
+            field = opts.pk if key == 'pk' else opts.get_field(key)
+            while field.rel is not None:
+                field = field.rel.get_related_field()
+            fields.append(field)
+        return fields
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+
+        keys = self.get_keyset_keys(queryset)
+        fields = self.get_keyset_fields(queryset, keys)
+        after = self.request.GET.get(self.after_kwarg)
+        before = self.request.GET.get(self.before_kwarg)
+
+        if before is not None:
+            values = decode_cursor(before, fields)
+            queryset = queryset.filter(seek_filter(keys, values, forward=False)) \
+                .order_by(*['-' + key for key in keys])
+        else:
+            if after is not None:
+                queryset = queryset.filter(seek_filter(keys, decode_cursor(after, fields)))
+            queryset = queryset.order_by(*keys)
+
+        # One row more than a page tells whether there is another page
+        object_list = list(queryset[:page_size + 1])
+        has_more = len(object_list) > page_size
+        object_list = object_list[:page_size]
+
+        if before is not None:
+            object_list.reverse()
+            page = KeysetPage(object_list, keys, has_next=True, has_previous=has_more)
+        else:
+            page = KeysetPage(object_list, keys, has_next=has_more,
+                has_previous=after is not None)
+        return (None, page, object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super(KeysetPaginationMixin, self).get_context_data(**kwargs)
+        page = context.get('page_obj')
+        context['keyset'] = isinstance(page, KeysetPage)
+        if page is not None and not context['keyset']:
+            context['page_window'] = page_window(page)
+        return context
@@ -0,0 +1,129 @@
+"""
+Rolling averages and streaks over player game logs, for a whole season
+at once.
+
+A season's boxscores are loaded as one array per column (from the
+database, or from a snapshot written by ``snapshot_boxscores``), sorted
+so that each player's games are contiguous and in date order. Every
+statistic is then computed for all players in a single vectorized pass:
+windowed sums are differences of one cumulative sum, with the window cut
+off at the start of each player's block, and streaks are the distance
+to the last game that broke them.
+
+Results are written to PlayerGameRolling, a row per player and game.
+"""
+
+from django.db import transaction, DEFAULT_DB_ALIAS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from nba.boxscores import traditional_boxscores
+from nba.models import PlayerGameRolling
+from nba.snapshots import COLUMNS, iter_chunks
+
+WINDOWS = (5, 10, 20)
+STATS = ('pts', 'ast', 'reb')
+
+class GameLogs(object):
+    """
+    Columns of a season's boxscores (``player``, ``game``, ``date`` and
+    the stats) as arrays sorted by player, then date.
+    """
+
+    def __init__(self, columns):
+        if np is None:
+            raise ImportError('GameLogs requires numpy')
+        columns = dict((name, np.asarray(values)) for name, values in columns.items())
+        order = np.lexsort((columns['game'], columns['date'], columns['player']))
+        self.columns = dict((name, values[order]) for name, values in columns.items())
+
+        player = self.columns['player']
+        n = len(player)
+        # Index of the first row of each row's player
+        first = np.ones(n, dtype=bool)
+        first[1:] = player[1:] != player[:-1]
+        self.first_row = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        self.is_first = first
+
+    @classmethod
+    def from_database(cls, season, using=DEFAULT_DB_ALIAS, chunk_size=50000):
+        names = ['player', 'game', 'date'] + list(STATS)
+        lookups = [COLUMNS[name][0] for name in names]
+        queryset = traditional_boxscores(using).filter(game__season=season)
+        arrays = dict((name, []) for name in names)
+        for chunk in iter_chunks(queryset, lookups, chunk_size):
+            for name, values in zip(names, zip(*chunk)):
+                arrays[name].append(np.array(values, dtype=COLUMNS[name][1]))
+        return cls(dict((name, np.concatenate(parts) if parts else \
+            np.empty(0, dtype=COLUMNS[name][1])) for name, parts in arrays.items()))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(dict((name, snapshot[name]) for name in \
+            ['player', 'game', 'date'] + list(STATS)))
+
+    def __len__(self):
+        return len(self.columns['player'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rolling_mean(self, values, window):
+        """
+        Mean of ``values`` over each row and the ``window - 1`` before it
+        of the same player (fewer at the start of a player's season).
+        """
+        n = len(values)
+        cumsum = np.concatenate([[0], np.cumsum(values, dtype=np.float64)])
+        index = np.arange(n)
+        start = np.maximum(index - window + 1, self.first_row)
+        return (cumsum[index + 1] - cumsum[start]) / (index - start + 1)
+
+    def streak(self, condition):
+        """
+        Number of consecutive games up to and including each row, of the
+        same player, for which ``condition`` holds.
+        """
+        counts = np.cumsum(condition, dtype=np.int64)
+        # The count at the last game that broke the streak (or just before
+        # the player's first game); counts never decrease, so a running
+        # maximum finds the latest one.
+        breaks = np.where(~condition, counts, 0)
+        breaks = np.where(self.is_first & condition, counts - 1, breaks)
+        return counts - np.maximum.accumulate(breaks)
+
+    def compute(self):
+        """
+        All rolling statistics, by PlayerGameRolling field name.
+        """
+        results = {}
+        for stat in STATS:
+            values = self.columns[stat]
+            for window in WINDOWS:
+                results['{0}_avg_{1}'.format(stat, window)] = self.rolling_mean(values, window)
+
+        pts, ast, reb = (self.columns[stat] for stat in STATS)
+        results['pts_20_streak'] = self.streak(pts >= 20)
+        doubles = (pts >= 10).astype(np.int8) + (ast >= 10) + (reb >= 10)
+        results['double_double_streak'] = self.streak(doubles >= 2)
+        return results
+
+def write_rolling_stats(season, logs, using=DEFAULT_DB_ALIAS, batch_size=1000):
+    """
+    Replaces the PlayerGameRolling rows of ``season`` with those computed
+    from ``logs``. Returns the number of rows.
+    """
+    results = logs.compute()
+    fields = sorted(results)
+    # tolist() turns the numpy scalars into plain Python numbers at once
+    columns = [logs['player'].tolist(), logs['game'].tolist()] + \
+        [results[field].tolist() for field in fields]
+    rows = [PlayerGameRolling(player_id=row[0], game_id=row[1],
+        **dict(zip(fields, row[2:]))) for row in zip(*columns)]
+    with transaction.atomic(using=using):
+        PlayerGameRolling.objects.using(using).filter(game__season=season).delete()
+        PlayerGameRolling.objects.using(using).bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,35 @@
+"""
+Streaming fixture (de)serializers, registered through
+``SERIALIZATION_MODULES`` so that ``loaddata`` (and our own loader) read
+fixtures one object at a time instead of parsing them whole.
+"""
+
+import io
+import sys
+import zipfile
+
+from django.core import serializers
+from django.utils import six
+
+def open_stream(stream_or_string):
+    """
+    Normalizes what ``serializers.deserialize`` may be handed into a
+    file-like object that can be read incrementally.
+    """
+    if isinstance(stream_or_string, six.binary_type):
+        return io.BytesIO(stream_or_string)
+    if isinstance(stream_or_string, six.text_type):
+        return io.StringIO(stream_or_string)
+    if isinstance(stream_or_string, zipfile.ZipFile):
+        # loaddata's SingleZipReader only offers read() of the whole member
+        return stream_or_string.open(stream_or_string.namelist()[0])
+    return stream_or_string
+
+def record_reader(format):
+    """
+    The ``iter_records`` function of the serializer module for ``format``,
+    which reads the raw records of a fixture (the dicts handed to Django's
+    python deserializer) without deserializing them, or None if it has none.
+    """
+    deserializer = serializers.get_deserializer(format)
+    return getattr(sys.modules[deserializer.__module__], 'iter_records', None)
@@ -0,0 +1,33 @@
+"""
+Drop-in replacement for Django's JSON serializer whose deserializer yields
+objects as the fixture is read rather than after parsing all of it.
+"""
+
+import sys
+
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.json import Serializer  # dumping is unchanged
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.utils import six
+
+from common.jsonstream import iter_json_array
+from nba.serializers import open_stream
+
+def iter_records(stream_or_string):
+    """
+    The raw records of a stream or string of JSON data.
+    """
+    return iter_json_array(open_stream(stream_or_string))
+
+def Deserializer(stream_or_string, **options):
+    """
+    Deserialize a stream or string of JSON data.
+    """
+    try:
+        for obj in PythonDeserializer(iter_records(stream_or_string), **options):
+            yield obj
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        # Map to deserializer error
+        six.reraise(DeserializationError, DeserializationError(e), sys.exc_info()[2])
@@ -0,0 +1,56 @@
+"""
+JSON-lines serializer: one object per line, no enclosing array. Both
+dumping and loading work one object at a time.
+"""
+
+import json
+import sys
+
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.json import Serializer as JSONSerializer, \
+    DjangoJSONEncoder
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.utils import six
+
+from common.jsonstream import iter_json_lines
+from nba.serializers import open_stream
+
+class Serializer(JSONSerializer):
+    """
+    Convert a queryset to JSON lines.
+    """
+    internal_use_only = False
+
+    def start_serialization(self):
+        self._current = None
+        self.json_kwargs = self.options.copy()
+        for option in ('stream', 'fields', 'indent'):
+            self.json_kwargs.pop(option, None)
+
+    def end_serialization(self):
+        pass
+
+    def end_object(self, obj):
+        json.dump(self.get_dump_object(obj), self.stream,
+                  cls=DjangoJSONEncoder, **self.json_kwargs)
+        self.stream.write("\n")
+        self._current = None
+
+def iter_records(stream_or_string):
+    """
+    The raw records of a stream or string of JSON lines.
+    """
+    return iter_json_lines(open_stream(stream_or_string))
+
+def Deserializer(stream_or_string, **options):
+    """
+    Deserialize a stream or string of JSON lines.
+    """
+    try:
+        for obj in PythonDeserializer(iter_records(stream_or_string), **options):
+            yield obj
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        # Map to deserializer error
+        six.reraise(DeserializationError, DeserializationError(e), sys.exc_info()[2])
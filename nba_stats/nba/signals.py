@@ -0,0 +1,48 @@
+from django.dispatch import Signal
+
+from contextlib import contextmanager
+import threading
+
+# Sent by the loaddata command (nba/management/commands/something.py) for
+# each batch of objects it writes, with sender being the model and pks the
+# primary keys written. Code that derives data from loaded objects should
+# listen to this rather than to post_save, see `loading`.
+objects_loaded = Signal(providing_args=['pks', 'using'])
+
+_state = threading.local()
+
+def is_loading():
+    """
+    Whether fixtures are being loaded in this thread, in which case
+    post_save receivers should leave their work to objects_loaded, which
+    covers the same objects a batch at a time.
+    """
+    return getattr(_state, 'loading', False)
+
+def after_loading(function, *args):
+    """
+    Calls ``function(*args)`` once the loading in progress in this thread
+    is over, or at once if there is none. Calls repeated meanwhile are
+    made once. The loaddata command only leaves ``loading`` after its
+    transaction commits, so this is the place for work that must not see
+    the old data, such as invalidating caches.
+    """
+    if not is_loading():
+        function(*args)
+    elif (function, args) not in _state.deferred:
+        _state.deferred.append((function, args))
+
+@contextmanager
+def loading():
+    previous = is_loading()
+    if not previous:
+        _state.deferred = []
+    _state.loading = True
+    try:
+        yield
+    finally:
+        _state.loading = previous
+        if not previous:
+            deferred, _state.deferred = _state.deferred, []
+            for function, args in deferred:
+                function(*args)
@@ -0,0 +1,182 @@
+"""
+Columnar on-disk snapshots of the traditional boxscores, one per season.
+
+A snapshot is a directory named after the season ('2014-15') holding one
+raw little-endian array file per column and a ``manifest.json`` giving
+the row count and the dtype of each column. ``open_snapshot`` maps the
+files into memory rather than reading them, so opening a season costs a
+few system calls and aggregations run over the page cache::
+
+    >>> snapshot = open_snapshot('snapshots', '2014-15')  # doctest: +SKIP
+    >>> players, pts = group_sum(snapshot['player'], snapshot['pts'])  # doctest: +SKIP
+
+Snapshots are written by the ``snapshot_boxscores`` command.
+"""
+
+from django.db import DEFAULT_DB_ALIAS
+
+from collections import OrderedDict
+import datetime
+import json
+import os
+import shutil
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from common.utils import season_id, season_str
+from nba.boxscores import traditional_boxscores
+
+MANIFEST = 'manifest.json'
+VERSION = 1
+
+# Column name -> (lookup it is read from, dtype it is stored as)
+COLUMNS = OrderedDict([
+    ('game', ('game_id', '<i4')),
+    ('team', ('team_id', '<i4')),
+    ('player', ('player_id', '<i4')),
+    ('date', ('game__date', '<M8[D]')),
+    ('pts', ('pts', '<u2')),
+    ('ast', ('ast', '<u2')),
+    ('reb', ('reb', '<u2')),
+])
+
+def season_name(season):
+    """
+    Directory name of a season given as a Season, '2014-15' or its id.
+    """
+    if hasattr(season, 'start_year'):
+        return season_str(season.start_year + 1)
+    if isinstance(season, int):
+        return season_str(season)
+    return season_str(season_id(season))
+
+def iter_chunks(queryset, lookups, chunk_size):
+    """
+    Rows of ``queryset`` as ``values_list(*lookups)`` tuples, in lists of
+    ``chunk_size`` read by keyset on the primary key.
+    """
+    queryset = queryset.order_by('pk').values_list('pk', *lookups)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        if rows:
+            yield [row[1:] for row in rows]
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+def write_snapshot(root, season, using=DEFAULT_DB_ALIAS, chunk_size=50000):
+    """
+    Writes the snapshot of ``season`` (a Season) under ``root``, replacing
+    any previous one, and returns its manifest.
+    """
+    if np is None:
+        raise ImportError('write_snapshot requires numpy')
+
+    name = season_name(season)
+    path = os.path.join(root, name)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    queryset = traditional_boxscores(using).filter(game__season=season)
+    lookups = [lookup for lookup, dtype in COLUMNS.values()]
+    files = OrderedDict((column, open(os.path.join(tmp_path, column + '.bin'), 'wb')) \
+        for column in COLUMNS)
+    rows = 0
+    try:
+        # Appending column by column holds one chunk in memory at a time
+        for chunk in iter_chunks(queryset, lookups, chunk_size):
+            for (column, (lookup, dtype)), values in zip(COLUMNS.items(), zip(*chunk)):
+                files[column].write(np.array(values, dtype=dtype).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {
+        'version': VERSION,
+        'season': name,
+        'rows': rows,
+        'created': datetime.datetime.utcnow().isoformat(),
+        'columns': OrderedDict((column, {'file': column + '.bin', 'dtype': dtype}) \
+            for column, (lookup, dtype) in COLUMNS.items()),
+    }
+    with open(os.path.join(tmp_path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+    return manifest
+
+class Snapshot(object):
+    """
+    A season snapshot opened for reading. ``snapshot[column]`` is a
+    read-only array mapped from the column's file on first access.
+    """
+
+    def __init__(self, path):
+        if np is None:
+            raise ImportError('Snapshot requires numpy')
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f, object_pairs_hook=OrderedDict)
+        if self.manifest.get('version') != VERSION:
+            raise ValueError('Unsupported snapshot version in {0}'.format(path))
+        self.arrays = {}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __contains__(self, column):
+        return column in self.manifest['columns']
+
+    def __getitem__(self, column):
+        try:
+            return self.arrays[column]
+        except KeyError:
+            pass
+        info = self.manifest['columns'][column]
+        dtype = np.dtype(str(info['dtype']))
+        if len(self):
+            array = np.memmap(os.path.join(self.path, info['file']), dtype=dtype,
+                mode='r', shape=(len(self),))
+        else:
+            # mmap can't map an empty file
+            array = np.empty(0, dtype=dtype)
+        self.arrays[column] = array
+        return array
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    @property
+    def season(self):
+        return self.manifest['season']
+
+def open_snapshot(root, season):
+    return Snapshot(os.path.join(root, season_name(season)))
+
+def list_snapshots(root):
+    """
+    Names of the seasons with a snapshot under ``root``.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) \
+        if os.path.exists(os.path.join(root, name, MANIFEST)))
+
+def group_sum(keys, values):
+    """
+    The distinct ``keys`` and the sum of ``values`` for each, e.g. the
+    total points of every player of a season.
+    """
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=values, minlength=len(unique))
@@ -0,0 +1,19 @@
+from django import template
+
+from nba.leaderboards import top
+
+register = template.Library()
+
+@register.inclusion_tag('nba/leaderboard.html')
+def leaderboard(season, stat, n=5, min_games=None):
+    """
+    The top ``n`` players of ``season`` by ``stat``::
+
+        {% load leaderboards %}
+        {% leaderboard season 'pts_per_game' 10 %}
+    """
+    leaders = top(season, stat, n=n, min_games=min_games)
+    return {
+        'stat': stat,
+        'leaders': [(leader.player, getattr(leader, stat)) for leader in leaders],
+    }
@@ -0,0 +1,14 @@
+from django import template
+
+from nba.thumbnails import thumbnail_url
+
+register = template.Library()
+
+@register.filter
+def thumbnail(fieldfile, variant):
+    """
+    URL of a resized variant of a photo or logo (see nba.thumbnails)::
+
+        <img src="{{ player.photo|thumbnail:'card' }}">
+    """
+    return thumbnail_url(fieldfile, variant)
@@ -1,3 +1,851 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core import serializers
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+from django.views.generic import ListView
 
-# Create your tests here.
+from nba import leaderboards, thumbnails
+from nba.aggregates import rebuild_season_stats, season_totals
+from nba.boxscores import boxscore_model, traditional_boxscores
+from nba.bulk import BulkLoader, upsert
+from nba.cache import get_cache, get_versions
+from nba.explain import canonical_queries, explain, full_scans, generate_dataset
+from nba.head_to_head import (head_to_head, head_to_head_matrix,
+    update_head_to_head)
+from nba.hierarchy import GroupTree, group_tree
+from nba.loading import fixture_models, layer_fixtures, model_closure
+from nba.models import (Game, Boxscore, BoxscoreTraditional, BoxscoreTraditionalFlat,
+    Conference, Division, Group, HeadToHead, League, Person, Player, PlayerGameRolling,
+    PlayerMembership, PlayerSeasonStats, School, Season, Team, TeamSeasonStats)
+from nba.natural_keys import NaturalKeyResolver
+from nba.pagination import (KeysetPaginationMixin, decode_cursor, encode_cursor,
+    page_window, seek_filter)
+from nba.rolling import GameLogs
+from nba.signals import loading
+from nba.snapshots import group_sum, list_snapshots, np, open_snapshot, write_snapshot
+from nba.views import ExportView, GameExport
+
+from io import BytesIO
+from unittest import skipIf
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+def write_fixture(directory, name, records):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        json.dump(records, f)
+    return path
+
+class FixtureTestCase(TestCase):
+    """
+    Loads fixtures written to a temporary directory with the nba loader
+    (the ``something`` command).
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def load(self, records, name='fixture.json', **options):
+        options.setdefault('verbosity', 0)
+        call_command('something', write_fixture(self.directory, name, records),
+            **options)
+
+def make_teams():
+    return (Team.objects.create(nba_id='1610612747', abbr='LAL', city='Los Angeles',
+        nickname='Lakers'), Team.objects.create(nba_id='1610612738', abbr='BOS',
+        city='Boston', nickname='Celtics'))
+
+def make_player(nba_id='977', first_name='Kobe', last_name='Bryant'):
+    return Player.objects.create(nba_id=nba_id, first_name=first_name,
+        last_name=last_name)
+
+def make_game(nba_id, home, away, season, home_points, away_points, player):
+    """
+    A game with one boxscore per team, both of ``player`` for brevity.
+    """
+    game = Game.objects.create(nba_id=nba_id, home=home, away=away, season=season)
+    for team, pts in ((home, home_points), (away, away_points)):
+        BoxscoreTraditional.objects.create(game=game, team=team, player=player,
+            pts=pts, ast=0, reb=0)
+    return game
+
+class UpsertTest(TestCase):
+
+    def test_round_trip(self):
+        lakers = Team(pk=1, nba_id='1610612747', abbr='LAL', city='Los Angeles',
+            nickname='Lakers')
+        celtics = Team(pk=2, nba_id='1610612738', abbr='BOS', city='Boston',
+            nickname='Celtics')
+        self.assertEqual(upsert(Team, [lakers, celtics]), 2)
+        self.assertEqual(list(Team.objects.order_by('pk').values_list('pk', 'abbr')),
+            [(1, 'LAL'), (2, 'BOS')])
+
+        lakers.city = 'LA'
+        self.assertEqual(upsert(Team, [lakers]), 1)
+        self.assertEqual(list(Team.objects.order_by('pk').values_list('pk', 'city')),
+            [(1, 'LA'), (2, 'Boston')])
+
+    def test_multi_table_children_write_their_own_table(self):
+        lakers, celtics = make_teams()
+        player = make_player()
+        game = Game.objects.create(nba_id='0021400001', home=lakers, away=celtics)
+        written = []
+        loader = BulkLoader(batch_size=2, on_flush=lambda model, objs: \
+            written.append((model, len(objs))))
+        loader.add(Boxscore(pk=7, game=game, team=lakers, player=player))
+        loader.add(BoxscoreTraditional(boxscore_ptr_id=7, pts=30, ast=5, reb=4))
+        self.assertEqual(written, [(Boxscore, 1), (BoxscoreTraditional, 1)])
+
+        loader.add(BoxscoreTraditional(boxscore_ptr_id=7, pts=32, ast=5, reb=4))
+        loader.flush()
+        boxscore = BoxscoreTraditional.objects.get()
+        self.assertEqual((boxscore.pk, boxscore.game, boxscore.pts), (7, game, 32))
+        self.assertEqual([(model, rows) for model, rows, rate in loader.rates()],
+            [(Boxscore, 1), (BoxscoreTraditional, 2)])
+
+class IncrementalLoadTest(FixtureTestCase):
+
+    def setUp(self):
+        super(IncrementalLoadTest, self).setUp()
+        self.lakers, self.celtics = make_teams()
+        self.player = make_player()
+        self.records = [
+            {'model': 'nba.game', 'pk': 1, 'fields': {'nba_id': '0021400001',
+                'home': ['1610612747'], 'away': ['1610612738'], 'date': '2014-10-28'}},
+            {'model': 'nba.boxscore', 'pk': 1, 'fields': {'game': ['0021400001'],
+                'team': ['1610612747'], 'player': self.player.pk}},
+        ]
+
+    def test_boxscores_refer_to_new_games_by_natural_key(self):
+        self.load(self.records, bulk=True, incremental=True)
+        boxscore = Boxscore.objects.get()
+        self.assertEqual(boxscore.game, Game.objects.get(nba_id='0021400001'))
+        self.assertEqual(boxscore.player_id, self.player.pk)
+
+    def test_unchanged_records_are_skipped(self):
+        self.load(self.records, bulk=True, incremental=True)
+        Game.objects.update(attendance=1)
+        self.load(self.records, bulk=True, incremental=True)
+        self.assertEqual(Game.objects.get().attendance, 1)
+
+        self.records[0]['fields']['attendance'] = 18997
+        self.load(self.records, bulk=True, incremental=True)
+        self.assertEqual(Game.objects.get().attendance, 18997)
+
+class LoadOrderTest(FixtureTestCase):
+
+    def scan(self, name, records):
+        with open(write_fixture(self.directory, name, records)) as fixture:
+            return name, fixture_models(fixture, 'json')
+
+    def test_fixtures_are_layered_after_the_rows_they_refer_to(self):
+        boxscores = self.scan('boxscores.json', [
+            {'model': 'nba.boxscore', 'pk': 1, 'fields': {}},
+            {'model': 'nba.boxscoretraditional', 'pk': 1, 'fields': {}}])
+        games = self.scan('games.json', [{'model': 'nba.game', 'pk': 1, 'fields': {}}])
+        teams = self.scan('teams.json', [{'model': 'nba.team', 'pk': 1, 'fields': {}}])
+        players = self.scan('players.json',
+            [{'model': 'nba.player', 'pk': 1, 'fields': {}}])
+        self.assertEqual(boxscores[1], set([Boxscore, BoxscoreTraditional]))
+        self.assertEqual(fixture_models(BytesIO(b'<django-objects/>'), 'xml'), None)
+
+        layers = layer_fixtures([boxscores, games, ('unscanned.xml', None), teams,
+            players])
+        self.assertEqual(layers, [['teams.json', 'players.json'], ['games.json'],
+            ['boxscores.json'], ['unscanned.xml']])
+
+    def test_dependencies_are_followed_through_foreign_keys(self):
+        self.assertTrue(set([Game, Team, Player, Season]) <= model_closure(Boxscore))
+        self.assertNotIn(Boxscore, model_closure(Game))
+
+    def test_cycles_are_loaded_last_in_the_given_order(self):
+        # Boxscores need games, which need the teams of the first fixture
+        self.assertEqual(layer_fixtures([('a', set([Boxscore, Team])),
+            ('b', set([Season])), ('c', set([Game])), ('d', None)]),
+            [['b'], ['a'], ['c'], ['d']])
+
+# The project's templates are only configured by the local settings
+@override_settings(TEMPLATE_DIRS=[settings.BASE_DIR.child('templates')])
+class CachedPlayerListTest(FixtureTestCase):
+
+    def setUp(self):
+        super(CachedPlayerListTest, self).setUp()
+        get_cache().clear()
+        self.school = School.objects.create(name='Lower Merion')
+        self.player = make_player()
+        self.player.school = self.school
+        self.player.save()
+
+    def get(self):
+        response = self.client.get('/nba/players/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode('utf-8')
+
+    def assertCached(self, *contents):
+        with self.assertNumQueries(0):
+            html = self.get()
+        for content in contents:
+            self.assertIn(content, html)
+
+    def test_second_request_is_served_from_the_cache(self):
+        self.assertIn('Kobe Bryant', self.get())
+        self.assertCached('Kobe Bryant', 'Lower Merion')
+        # Not saved, so not seen
+        Person.objects.filter(pk=self.player.pk).update(first_name='Black Mamba')
+        self.assertCached('Kobe Bryant')
+
+    def test_saves_are_seen(self):
+        self.get()
+        self.player.first_name = 'Black'
+        self.player.last_name = 'Mamba'
+        self.player.save()
+        self.assertIn('Black Mamba', self.get())
+
+        self.school.name = 'Lower Merion High School'
+        self.school.save()
+        self.assertIn('Lower Merion High School', self.get())
+        self.assertCached('Lower Merion High School')
+
+        versions = get_versions(['players', 'player:{0}'.format(self.player.pk)])
+        PlayerMembership.objects.create(player=self.player, team=make_teams()[0])
+        self.assertNotEqual(get_versions(['players',
+            'player:{0}'.format(self.player.pk)])[1], versions[1])
+        self.assertNotEqual(get_versions(['players'])[0], versions[0])
+
+    def test_loads_are_seen(self):
+        self.get()
+        self.load([
+            {'model': 'nba.person', 'pk': self.player.pk, 'fields': {
+                'first_name': 'Kobe', 'last_name': 'Bean Bryant',
+                'school': self.school.pk}},
+            {'model': 'nba.player', 'pk': self.player.pk, 'fields': {'nba_id': '977'}},
+        ], bulk=True)
+        self.assertIn('Kobe Bean Bryant', self.get())
+
+        self.load([{'model': 'nba.school', 'pk': self.school.pk,
+            'fields': {'name': 'LMHS'}}], bulk=True)
+        self.assertIn('LMHS', self.get())
+
+        team = make_teams()[0]
+        versions = get_versions(['player:{0}'.format(self.player.pk)])
+        self.load([{'model': 'nba.playermembership', 'pk': 1, 'fields': {
+            'player': self.player.pk, 'team': team.pk}}], bulk=True)
+        self.assertNotEqual(get_versions(['player:{0}'.format(self.player.pk)]),
+            versions)
+
+class ExportTest(TestCase):
+
+    def test_only_concrete_exports_can_be_routed_to(self):
+        self.assertRaises(ImproperlyConfigured, ExportView.as_view)
+        GameExport.as_view()
+
+    def test_games_csv(self):
+        lakers, celtics = make_teams()
+        Game.objects.create(nba_id='0021400001', home=lakers, away=celtics)
+        response = self.client.get('/nba/export/games.csv')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('0021400001', lines[1])
+
+class ExplainTest(TestCase):
+
+    def test_full_scans(self):
+        self.assertEqual(full_scans(['SCAN TABLE nba_game', 'SEARCH TABLE nba_player '
+            'USING INDEX p (id=?)', 'SCAN nba_team USING INDEX t'], 'sqlite'),
+            ['nba_game', 'nba_team'])
+        self.assertEqual(full_scans(['Sort', '  ->  Seq Scan on nba_game  (cost=0.00..1.01)',
+            '  ->  Index Scan using p on nba_player'], 'postgresql'), ['nba_game'])
+
+    def test_canonical_queries_use_indexes(self):
+        # Few rows would make scanning the better plan
+        objects = generate_dataset(seasons=1, players_per_game=4)
+        queries = canonical_queries(**objects)
+        self.assertEqual(len(queries), 4)
+        for name, queryset in queries.items():
+            self.assertEqual(full_scans(explain(queryset), 'sqlite'), [], name)
+        # The check does catch a query no index serves
+        plan = explain(Team.objects.filter(city='Explain'))
+        self.assertEqual(full_scans(plan, 'sqlite'), [Team._meta.db_table])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('explain_queries', seasons=1, stdout=out)
+        self.assertIn('games on date: ok', out.getvalue())
+
+class PlayerPages(KeysetPaginationMixin, ListView):
+    model = Player
+    paginate_by = 2
+
+class PaginationTest(TestCase):
+
+    def setUp(self):
+        # Three Kobes, ordered by pk
+        self.players = [make_player('1', 'Anthony', 'Davis')] + \
+            [make_player(str(i), 'Kobe', 'Bryant') for i in range(2, 5)] + \
+            [make_player('5', 'Pau', 'Gasol')]
+
+    def page(self, **params):
+        view = PlayerPages()
+        view.request = RequestFactory().get('/nba/players/', params)
+        view.args, view.kwargs = (), {}
+        return view.paginate_queryset(view.get_queryset(), view.paginate_by)[1]
+
+    def test_seek_filter(self):
+        keys = ['first_name', 'last_name', 'pk']
+        kobe = self.players[2]
+        after = Player.objects.filter(seek_filter(keys, ['Kobe', 'Bryant', kobe.pk]))
+        self.assertEqual(list(after.order_by(*keys)), [self.players[3], self.players[4]])
+        before = Player.objects.filter(seek_filter(keys, ['Kobe', 'Bryant', kobe.pk],
+            forward=False))
+        self.assertEqual(list(before.order_by(*keys)), self.players[:2])
+
+    def test_paging_forward_and_back_through_ties(self):
+        pages = [self.page()]
+        while pages[-1].has_next():
+            pages.append(self.page(after=pages[-1].next_cursor))
+        self.assertEqual([list(page) for page in pages],
+            [self.players[0:2], self.players[2:4], self.players[4:]])
+        self.assertEqual([(page.has_previous(), page.has_next()) for page in pages],
+            [(False, True), (True, True), (True, False)])
+
+        page = pages[-1]
+        for expected in (self.players[2:4], self.players[0:2]):
+            page = self.page(before=page.previous_cursor)
+            self.assertEqual(list(page), expected)
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursors(self):
+        fields = [Player._meta.get_field('first_name'), Player._meta.get_field('last_name'),
+            Person._meta.pk]
+        self.assertEqual(decode_cursor(encode_cursor(['Kobe', 'Bryant', '3']), fields),
+            ['Kobe', 'Bryant', 3])
+        for cursor in ('not base64!', encode_cursor({'a': 1}), encode_cursor(['Kobe']),
+            encode_cursor(['Kobe', 'Bryant', 'x']), encode_cursor(['Kobe', None, 3])):
+            self.assertRaises(Http404, decode_cursor, cursor, fields)
+            self.assertRaises(Http404, self.page, after=cursor)
+            self.assertRaises(Http404, self.page, before=cursor)
+
+    def test_page_window(self):
+        pages = Paginator(range(400), 10)
+        self.assertEqual(page_window(pages.page(10)), [1, None, 8, 9, 10, 11, 12, None, 40])
+        self.assertEqual(page_window(pages.page(4)), [1, 2, 3, 4, 5, 6, None, 40])
+        self.assertEqual(page_window(pages.page(40)), [1, None, 38, 39, 40])
+        self.assertEqual(page_window(Paginator(range(30), 10).page(2)), [1, 2, 3])
+        self.assertEqual(page_window(Paginator([], 10).page(1)), [1])
+
+class NaturalKeyTest(TestCase):
+
+    def setUp(self):
+        self.lakers, self.celtics = make_teams()
+        self.player = make_player()
+        self.game = Game.objects.create(nba_id='0021400001', home=self.lakers,
+            away=self.celtics)
+        self.fixture = json.dumps([{'model': 'nba.boxscore', 'pk': i, 'fields': {
+            'game': ['0021400001'], 'team': ['1610612747'], 'player': ['977']}} \
+            for i in range(1, 11)])
+
+    def test_prefetched_keys_resolve_without_queries(self):
+        resolver = NaturalKeyResolver()
+        for model in (Team, Player, Game):
+            resolver.prefetch(model)
+        with resolver.activate(), self.assertNumQueries(0):
+            boxscores = [obj.object for obj in serializers.deserialize('json', self.fixture)]
+        self.assertEqual(len(boxscores), 10)
+        for boxscore in boxscores:
+            self.assertEqual((boxscore.game_id, boxscore.team_id, boxscore.player_id),
+                (self.game.pk, self.lakers.pk, self.player.pk))
+
+    def test_keys_resolve_without_a_resolver(self):
+        boxscore = next(serializers.deserialize('json', self.fixture)).object
+        self.assertEqual(boxscore.player_id, self.player.pk)
+
+class GroupTreeTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.nba = League.objects.create(name='NBA')
+        self.west = Conference.objects.create(name='Western', parent=self.nba)
+        self.east = Conference.objects.create(name='Eastern', parent=self.nba)
+        self.pacific = Division.objects.create(name='Pacific', parent=self.west)
+        self.atlantic = Division.objects.create(name='Atlantic', parent=self.east)
+        # The parents above were stale by the time their children were added
+        Group.objects.rebuild()
+        self.lakers, self.celtics = make_teams()
+        Team.objects.filter(pk=self.lakers.pk).update(division=self.pacific)
+        Team.objects.filter(pk=self.celtics.pk).update(division=self.atlantic)
+        self.teams = list(Team.objects.order_by('abbr'))
+
+    def test_lookups(self):
+        tree = GroupTree.load()
+        self.assertEqual(len(tree), 5)
+        # Tree order, each group an instance of its subclass
+        self.assertEqual([(type(group), group.name) for group in tree], [
+            (League, 'NBA'), (Conference, 'Eastern'), (Division, 'Atlantic'),
+            (Conference, 'Western'), (Division, 'Pacific')])
+        self.assertEqual(tree.parent(tree.get(self.pacific.pk)), self.west)
+        self.assertEqual(tree.children(tree.get(self.nba.pk)), [self.east, self.west])
+
+        boston, lakers = self.teams
+        with self.assertNumQueries(0):
+            self.assertEqual(tree.division(lakers), self.pacific)
+            self.assertEqual(tree.conference(lakers), self.west)
+            self.assertEqual(tree.league(boston), self.nba)
+            self.assertEqual(tree.ancestor(tree.get(self.nba.pk), Division), None)
+            self.assertEqual(list(tree.group_teams(self.teams).items()),
+                [(self.east, [boston]), (self.west, [lakers])])
+            self.assertEqual(list(tree.group_teams(self.teams + [Team()], Division)),
+                [self.atlantic, self.pacific, None])
+
+    def test_tree_is_loaded_once_per_change(self):
+        lakers = self.teams[1]
+        with self.assertNumQueries(1):
+            self.assertEqual(lakers.conference, self.west)
+            self.assertEqual(lakers.league, self.nba)
+
+        Division.objects.create(name='Southwest', parent=self.west)
+        with self.assertNumQueries(1):
+            tree = group_tree()
+            self.assertEqual(len(tree), 6)
+        self.assertIs(group_tree(), tree)
+
+class HeadToHeadTest(FixtureTestCase):
+
+    def setUp(self):
+        super(HeadToHeadTest, self).setUp()
+        self.lakers, self.celtics = make_teams()
+        self.bulls = Team.objects.create(nba_id='1610612741', abbr='CHI',
+            city='Chicago', nickname='Bulls')
+        self.player = make_player()
+        self.season = Season.objects.create(start_year=2014)
+        self.last_season = Season.objects.create(start_year=2013)
+
+    def test_records_of_saved_games(self):
+        make_game('1', self.lakers, self.celtics, self.season, 100, 90, self.player)
+        make_game('2', self.celtics, self.lakers, self.season, 110, 95, self.player)
+        make_game('3', self.lakers, self.celtics, self.last_season, 80, 70, self.player)
+
+        record = head_to_head(self.lakers, self.celtics, self.season)
+        self.assertEqual((record.games, record.wins, record.losses), (2, 1, 1))
+        self.assertEqual((record.points_for, record.points_against), (195, 200))
+        record = head_to_head(self.celtics, self.lakers)
+        self.assertEqual((record.games, record.wins, record.losses), (3, 1, 2))
+
+        rows = list(HeadToHead.objects.order_by('pk').values_list('team', 'opponent',
+            'season', 'games', 'wins', 'points_for'))
+        call_command('rebuild_head_to_head', verbosity=0)
+        self.assertEqual(sorted(rows), sorted(HeadToHead.objects.values_list('team',
+            'opponent', 'season', 'games', 'wins', 'points_for')))
+
+    def test_only_the_matchups_of_updated_games_are_recomputed(self):
+        with loading():
+            first = make_game('1', self.lakers, self.celtics, self.season, 100, 90,
+                self.player)
+            make_game('2', self.bulls, self.celtics, self.season, 100, 90, self.player)
+        update_head_to_head([first.pk])
+
+        self.assertEqual(head_to_head(self.lakers, self.celtics, self.season).wins, 1)
+        self.assertEqual(head_to_head(self.celtics, self.lakers).losses, 1)
+        # Not part of the batch, so not computed
+        self.assertFalse(HeadToHead.objects.filter(team=self.bulls).exists())
+
+    def test_loaded_pks_are_looked_up_in_the_table_they_were_loaded_into(self):
+        with self.settings(NBA_BOXSCORE_LAYOUT='flat'):
+            with loading():
+                celtics = Game.objects.create(nba_id='0021400001', home=self.lakers,
+                    away=self.celtics, season=self.season)
+                bulls = Game.objects.create(nba_id='0021400002', home=self.lakers,
+                    away=self.bulls, season=self.season)
+                # The first with the pk the loaded boxscore gets in the other table
+                for pk, game, team in ((1, celtics, self.lakers), (2, bulls, self.lakers),
+                    (3, celtics, self.celtics), (4, bulls, self.bulls)):
+                    BoxscoreTraditionalFlat.objects.create(pk=pk, game=game, team=team,
+                        player=self.player, pts=100 + pk, ast=0, reb=0)
+            self.load([
+                {'model': 'nba.boxscore', 'pk': 1, 'fields': {'game': ['0021400002'],
+                    'team': ['1610612747'], 'player': ['977']}},
+                {'model': 'nba.boxscoretraditional', 'pk': 1, 'fields': {'pts': 30,
+                    'ast': 0, 'reb': 0}},
+            ], bulk=True)
+            # The Bulls game was tallied (from the flat table), the other not
+            self.assertEqual(sorted(HeadToHead.objects.filter(season=self.season) \
+                .values_list('team', 'opponent', 'points_for')),
+                [(self.lakers.pk, self.bulls.pk, 102), (self.bulls.pk, self.lakers.pk, 104)])
+
+@skipIf(np is None, 'requires numpy')
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.lakers, self.celtics = make_teams()
+        self.kobe, self.pau = make_player(), make_player('1862', 'Pau', 'Gasol')
+        self.season = Season.objects.create(start_year=2014)
+
+    def test_read_back(self):
+        games = [make_game(str(i), self.lakers, self.celtics, self.season, 20 + i,
+            10 + i, player) for i, player in enumerate([self.kobe, self.pau, self.kobe])]
+        Game.objects.update(date=datetime.date(2014, 10, 28))
+        # Three chunks of two rows
+        manifest = write_snapshot(self.root, self.season, chunk_size=2)
+        self.assertEqual((manifest['season'], manifest['rows']), ('2014-15', 6))
+        self.assertEqual(list_snapshots(self.root), ['2014-15'])
+
+        snapshot = open_snapshot(self.root, '2014-15')
+        self.assertEqual(len(snapshot), 6)
+        self.assertEqual(snapshot.columns, ['game', 'team', 'player', 'date', 'pts',
+            'ast', 'reb'])
+        rows = BoxscoreTraditional.objects.order_by('pk')
+        self.assertEqual(snapshot['game'].tolist(), [b.game_id for b in rows])
+        self.assertEqual(snapshot['team'].tolist(), [b.team_id for b in rows])
+        self.assertEqual(snapshot['pts'].tolist(), [20, 10, 21, 11, 22, 12])
+        self.assertEqual(snapshot['date'].tolist(), [datetime.date(2014, 10, 28)] * 6)
+        self.assertEqual(snapshot['game'][-1], games[-1].pk)
+
+        players, pts = group_sum(snapshot['player'], snapshot['pts'])
+        self.assertEqual(dict(zip(players.tolist(), pts.tolist())),
+            {self.kobe.pk: 20 + 10 + 22 + 12, self.pau.pk: 21 + 11})
+
+    def test_empty_season(self):
+        write_snapshot(self.root, self.season)
+        snapshot = open_snapshot(self.root, self.season)
+        self.assertEqual((len(snapshot), snapshot['pts'].tolist()), (0, []))
+
+class BoxscoreLayoutTest(TestCase):
+
+    def setUp(self):
+        self.lakers, self.celtics = make_teams()
+        self.kobe, self.pau = make_player(), make_player('1862', 'Pau', 'Gasol')
+        self.season = Season.objects.create(start_year=2014)
+        make_game('1', self.lakers, self.celtics, self.season, 100, 90, self.kobe)
+        make_game('2', self.celtics, self.lakers, self.season, 110, 95, self.pau)
+        # Ids that don't start at 1, to show they are kept
+        BoxscoreTraditional.objects.get(pk=1).delete()
+
+    def read(self):
+        return {
+            'rows': sorted(traditional_boxscores().values_list('pk', 'game', 'team',
+                'player', 'pts', 'ast', 'reb')),
+            'totals': sorted(tuple(sorted(row.items())) \
+                for owner in ('player', 'team') for row in season_totals(owner)),
+            'head_to_head': sorted((pair, record.wins, record.points_for) for \
+                pair, record in head_to_head_matrix([self.lakers, self.celtics],
+                self.season).items()),
+        }
+
+    def test_flat_layout_reads_the_same(self):
+        inherited = self.read()
+        call_command('flatten_boxscores', verbosity=0)
+        with self.settings(NBA_BOXSCORE_LAYOUT='flat'):
+            self.assertIs(boxscore_model(), BoxscoreTraditionalFlat)
+            call_command('rebuild_head_to_head', verbosity=0)
+            self.assertEqual(self.read(), inherited)
+
+        # Copying again replaces the flat table, and new rows get new ids
+        call_command('flatten_boxscores', verbosity=0)
+        self.assertEqual(BoxscoreTraditionalFlat.objects.count(), 3)
+        flat = BoxscoreTraditionalFlat.objects.create(game_id=1, team=self.lakers,
+            player=self.kobe, pts=1, ast=0, reb=0)
+        self.assertEqual(flat.pk, 5)
+
+    def test_unknown_layout(self):
+        with self.settings(NBA_BOXSCORE_LAYOUT='wide'):
+            self.assertRaises(ImproperlyConfigured, boxscore_model)
+
+class SeasonStatsTest(FixtureTestCase):
+
+    def setUp(self):
+        super(SeasonStatsTest, self).setUp()
+        self.lakers, self.celtics = make_teams()
+        self.kobe, self.pau = make_player(), make_player('1862', 'Pau', 'Gasol')
+        self.season = Season.objects.create(start_year=2014)
+        self.game = Game.objects.create(nba_id='0021400001', home=self.lakers,
+            away=self.celtics, season=self.season)
+
+    def summaries(self):
+        return (sorted(PlayerSeasonStats.objects.values_list('player', 'season',
+            'games', 'pts')), sorted(TeamSeasonStats.objects.values_list('team',
+            'season', 'games', 'pts')))
+
+    def assertSummariesRebuilt(self):
+        """
+        Checks the summaries maintained so far against ones computed from
+        scratch, returning them.
+        """
+        fields = ['season', 'games', 'pts', 'ast', 'reb', 'pts_per_game',
+            'ast_per_game', 'reb_per_game']
+        read = lambda: (sorted(PlayerSeasonStats.objects.values_list('player', *fields)),
+            sorted(TeamSeasonStats.objects.values_list('team', *fields)))
+        maintained = read()
+        rebuild_season_stats()
+        self.assertEqual(maintained, read())
+        return self.summaries()
+
+    def boxscore(self, player, pts, team=None, game=None):
+        return BoxscoreTraditional.objects.create(game=game or self.game,
+            team=team or self.lakers, player=player, pts=pts, ast=pts // 4, reb=3)
+
+    def test_saved_boxscores(self):
+        kobe = self.boxscore(self.kobe, 30)
+        self.boxscore(self.pau, 20)
+        self.boxscore(self.pau, 12, team=self.celtics)
+        players, teams = self.assertSummariesRebuilt()
+        self.assertEqual(players, [(self.kobe.pk, self.season.pk, 1, 30),
+            (self.pau.pk, self.season.pk, 1, 32)])
+        self.assertEqual(teams, [(self.lakers.pk, self.season.pk, 1, 50),
+            (self.celtics.pk, self.season.pk, 1, 12)])
+
+        kobe.pts = 81
+        kobe.save()
+        next_game = Game.objects.create(nba_id='0021400002', home=self.celtics,
+            away=self.lakers, season=self.season)
+        self.boxscore(self.kobe, 19, game=next_game)
+        players, teams = self.assertSummariesRebuilt()
+        self.assertEqual(players[0], (self.kobe.pk, self.season.pk, 2, 100))
+
+    def test_loaded_boxscores(self):
+        records = [
+            {'model': 'nba.boxscore', 'pk': 1, 'fields': {'game': ['0021400001'],
+                'team': ['1610612747'], 'player': ['977']}},
+            {'model': 'nba.boxscoretraditional', 'pk': 1, 'fields': {'pts': 30,
+                'ast': 5, 'reb': 4}},
+            {'model': 'nba.boxscore', 'pk': 2, 'fields': {'game': ['0021400001'],
+                'team': ['1610612738'], 'player': ['1862']}},
+            {'model': 'nba.boxscoretraditional', 'pk': 2, 'fields': {'pts': 12,
+                'ast': 2, 'reb': 10}},
+        ]
+        self.load(records, bulk=True)
+        players, teams = self.assertSummariesRebuilt()
+        self.assertEqual(players, [(self.kobe.pk, self.season.pk, 1, 30),
+            (self.pau.pk, self.season.pk, 1, 12)])
+
+        # Reloading corrected boxscores replaces their totals
+        records[1]['fields']['pts'] = 31
+        self.load(records, bulk=True)
+        players, teams = self.assertSummariesRebuilt()
+        self.assertEqual(teams, [(self.lakers.pk, self.season.pk, 1, 31),
+            (self.celtics.pk, self.season.pk, 1, 12)])
+
+    def test_deleted_boxscores(self):
+        first = self.boxscore(self.kobe, 30)
+        self.boxscore(self.pau, 20)
+        next_game = Game.objects.create(nba_id='0021400002', home=self.celtics,
+            away=self.lakers, season=self.season)
+        self.boxscore(self.kobe, 25, game=next_game)
+
+        first.delete()
+        players, teams = self.assertSummariesRebuilt()
+        self.assertEqual(players, [(self.kobe.pk, self.season.pk, 1, 25),
+            (self.pau.pk, self.season.pk, 1, 20)])
+
+        # Along with their game; Pau has no boxscores left
+        self.game.delete()
+        players, teams = self.assertSummariesRebuilt()
+        self.assertEqual(players, [(self.kobe.pk, self.season.pk, 1, 25)])
+        self.assertEqual(teams, [(self.lakers.pk, self.season.pk, 1, 25)])
+
+    def test_loaded_pks_are_looked_up_in_the_table_they_were_loaded_into(self):
+        with self.settings(NBA_BOXSCORE_LAYOUT='flat'):
+            # Flat rows whose summaries are stale, the first with the pk the
+            # loaded boxscore gets in the other table
+            with loading():
+                for pk, player in ((1, self.pau), (2, self.kobe)):
+                    BoxscoreTraditionalFlat.objects.create(pk=pk, game=self.game,
+                        team=self.lakers, player=player, pts=10, ast=0, reb=0)
+            self.load([
+                {'model': 'nba.boxscore', 'pk': 1, 'fields': {'game': ['0021400001'],
+                    'team': ['1610612747'], 'player': ['977']}},
+                {'model': 'nba.boxscoretraditional', 'pk': 1, 'fields': {'pts': 30,
+                    'ast': 0, 'reb': 0}},
+            ], bulk=True)
+            # Kobe's summary was refreshed (from the flat table), Pau's not
+            players, teams = self.summaries()
+            self.assertEqual(players, [(self.kobe.pk, self.season.pk, 1, 10)])
+
+class LeaderboardTest(FixtureTestCase):
+
+    def setUp(self):
+        super(LeaderboardTest, self).setUp()
+        get_cache().clear()
+        self.season = Season.objects.create(start_year=2014)
+        self.kobe, self.pau = make_player(), make_player('1862', 'Pau', 'Gasol')
+        self.nick = make_player('1890', 'Nick', 'Young')
+        # Kobe and Pau tie on points, Nick has too few games for per game
+        for player, games, pts in ((self.pau, 25, 500), (self.kobe, 20, 500),
+            (self.nick, 10, 300)):
+            stats = PlayerSeasonStats(player=player, season=self.season, games=games,
+                pts=pts)
+            stats.set_per_game()
+            stats.save()
+
+    def leaders(self, stat, **options):
+        return [(stats.player, getattr(stats, stat)) for stats in \
+            leaderboards.top(self.season, stat, **options)]
+
+    def test_top_and_rank(self):
+        self.assertEqual(self.leaders('pts'), [(self.kobe, 500), (self.pau, 500),
+            (self.nick, 300)])
+        self.assertEqual(self.leaders('pts', n=1), [(self.kobe, 500)])
+        self.assertEqual(self.leaders('pts_per_game'), [(self.kobe, 25.0),
+            (self.pau, 20.0)])
+        self.assertEqual(self.leaders('pts_per_game', min_games=0)[0], (self.nick, 30.0))
+
+        self.assertEqual([leaderboards.rank(player, self.season, 'pts') for player in \
+            (self.kobe, self.pau, self.nick)], [1, 1, 3])
+        self.assertEqual(leaderboards.rank(self.nick, self.season, 'pts_per_game'), None)
+        self.assertEqual(leaderboards.rank(self.nick.pk, self.season.pk, 'pts_per_game',
+            min_games=0), 1)
+        self.assertRaises(ValueError, leaderboards.top, self.season, 'blk')
+
+    def test_results_are_cached_until_invalidated(self):
+        self.leaders('pts')
+        leaderboards.rank(self.nick, self.season, 'pts')
+        PlayerSeasonStats.objects.filter(player=self.nick).update(pts=600)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.leaders('pts')[0], (self.kobe, 500))
+            self.assertEqual(leaderboards.rank(self.nick, self.season, 'pts'), 3)
+
+        leaderboards.invalidate([self.season.pk + 1])
+        self.assertEqual(self.leaders('pts')[0], (self.kobe, 500))
+        leaderboards.invalidate([self.season.pk])
+        self.assertEqual(self.leaders('pts')[0], (self.nick, 600))
+        PlayerSeasonStats.objects.filter(player=self.nick).update(pts=700)
+        leaderboards.invalidate()
+        self.assertEqual(leaderboards.rank(self.nick, self.season, 'pts'), 1)
+
+    def test_invalidation_waits_for_loading_to_finish(self):
+        self.leaders('pts')
+        PlayerSeasonStats.objects.filter(player=self.nick).update(pts=600)
+        with loading():
+            leaderboards.invalidate([self.season.pk])
+            # Until the load commits, what a request sees is still the old data
+            self.assertEqual(self.leaders('pts')[0], (self.kobe, 500))
+        self.assertEqual(self.leaders('pts')[0], (self.nick, 600))
+
+    def test_loaded_boxscores_update_the_leaderboard(self):
+        self.leaders('pts')
+        lakers, celtics = make_teams()
+        Game.objects.create(nba_id='0021400001', home=lakers, away=celtics,
+            season=self.season)
+        self.load([
+            {'model': 'nba.boxscore', 'pk': 1, 'fields': {'game': ['0021400001'],
+                'team': ['1610612747'], 'player': ['1890']}},
+            {'model': 'nba.boxscoretraditional', 'pk': 1, 'fields': {'pts': 40,
+                'ast': 0, 'reb': 0}},
+        ], bulk=True)
+        # Recomputed from the boxscores, of which Nick now has the only one
+        self.assertEqual(self.leaders('pts'), [(self.kobe, 500), (self.pau, 500),
+            (self.nick, 40)])
+
+    def test_template_tag(self):
+        html = Template("{% load leaderboards %}{% leaderboard season 'pts' 2 %}") \
+            .render(Context({'season': self.season}))
+        self.assertIn('Kobe Bryant', html)
+        self.assertIn('Pau Gasol', html)
+        self.assertNotIn('Nick Young', html)
+        self.assertTrue(html.index('Kobe') < html.index('Pau'))
+
+@skipIf(np is None, 'requires numpy')
+class RollingStatsTest(TestCase):
+
+    def test_game_logs(self):
+        # Player 1 plays four games, player 2 two, given out of order
+        logs = GameLogs({
+            'player': [2, 1, 1, 1, 2, 1],
+            'game': [1, 4, 2, 1, 2, 3],
+            'date': np.array(['2014-10-28', '2014-11-02', '2014-10-30', '2014-10-28',
+                '2014-10-30', '2014-11-01'], dtype='M8[D]'),
+            'pts': [22, 30, 20, 25, 19, 5],
+            'ast': [0, 12, 2, 10, 0, 10],
+            'reb': [10, 10, 10, 10, 10, 1],
+        })
+        self.assertEqual(logs['player'].tolist(), [1, 1, 1, 1, 2, 2])
+        self.assertEqual(logs['game'].tolist(), [1, 2, 3, 4, 1, 2])
+        self.assertEqual(logs.rolling_mean(logs['pts'], 2).tolist(),
+            [25, 22.5, 12.5, 17.5, 22, 20.5])
+
+        results = logs.compute()
+        self.assertEqual(results['pts_avg_5'].tolist(), [25, 22.5, 50 / 3.0, 20, 22, 20.5])
+        self.assertEqual(results['reb_avg_20'].tolist(), [10, 10, 7, 7.75, 10, 10])
+        # Streaks start over with each player
+        self.assertEqual(results['pts_20_streak'].tolist(), [1, 2, 0, 1, 1, 0])
+        self.assertEqual(results['double_double_streak'].tolist(), [1, 2, 0, 1, 1, 2])
+
+    def test_command_reads_the_database_or_a_snapshot(self):
+        lakers, celtics = make_teams()
+        player = make_player()
+        season = Season.objects.create(start_year=2014)
+        for day, pts in ((28, 20), (30, 31), (31, 9)):
+            game = Game.objects.create(nba_id=str(day), home=lakers, away=celtics,
+                season=season, date=datetime.date(2014, 10, day))
+            BoxscoreTraditional.objects.create(game=game, team=lakers, player=player,
+                pts=pts, ast=0, reb=0)
+        rolling = lambda: list(PlayerGameRolling.objects.order_by('game__date') \
+            .values_list('player', 'pts_avg_5', 'pts_20_streak'))
+
+        call_command('compute_rolling_stats', '2014-15', verbosity=0)
+        expected = [(player.pk, 20, 1), (player.pk, 25.5, 2), (player.pk, 20, 0)]
+        self.assertEqual(rolling(), expected)
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        write_snapshot(root, season)
+        BoxscoreTraditional.objects.all().delete()
+        call_command('compute_rolling_stats', verbosity=0, snapshots=root)
+        self.assertEqual(rolling(), expected)
+
+class ThumbnailTest(FixtureTestCase):
+
+    def setUp(self):
+        super(ThumbnailTest, self).setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        get_cache().clear()
+
+        from PIL import Image
+        out = BytesIO()
+        Image.new('RGB', (300, 200), 'purple').save(out, 'PNG')
+        default_storage.save('logos/lal.png', ContentFile(out.getvalue()))
+
+    def test_loaded_logos_are_resized_before_the_command_returns(self):
+        self.load([{'model': 'nba.team', 'pk': 1, 'fields': {'nba_id': '1610612747',
+            'abbr': 'LAL', 'city': 'Los Angeles', 'nickname': 'Lakers',
+            'logo': 'logos/lal.png'}}], bulk=True)
+        for variant in ('logo', 'logo@2x'):
+            self.assertTrue(default_storage.exists(
+                thumbnails.variant_name('logos/lal.png', variant)))
+
+    def test_thumbnail_url_caches_the_storage_lookup(self):
+        team = make_teams()[0]
+        team.logo = 'logos/lal.png'
+        calls = []
+        exists = team.logo.storage.exists
+        def counting_exists(name):
+            calls.append(name)
+            return exists(name)
+        team.logo.storage.exists = counting_exists
+        self.addCleanup(delattr, team.logo.storage, 'exists')
+
+        self.assertEqual(thumbnails.thumbnail_url(team.logo, 'logo'), team.logo.url)
+        self.assertEqual(thumbnails.thumbnail_url(team.logo, 'logo'), team.logo.url)
+        self.assertEqual(len(calls), 1)
+
+        thumbnails.schedule(team.logo).wait()
+        self.assertEqual(thumbnails.thumbnail_url(team.logo, 'logo'),
+            default_storage.url(thumbnails.variant_name('logos/lal.png', 'logo')))
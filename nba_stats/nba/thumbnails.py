@@ -0,0 +1,212 @@
+"""
+Resized variants of player photos and team logos.
+
+Each variant is cropped to fill its box and recompressed, and stored next
+to the original in the same storage under a name derived from it::
+
+    players/lebron.jpg -> thumbs/players/lebron.card.jpg
+
+Variants are generated in a pool of worker threads (Pillow releases the
+GIL while resampling) whenever a photo or logo is saved or loaded from a
+fixture, and by the ``generate_thumbnails`` command for existing files.
+Templates ask for them with the ``thumbnail`` filter, which falls back to
+the original until the variant exists::
+
+    {% load thumbnails %}
+    <img src="{{ player.photo|thumbnail:'card' }}">
+"""
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+import hashlib
+import logging
+import os
+import threading
+
+from nba.aggregates import chunks
+from nba.cache import bump, get_cache
+from nba.models import Player, Team
+from nba.signals import objects_loaded, is_loading
+
+logger = logging.getLogger(__name__)
+
+# Name -> (width, height, format, save options)
+VARIANTS = {
+    'card': (92, 74, 'JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'card@2x': (184, 148, 'JPEG', {'quality': 75, 'optimize': True, 'progressive': True}),
+    'logo': (92, 74, 'PNG', {'optimize': True}),
+    'logo@2x': (184, 148, 'PNG', {'optimize': True}),
+}
+
+# Variants generated for each image field
+FIELD_VARIANTS = {
+    (Player, 'photo'): ['card', 'card@2x'],
+    (Team, 'logo'): ['logo', 'logo@2x'],
+}
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png'}
+
+def variant_name(name, variant):
+    width, height, format, options = VARIANTS[variant]
+    root, ext = os.path.splitext(name)
+    return 'thumbs/{0}.{1}{2}'.format(root, variant, EXTENSIONS[format])
+
+def is_current(storage, name, variant):
+    """
+    Whether the variant exists and isn't older than the original.
+    """
+    target = variant_name(name, variant)
+    if not storage.exists(target):
+        return False
+    try:
+        return storage.modified_time(target) >= storage.modified_time(name)
+    except NotImplementedError:
+        return True
+
+def generate(storage, name, variants, force=False):
+    """
+    Writes the given variants of the image ``name`` in ``storage`` and
+    returns those that were out of date.
+    """
+    # Imported here so that loading the receivers at startup doesn't load Pillow
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise ImportError('Generating thumbnails requires Pillow')
+    variants = [variant for variant in variants if force or \
+        not is_current(storage, name, variant)]
+    if not variants:
+        return variants
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    for variant in variants:
+        width, height, format, options = VARIANTS[variant]
+        source = image
+        if format == 'JPEG' and source.mode not in ('RGB', 'L'):
+            source = source.convert('RGB')
+        elif format == 'PNG' and source.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            source = source.convert('RGBA')
+        # LANCZOS is called ANTIALIAS before Pillow 2.7
+        thumb = ImageOps.fit(source, (width, height),
+            getattr(Image, 'LANCZOS', None) or Image.ANTIALIAS)
+        out = BytesIO()
+        thumb.save(out, format, **options)
+        target = variant_name(name, variant)
+        # Storage.save picks another name rather than overwrite
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(out.getvalue()))
+    return variants
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+# Number of queued jobs that haven't finished, see wait()
+_pending = 0
+_idle = threading.Condition()
+
+def pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A forked process (loaddata --jobs) doesn't inherit the threads
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPool(getattr(settings, 'THUMBNAIL_WORKERS', 2))
+            _pool_pid = os.getpid()
+        return _pool
+
+def _generate(storage, name, variants, force, versions):
+    try:
+        written = generate(storage, name, variants, force=force)
+        for variant in written:
+            get_cache().set(exists_key(variant_name(name, variant)), True, None)
+        if written and versions:
+            # Pages cached with the original image can now use the variant
+            bump(*versions)
+    except Exception:
+        # Nobody waits on the result, so say what went wrong here
+        logger.exception('Could not generate thumbnails of %s', name)
+
+def _finished(result):
+    global _pending
+    with _idle:
+        _pending -= 1
+        if not _pending:
+            _idle.notify_all()
+
+def schedule(fieldfile, force=False):
+    """
+    Queues the generation of the variants of ``fieldfile``, a photo or
+    logo, in the worker pool. Returns the AsyncResult, or None if there
+    is no file.
+    """
+    global _pending
+    if not fieldfile:
+        return None
+    model = type(fieldfile.instance)._meta.concrete_model
+    variants = FIELD_VARIANTS[model, fieldfile.field.name]
+    versions = ['players', 'player:{0}'.format(fieldfile.instance.pk)] \
+        if model is Player else []
+    with _idle:
+        _pending += 1
+    return pool().apply_async(_generate, (fieldfile.storage, fieldfile.name,
+        variants, force, versions), callback=_finished)
+
+def wait():
+    """
+    Blocks until every job queued so far has finished. The pool's threads
+    die with the process, so commands that queue jobs (e.g. by loading
+    data) must call this before they return.
+    """
+    with _idle:
+        while _pending:
+            _idle.wait()
+
+def exists_key(target):
+    # Whether the variant stored as ``target`` exists, see thumbnail_url
+    return 'thumbnail:' + hashlib.md5(target.encode('utf-8')).hexdigest()
+
+def thumbnail_url(fieldfile, variant):
+    """
+    URL of the variant of ``fieldfile``, or of the original until the
+    variant has been generated.
+    """
+    if not fieldfile:
+        return ''
+    # Asking the storage on every render is a stat, or a request for
+    # remote storages; variants that are missing are checked again after
+    # a minute, in case another process generated them.
+    name = variant_name(fieldfile.name, variant)
+    cache = get_cache()
+    exists = cache.get(exists_key(name))
+    if exists is None:
+        exists = fieldfile.storage.exists(name)
+        cache.set(exists_key(name), exists, None if exists else 60)
+    if exists:
+        return fieldfile.storage.url(name)
+    return fieldfile.url
+
+@receiver(post_save, sender=Player)
+def player_saved(sender, instance, raw, **kwargs):
+    if not raw and not is_loading():
+        schedule(instance.photo)
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, raw, **kwargs):
+    if not raw and not is_loading():
+        schedule(instance.logo)
+
+@receiver(objects_loaded, sender=Player)
+@receiver(objects_loaded, sender=Team)
+def images_loaded(sender, pks, using, **kwargs):
+    field = 'photo' if sender is Player else 'logo'
+    for chunk in chunks(list(pks)):
+        for instance in sender.objects.using(using).filter(pk__in=chunk) \
+            .exclude(**{field: ''}).exclude(**{field: None}).only('pk', field):
+            schedule(getattr(instance, field))
@@ -1,6 +1,8 @@
 from django.conf.urls import patterns, url
-from nba.views import PlayerList
+from nba.views import PlayerList, GameExport, BoxscoreExport
 
 urlpatterns = patterns('',
     url(r'^players/$', PlayerList.as_view()),
+    url(r'^export/games\.(?P<format>ndjson|csv)$', GameExport.as_view()),
+    url(r'^export/boxscores\.(?P<format>ndjson|csv)$', BoxscoreExport.as_view()),
 )
@@ -1,12 +1,76 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render
-from django.views.generic import ListView
+from django.views.generic import ListView, View
 from django.core.paginator import Paginator
 
+from nba import export
+from nba.cache import CacheResponseMixin, card_versions
 from nba.models import Player
+from nba.pagination import KeysetPaginationMixin
 
 # Create your views here.
 
-class PlayerList(ListView):
-	model = Player
+class PlayerList(CacheResponseMixin, KeysetPaginationMixin, ListView):
+	queryset = Player.objects.select_related('school')
 	context_object_name = 'players'
 	paginate_by = 50
+	cache_versions = ['players']
+
+	def get_context_data(self, **kwargs):
+		context = super(PlayerList, self).get_context_data(**kwargs)
+		# Key of each player's cached card in the template
+		versions = card_versions(context['players'])
+		for player in context['players']:
+			player.card_version = versions[player.pk]
+		return context
+
+class ExportView(View):
+	"""
+	Streams the rows of ``get_queryset`` in the format given by the URL,
+	filtered as described by ``export.ExportFilterForm``.
+
+	Abstract: subclasses set ``columns`` and ``filename`` and implement
+	``get_queryset``, and only they can be routed to.
+	"""
+	columns = None
+	filename = None
+
+	@classmethod
+	def as_view(cls, **initkwargs):
+		for name in ('columns', 'filename'):
+			if initkwargs.get(name, getattr(cls, name)) is None:
+				raise ImproperlyConfigured('%s is missing %s; route to a subclass '
+					'of ExportView instead.' % (cls.__name__, name))
+		return super(ExportView, cls).as_view(**initkwargs)
+
+	def get_queryset(self, form):
+		"""
+		The queryset to export, given the valid filter form.
+		"""
+		raise NotImplementedError('%s must implement get_queryset()' % type(self).__name__)
+
+	def get(self, request, format):
+		form = export.ExportFilterForm(request.GET)
+		if not form.is_valid():
+			return HttpResponseBadRequest(form.errors.as_text(), content_type='text/plain')
+
+		content_type, render = export.FORMATS[format]
+		rows = export.iter_rows(self.get_queryset(form), self.columns)
+		response = StreamingHttpResponse(render(rows, self.columns), content_type=content_type)
+		response['Content-Disposition'] = 'attachment; filename="{0}.{1}"'.format(self.filename, format)
+		return response
+
+class GameExport(ExportView):
+	columns = export.GAME_COLUMNS
+	filename = 'games'
+
+	def get_queryset(self, form):
+		return export.games(form)
+
+class BoxscoreExport(ExportView):
+	columns = export.BOXSCORE_COLUMNS
+	filename = 'boxscores'
+
+	def get_queryset(self, form):
+		return export.boxscores(form)
@@ -0,0 +1,120 @@
+"""
+Per-request instrumentation of the SQL the ORM runs.
+
+``QueryCountMiddleware`` records how many queries each request ran, how
+long they took in total, and how many of them repeated an earlier one
+(exactly, or up to their literals, which is what an N+1 looks like). It
+reports them as ``X-Query-*`` response headers and a log line on the
+'nba_stats.queries' logger, and logs a warning when a view runs more
+queries than its budget in the QUERY_BUDGETS setting, e.g.::
+
+    QUERY_INSTRUMENTATION = True
+    QUERY_BUDGETS = {'nba.views.PlayerList': 3}
+
+The queries of a streaming response (the nba exports) mostly run while
+its body is sent, after the headers, so it gets no headers; it is logged
+once the body has been sent, with ``streamed`` set in the log record.
+
+With QUERY_INSTRUMENTATION off the middleware removes itself at startup,
+so it costs nothing.
+"""
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from collections import Counter
+import logging
+import re
+
+logger = logging.getLogger('nba_stats.queries')
+
+# Numbers and quoted strings, to group queries that differ only in them
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def view_name(view_func):
+    # Class-based views carry the name and module of their class
+    return '{0}.{1}'.format(view_func.__module__,
+        getattr(view_func, '__name__', view_func.__class__.__name__))
+
+def query_stats(queries):
+    """
+    Count, total time in seconds and repeats of a list of queries as
+    recorded in ``connection.queries``.
+    """
+    statements = Counter(query['sql'] for query in queries)
+    shapes = Counter(LITERALS.sub('?', query['sql']) for query in queries)
+    return {
+        'count': len(queries),
+        'time': sum(float(query['time']) for query in queries),
+        'duplicates': sum(n - 1 for n in statements.values()),
+        'similar': sum(n - 1 for n in shapes.values()),
+        'most_similar': shapes.most_common(1)[0] if shapes else None,
+    }
+
+class QueryCountMiddleware(object):
+
+    def __init__(self):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.default_budget = getattr(settings, 'QUERY_DEFAULT_BUDGET', None)
+
+    def process_request(self, request):
+        # connection.queries is only kept with DEBUG or a debug cursor
+        request._query_log = [(connection, connection.use_debug_cursor,
+            len(connection.queries)) for connection in connections.all()]
+        for connection in connections.all():
+            connection.use_debug_cursor = True
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_view = view_name(view_func)
+
+    def process_response(self, request, response):
+        log = getattr(request, '_query_log', None)
+        if log is None:
+            # process_request didn't run, e.g. an earlier middleware answered
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.streamed(request, response, log,
+                response.streaming_content)
+            return response
+
+        stats = self.report(request, response, log)
+        response['X-Query-Count'] = str(stats['count'])
+        response['X-Query-Time-Ms'] = '%.1f' % (stats['time'] * 1000)
+        response['X-Query-Duplicates'] = str(stats['duplicates'])
+        return response
+
+    def streamed(self, request, response, log, content):
+        try:
+            for chunk in content:
+                yield chunk
+        finally:
+            self.report(request, response, log, streamed=True)
+
+    def report(self, request, response, log, streamed=False):
+        """
+        Logs the queries run since ``process_request``, warning if they
+        are over the view's budget, and returns their ``query_stats``.
+        """
+        queries = []
+        for connection, use_debug_cursor, start in log:
+            queries.extend(connection.queries[start:])
+            connection.use_debug_cursor = use_debug_cursor
+        stats = query_stats(queries)
+        view = getattr(request, '_query_view', None)
+
+        extra = dict(stats, view=view, path=request.path, status=response.status_code,
+            streamed=streamed)
+        logger.info('view=%s path=%s status=%d queries=%d sql_ms=%.1f duplicates=%d similar=%d',
+            view, request.path, response.status_code, stats['count'],
+            stats['time'] * 1000, stats['duplicates'], stats['similar'], extra=extra)
+
+        budget = self.budgets.get(view, self.default_budget)
+        if budget is not None and stats['count'] > budget:
+            shape, repeats = stats['most_similar']
+            logger.warning('view=%s path=%s queries=%d budget=%d most_repeated=%dx %s',
+                view, request.path, stats['count'], budget, repeats, shape, extra=extra)
+        return stats
@@ -46,6 +46,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'nba_stats.middleware.QueryCountMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,3 +89,85 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/1.7/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Serialization
+# Fixtures are deserialized incrementally, see nba.serializers
+
+SERIALIZATION_MODULES = {
+    'json': 'nba.serializers.json_stream',
+    'jsonl': 'nba.serializers.jsonl',
+}
+
+
+# Caching
+# https://docs.djangoproject.com/en/1.7/topics/cache/
+# Pages and fragments of the nba app are cached in 'nba', see nba.cache.
+# Local memory is per process, so in deployment switch 'nba' to a backend
+# shared with the processes that load data, e.g.
+#     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#     'LOCATION': '/var/tmp/nba_stats_cache',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'nba': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nba',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+NBA_CACHE_ALIAS = 'nba'
+
+
+# Boxscores
+# Table layout of the traditional boxscores, 'inherited' or 'flat', see
+# nba.boxscores. Run flatten_boxscores before switching to 'flat'.
+
+NBA_BOXSCORE_LAYOUT = 'inherited'
+
+
+# Query instrumentation
+# Query counts and SQL time of every request, see nba_stats.middleware.
+# Views running more queries than their budget are logged as warnings.
+# Off unless a settings module turns it on (DEBUG is only final there).
+
+QUERY_INSTRUMENTATION = False
+
+QUERY_BUDGETS = {
+    'nba.views.PlayerList': 3,
+}
+
+# Milliseconds a new worker may take to load and serve its first request,
+# see the profile_startup command
+
+STARTUP_BUDGET = 3000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'nba_stats.queries': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Thumbnails
+# Threads resizing player photos and team logos, see nba.thumbnails
+
+THUMBNAIL_WORKERS = 2
@@ -11,6 +11,20 @@ ALLOWED_HOSTS = ['*']
 STATIC_ROOT = 'staticfiles'
 STATIC_URL = '/static/'
 
+# Content-hashed names, with .gz (and .br) copies served by nba_stats.static
+STATICFILES_STORAGE = 'nba_stats.storage.CompressedManifestStaticFilesStorage'
+
 STATICFILES_DIRS = (
     BASE_DIR.child('static'),
-)
\ No newline at end of file
+)
+
+# Share the nba cache between the web and loaddata processes of a dyno
+
+CACHES['nba'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.environ.get('NBA_CACHE_DIR', '/tmp/nba_stats_cache'),
+    'TIMEOUT': 60 * 60 * 24,
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000,
+    },
+}
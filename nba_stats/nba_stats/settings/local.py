@@ -13,3 +13,5 @@ STATICFILES_DIRS = (
 TEMPLATE_DIRS = [
 	BASE_DIR.child('templates'),
 ]
+
+QUERY_INSTRUMENTATION = True
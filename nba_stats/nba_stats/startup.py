@@ -0,0 +1,165 @@
+"""
+Measures the cold start of a web worker.
+
+Run as a script, in a fresh interpreter, it times every module imported
+while loading ``nba_stats.wsgi`` (as gunicorn does) and then serving one
+request, and prints the timings as JSON on its last line of output::
+
+    python -m nba_stats.startup /nba/players/
+
+The ``profile_startup`` command runs it and reports the slowest imports.
+Imports are timed through ``__import__`` and ``importlib.import_module``,
+so the time of a submodule pulled in by ``from package import module`` is
+counted in the module importing it. Relative imports are keyed by the
+module's full name, e.g. ``nba.models`` for ``import models`` in ``nba``.
+
+>>> timer = ImportTimer()
+>>> timer.install()
+>>> try:
+...     import this_module_does_not_exist
+... except ImportError:
+...     pass
+>>> timer.uninstall()
+>>> list(timer.timings)
+['this_module_does_not_exist']
+"""
+
+from collections import OrderedDict
+from timeit import default_timer
+import importlib
+import json
+import sys
+
+try:
+    import __builtin__ as builtins
+except ImportError: # Python 3
+    import builtins
+
+from wsgiref.util import setup_testing_defaults
+
+# __import__'s default level: implicit relative, then absolute, on Python 2
+DEFAULT_LEVEL = -1 if sys.version_info[0] < 3 else 0
+
+def relative_to(globals, level, name):
+    """
+    The module ``name`` names when imported ``level`` packages up from the
+    module whose globals are given, or None outside a package.
+    """
+    package = globals.get('__package__')
+    if not package:
+        package = globals.get('__name__') or ''
+        if '__path__' not in globals:
+            package = package.rpartition('.')[0]
+    for i in range(level - 1):
+        package = package.rpartition('.')[0]
+    if not package:
+        return None
+    return package + '.' + name if name else package
+
+def resolve_import(name, globals=None, locals=None, fromlist=(), level=DEFAULT_LEVEL):
+    """
+    The names ``__import__`` may load the module as, in the order it tries
+    them.
+    """
+    if not level or not globals:
+        return [name]
+    relative = relative_to(globals, max(level, 1), name)
+    if level > 0:
+        return [relative or name]
+    return [relative, name] if relative else [name]
+
+def resolve_import_module(name, package=None):
+    level = len(name) - len(name.lstrip('.'))
+    if not level or not package:
+        return [name]
+    return [relative_to({'__package__': package}, level, name[level:])]
+
+class ImportTimer(object):
+    """
+    Records, for each module imported while installed, the seconds its
+    first import took in all (``cumulative``) and excluding the imports
+    it triggered (``self``).
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.stack = []
+
+    def timed(self, function, resolve):
+        def wrapper(*args, **kwargs):
+            # Implicit (Python 2) and explicit relative imports name the
+            # module relative to the importing package: key it by the name
+            # it gets in sys.modules. Python 2 marks the relative names it
+            # found missing with None.
+            names = [name for name in resolve(*args, **kwargs) \
+                if sys.modules.get(name, False) is not None]
+            if not names or names[0] in sys.modules or names[-1] in self.timings:
+                return function(*args, **kwargs)
+            before = set(sys.modules)
+            self.stack.append(0.0)
+            start = default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = default_timer() - start
+                children = self.stack.pop()
+                if self.stack:
+                    self.stack[-1] += elapsed
+                # A failed import is recorded under the absolute name, one
+                # that found an absolute module already imported not at all
+                name = next((name for name in names if name not in before and \
+                    sys.modules.get(name) is not None), None)
+                if name is None and names[-1] not in sys.modules:
+                    name = names[-1]
+                if name is not None:
+                    self.timings.setdefault(name, {'cumulative': elapsed,
+                        'self': elapsed - children})
+        return wrapper
+
+    def install(self):
+        self.originals = builtins.__import__, importlib.import_module
+        builtins.__import__ = self.timed(builtins.__import__, resolve_import)
+        importlib.import_module = self.timed(importlib.import_module,
+            resolve_import_module)
+
+    def uninstall(self):
+        builtins.__import__, importlib.import_module = self.originals
+
+def profile(path):
+    """
+    Loads the WSGI application and GETs ``path`` from it, returning the
+    import timings, the seconds until the application was loaded and
+    until the response was read, and the response status.
+    """
+    timer = ImportTimer()
+    timer.install()
+    start = default_timer()
+    try:
+        from nba_stats.wsgi import application
+        loaded = default_timer()
+
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+        setup_testing_defaults(environ)
+        statuses = []
+        response = application(environ, lambda status, headers, exc_info=None: \
+            statuses.append(status))
+        try:
+            for chunk in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        served = default_timer()
+    finally:
+        timer.uninstall()
+
+    return {
+        'imports': timer.timings,
+        'load': loaded - start,
+        'first_request': served - start,
+        'status': statuses[0] if statuses else None,
+    }
+
+if __name__ == '__main__':
+    result = profile(sys.argv[1] if len(sys.argv) > 1 else '/')
+    sys.stdout.write('\n' + json.dumps(result) + '\n')
@@ -0,0 +1,138 @@
+"""
+WSGI middleware serving collected static files, precompressed.
+
+For a request under ``prefix`` it sends the file from ``root`` in the
+best encoding that both the client accepts (Accept-Encoding) and
+``collectstatic`` produced (see ``nba_stats.storage``): brotli, then
+gzip, then the file itself. Fingerprinted files never change, so they
+are cached by clients for a year; anything else is revalidated with its
+ETag. Files are handed to the server's ``wsgi.file_wrapper``, so a
+worker does little more than open them.
+
+>>> accepted_encodings('gzip, deflate, br;q=0.5, identity;q=0')
+['gzip', 'br']
+>>> accepted_encodings('*')
+['br', 'gzip']
+>>> etag_matches('"5a-3c", W/"5b-3c"', '"5b-3c"')
+True
+>>> etag_matches('"5b-3c0"', '"5b-3c"')
+False
+"""
+
+from email.utils import formatdate
+import mimetypes
+import os
+import posixpath
+import re
+
+try:
+    from urllib import unquote
+except ImportError: # Python 3
+    from urllib.parse import unquote
+
+# Encodings in order of preference, with their file extensions
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# The hash ManifestStaticFilesStorage puts in names: main.3f2a1b9c4d5e.css
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+BLOCK_SIZE = 64 * 1024
+
+FOREVER = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+def accepted_encodings(header):
+    """
+    The encodings of ENCODINGS that an Accept-Encoding header allows, in
+    order of the client's preference (and ours, for ties).
+    """
+    qualities = {}
+    for part in header.split(','):
+        params = part.strip().split(';')
+        coding = params[0].strip().lower()
+        q = 1.0
+        for param in params[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            qualities[coding] = q
+    wildcard = qualities.get('*', 0.0)
+    ranked = [(qualities.get(coding, wildcard), -i, coding) \
+        for i, (coding, extension) in enumerate(ENCODINGS)]
+    return [coding for q, i, coding in sorted(ranked, reverse=True) if q > 0]
+
+def etag_matches(header, etag):
+    """
+    Whether an If-None-Match header lists ``etag`` (or is ``*``). Like the
+    header requires, weak tags match their strong counterparts.
+    """
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag == etag:
+            return True
+    return False
+
+def read_file(f, block_size=BLOCK_SIZE):
+    """
+    The contents of ``f`` in blocks, closing it once they are read or the
+    server closes the response.
+    """
+    try:
+        for block in iter(lambda: f.read(block_size), b''):
+            yield block
+    finally:
+        f.close()
+
+class PrecompressedStatic(object):
+
+    def __init__(self, application, root, prefix):
+        self.application = application
+        self.root = os.path.abspath(root)
+        self.prefix = prefix
+        self.extensions = dict(ENCODINGS)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix) or \
+            environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+
+        name = posixpath.normpath(unquote(path[len(self.prefix):])).lstrip('/')
+        filename = os.path.join(self.root, *name.split('/'))
+        if name.startswith('..') or not os.path.isfile(filename):
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        headers = [('Vary', 'Accept-Encoding'),
+            ('Cache-Control', FOREVER if FINGERPRINTED.search(name) else REVALIDATE)]
+        for coding in accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', '')):
+            if os.path.isfile(filename + self.extensions[coding]):
+                filename += self.extensions[coding]
+                headers.append(('Content-Encoding', coding))
+                break
+
+        stat = os.stat(filename)
+        etag = '"{0:x}-{1:x}"'.format(int(stat.st_mtime), stat.st_size)
+        headers += [('Content-Type', content_type), ('ETag', etag),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True))]
+
+        if etag_matches(environ.get('HTTP_IF_NONE_MATCH', ''), etag):
+            start_response('304 Not Modified', headers)
+            return []
+
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        f = open(filename, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(f, BLOCK_SIZE)
+        return read_file(f)
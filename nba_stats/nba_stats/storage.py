@@ -0,0 +1,78 @@
+"""
+Static files storage that fingerprints files and precompresses them.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` writes
+each file under its content-hashed name (``main.3f2a1b9c4d5e.css``), as
+``ManifestStaticFilesStorage`` does, and next to every text file a
+``.gz`` and, when the ``brotli`` package is installed, a ``.br``
+version. ``nba_stats.static`` then serves whichever the client accepts,
+so nothing is compressed per request.
+"""
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from io import BytesIO
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.xml',
+    '.map', '.eot', '.ttf', '.otf')
+
+def gzip_compress(data):
+    out = BytesIO()
+    # A fixed mtime keeps the output, and so its ETag, the same across runs
+    with gzip.GzipFile(filename='', mode='wb', fileobj=out, compresslevel=9,
+        mtime=0) as f:
+        f.write(data)
+    return out.getvalue()
+
+ENCODINGS = [('.gz', gzip_compress)]
+if brotli is not None:
+    ENCODINGS.append(('.br', brotli.compress))
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super(CompressedManifestStaticFilesStorage,
+            self).post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception):
+                names.update([name, hashed_name])
+        if dry_run:
+            return
+        for name in sorted(n for n in names if n):
+            for compressed_name, processed in self.compress(name):
+                yield name, compressed_name, processed
+
+    def url(self, name, force=False):
+        """
+        The URL of the fingerprinted file, even under DEBUG (when
+        ManifestStaticFilesStorage hands out the original name), as
+        nba_stats.static only serves what collectstatic wrote.
+        """
+        return super(CompressedManifestStaticFilesStorage, self).url(name, force=True)
+
+    def compress(self, name):
+        """
+        Writes the compressed versions of ``name`` that come out smaller
+        than it, yielding their names.
+        """
+        if not name.endswith(COMPRESSIBLE) or not self.exists(name):
+            return
+        with self.open(name) as f:
+            data = f.read()
+        for extension, compress in ENCODINGS:
+            compressed = compress(data)
+            if len(compressed) >= len(data):
+                continue
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name, True
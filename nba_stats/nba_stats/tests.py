@@ -0,0 +1,211 @@
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from unittest import skipIf
+from django.test.utils import override_settings
+
+from nba.cache import get_cache
+from nba_stats.middleware import logger as query_logger
+from nba_stats.startup import ImportTimer
+from nba_stats.static import FOREVER, REVALIDATE, PrecompressedStatic, read_file
+from nba_stats.storage import CompressedManifestStaticFilesStorage
+
+from wsgiref.util import FileWrapper, setup_testing_defaults
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+class PrecompressedStaticTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.css = b'body { color: purple; }\n' * 100
+        for name in ('main.css', 'main.0123456789ab.css'):
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(self.css)
+            with gzip.open(os.path.join(self.root, name + '.gz'), 'wb') as f:
+                f.write(self.css)
+        self.static = PrecompressedStatic(self.fallback, self.root, '/static/')
+
+    def fallback(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/html')])
+        return [b'page']
+
+    def get(self, path, **headers):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+        environ.update(headers)
+        setup_testing_defaults(environ)
+        response = {}
+        def start_response(status, headers, exc_info=None):
+            response.update(status=status, headers=dict(headers))
+        body = self.static(environ, start_response)
+        try:
+            response['body'] = b''.join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return response
+
+    def test_encodings(self):
+        response = self.get('/static/main.css', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(response['headers']['Vary'], 'Accept-Encoding')
+        with open(os.path.join(self.root, 'main.css.gz'), 'rb') as f:
+            self.assertEqual(response['body'], f.read())
+        self.assertEqual(response['headers']['Content-Length'],
+            str(len(response['body'])))
+
+        for accept in ('', 'br', 'gzip;q=0, identity'):
+            response = self.get('/static/main.css', HTTP_ACCEPT_ENCODING=accept)
+            self.assertNotIn('Content-Encoding', response['headers'])
+            self.assertEqual(response['body'], self.css)
+
+    def test_caching(self):
+        response = self.get('/static/main.0123456789ab.css')
+        self.assertEqual(response['headers']['Cache-Control'], FOREVER)
+        response = self.get('/static/main.css')
+        self.assertEqual(response['headers']['Cache-Control'], REVALIDATE)
+
+        etag = response['headers']['ETag']
+        for match in (etag, '"0-0", W/' + etag, '*'):
+            response = self.get('/static/main.css', HTTP_IF_NONE_MATCH=match)
+            self.assertEqual((response['status'], response['body']),
+                ('304 Not Modified', b''))
+        # Tags of other versions of the file
+        for match in ('"0-0"', etag[:-1] + '0"'):
+            response = self.get('/static/main.css', HTTP_IF_NONE_MATCH=match)
+            self.assertEqual(response['status'], '200 OK')
+        # The gzipped copy is a different representation
+        response = self.get('/static/main.css', HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['status'], '200 OK')
+
+    def test_files_are_closed(self):
+        opened = []
+        def file_wrapper(f, block_size):
+            opened.append(f)
+            return FileWrapper(f, block_size)
+        self.get('/static/main.css', **{'wsgi.file_wrapper': file_wrapper})
+        self.assertTrue(opened[0].closed)
+
+        # Without a file_wrapper, even if the server stops reading early
+        f = open(os.path.join(self.root, 'main.css'), 'rb')
+        body = read_file(f, 100)
+        self.assertEqual(next(body), self.css[:100])
+        body.close()
+        self.assertTrue(f.closed)
+
+    def test_other_requests(self):
+        self.assertEqual(self.get('/nba/players/')['body'], b'page')
+        for path in ('/static/missing.css', '/static/../settings/base.py'):
+            self.assertEqual(self.get(path)['status'], '404 Not Found')
+
+class CompressedManifestStaticFilesStorageTest(SimpleTestCase):
+
+    def test_urls_are_fingerprinted_under_debug(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, 'staticfiles.json'), 'w') as f:
+            json.dump({'version': '1.0', 'paths': {'main.css': 'main.0123456789ab.css'}}, f)
+        for debug in (True, False):
+            with self.settings(DEBUG=debug):
+                storage = CompressedManifestStaticFilesStorage(location=root,
+                    base_url='/static/')
+                self.assertEqual(storage.url('main.css'), '/static/main.0123456789ab.css')
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+# The project's templates are only configured by the local settings
+@override_settings(QUERY_INSTRUMENTATION=True, TEMPLATE_DIRS=[settings.BASE_DIR.child('templates')],
+    QUERY_BUDGETS={'nba.views.PlayerList': 0, 'nba.views.GameExport': 0})
+class QueryCountMiddlewareTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.handler = RecordingHandler()
+        handlers, query_logger.handlers = query_logger.handlers, [self.handler]
+        self.addCleanup(setattr, query_logger, 'handlers', handlers)
+
+    def records(self, level):
+        return [record for record in self.handler.records if record.levelno == level]
+
+    def test_headers_and_budget(self):
+        response = self.client.get('/nba/players/')
+        self.assertEqual(response.status_code, 200)
+        count = int(response['X-Query-Count'])
+        self.assertGreater(count, 0)
+        float(response['X-Query-Time-Ms'])
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+
+        info, = self.records(logging.INFO)
+        self.assertEqual((info.view, info.count, info.streamed), ('nba.views.PlayerList', count, False))
+        warning, = self.records(logging.WARNING)
+        self.assertEqual(warning.view, 'nba.views.PlayerList')
+
+        # The cached page runs no queries, so stays within its budget
+        response = self.client.get('/nba/players/')
+        self.assertEqual(response['X-Query-Count'], '0')
+        self.assertEqual(len(self.records(logging.WARNING)), 1)
+
+    def test_streaming_response_is_logged_after_its_body(self):
+        response = self.client.get('/nba/export/games.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Query-Count'))
+        self.assertEqual(self.handler.records, [])
+
+        b''.join(response.streaming_content)
+        info, = self.records(logging.INFO)
+        self.assertTrue(info.streamed)
+        self.assertGreater(info.count, 0)
+        warning, = self.records(logging.WARNING)
+        self.assertEqual(warning.view, 'nba.views.GameExport')
+
+class ImportTimerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        sys.path.insert(0, self.root)
+        self.addCleanup(sys.path.remove, self.root)
+        modules = set(sys.modules)
+        self.addCleanup(lambda: [sys.modules.pop(name) for name in set(sys.modules) - modules])
+
+    def package(self, name, init):
+        os.mkdir(os.path.join(self.root, name))
+        for module, source in (('__init__', init), ('util', 'VALUE = 1\n')):
+            with open(os.path.join(self.root, name, module + '.py'), 'w') as f:
+                f.write(source)
+
+    def timings(self, *modules):
+        timer = ImportTimer()
+        timer.install()
+        try:
+            for module in modules:
+                __import__(module)
+        finally:
+            timer.uninstall()
+        return timer.timings
+
+    def test_relative_imports_are_keyed_by_module(self):
+        self.package('timed_a', 'from .util import VALUE\n')
+        self.package('timed_b', 'from .util import VALUE\n')
+        self.assertEqual(list(self.timings('timed_a', 'timed_b')),
+            ['timed_a.util', 'timed_a', 'timed_b.util', 'timed_b'])
+
+    @skipIf(sys.version_info[0] >= 3, 'implicit relative imports are Python 2 only')
+    def test_implicit_relative_imports_are_keyed_by_module(self):
+        self.package('timed_a', 'import util\nimport json\n')
+        self.package('timed_b', 'import util\n')
+        self.assertEqual(list(self.timings('timed_a', 'timed_b')),
+            ['timed_a.util', 'timed_a', 'timed_b.util', 'timed_b'])
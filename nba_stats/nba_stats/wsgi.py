@@ -10,6 +10,12 @@ https://docs.djangoproject.com/en/1.7/howto/deployment/wsgi/
 import os
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nba_stats.settings.base")
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
-from dj_static import Cling
-application = Cling(get_wsgi_application())
+from nba_stats.static import PrecompressedStatic
+
+application = get_wsgi_application()
+if getattr(settings, 'STATIC_ROOT', None):
+    # Fingerprinted, precompressed files from collectstatic (see nba_stats.storage)
+    application = PrecompressedStatic(application, settings.STATIC_ROOT,
+        settings.STATIC_URL)